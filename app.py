@@ -4,7 +4,8 @@ import pandas as pd
 import plotly.graph_objects as go
 
 # BARU: Ganti import data_loader dengan elastic_client
-from src import config, styles, elastic_client as es
+from src import cache_warmer, config, elastic_client, styles
+from src.data_backend import es
 from src.components.sidebar import render  # Ganti dengan sidebar dinamis
 
 
@@ -23,6 +24,10 @@ def main():
         st.error("Tidak dapat terhubung ke server data. Aplikasi tidak dapat berjalan.")
         st.stop()
 
+    # Opsional (CACHE_WARM_ON_START=1): panaskan cache view default & per kabupaten di latar
+    if es is elastic_client:
+        cache_warmer.start_background()
+
     # GANTI: sidebar.render_sidebar(df_all) menjadi render()
     # Tidak ada lagi df_all atau df_filtered, semua kalkulasi dilakukan di ES
     filters = render()
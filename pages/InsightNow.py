@@ -7,7 +7,7 @@ from textwrap import dedent
 # Menggunakan import sesuai dokumentasi quickstart
 from google import genai
 
-from src import styles, elastic_client as es
+from src import schema_registry, styles, elastic_client as es
 from src.components import sidebar
 from utils import es as es_utils
 
@@ -167,37 +167,22 @@ def detect_kecamatan_in_text(text: str, alias_idx: dict, max_matches: int = 5) -
     return found
 
 
-def _terms(index: str, field: str, size: int = 3000) -> list:
-    body = {"size": 0, "aggs": {"x": {"terms": {"field": field, "size": size}}}}
-    data = es._es_post(index, "/_search", body)
-    return [b["key"] for b in data["aggregations"]["x"]["buckets"]]
+def _terms(index: str, field: str) -> list:
+    # composite agg dipaging sampai habis (tidak terpotong di size tertentu)
+    return es.composite_values(index, schema_registry.term_field(index, field))
 
 
 def kecamatan_to_wilayah_map() -> dict:
-    body = {
-        "size": 0,
-        "aggs": {
-            "kec": {
-                "terms": {"field": "Kecamatan", "size": 5000},
-                "aggs": {
-                    "wil": {
-                        "top_hits": {
-                            "_source": {"includes": ["nama_kabupaten_kota", "Wilayah"]},
-                            "size": 1,
-                        }
-                    }
-                },
-            }
-        },
-    }
-    data = es._es_post(es.STUNTING_INDEX, "/_search", body)
+    # pasangan (kecamatan, kabupaten) langsung dari composite 2 sumber, tanpa top_hits
     m = {}
-    for b in data["aggregations"]["kec"]["buckets"]:
-        try:
-            src = b["wil"]["hits"]["hits"][0]["_source"]
-            m[b["key"]] = src.get("nama_kabupaten_kota") or src.get("Wilayah")
-        except Exception:
-            pass
+    kec_field = schema_registry.resolve(es.STUNTING_INDEX, "kecamatan", "Kecamatan")
+    for wil_field in schema_registry.candidates(es.STUNTING_INDEX, ["nama_kabupaten_kota", "Wilayah"]):
+        sources = {"kec": schema_registry.term_field(es.STUNTING_INDEX, kec_field),
+                   "wil": schema_registry.term_field(es.STUNTING_INDEX, wil_field)}
+        for b in es.iter_composite(es.STUNTING_INDEX, sources):
+            m.setdefault(b["key"]["kec"], b["key"]["wil"])
+        if m:
+            break
     return m
 
 
@@ -223,6 +208,7 @@ def balita_total(filters: dict) -> int | None:
 
 
 def _route_extra(question: str, filters: dict) -> dict:
+    """Query tambahan sesuai kata kunci pertanyaan (tanpa summary, lihat `_risk_extra`)."""
     q = (question or "").lower()
     extra = {}
     if any(k in q for k in ["tren", "trend", "bulan", "bulanan"]):
@@ -235,23 +221,25 @@ def _route_extra(question: str, filters: dict) -> dict:
         extra["top_kecamatan"] = es_utils.top_counts(
             "Kecamatan", filters, size=10
         ).to_dict("records")
-    try:
-        s = es_utils.summary_for_filters(filters, min_n_kec=20)
-        risiko_pct = s.get("risiko_pct", {})
-        if any(w in q for w in ["anemia", "hb"]):
-            extra["risiko_anemia_pct"] = risiko_pct.get("anemia_hb_lt_11")
-        if any(w in q for w in ["bblr", "berat lahir"]):
-            extra["risiko_bblr_pct"] = risiko_pct.get("bblr_lt_2500")
-        if "lila" in q:
-            extra["risiko_lila_low_pct"] = risiko_pct.get("lila_lt_23_5")
-        if "bmi" in q:
-            extra["risiko_bmi_low_pct"] = risiko_pct.get("bmi_lt_18_5")
-        if "anc" in q:
-            extra["risiko_anc_low_pct"] = risiko_pct.get("anc_le_2")
-        if "asi" in q:
-            extra["asi_eks_tidak_pct"] = risiko_pct.get("asi_eks_tidak")
-    except Exception:
-        pass
+    return extra
+
+
+def _risk_extra(question: str, summary: dict) -> dict:
+    q = (question or "").lower()
+    extra = {}
+    risiko_pct = (summary or {}).get("risiko_pct", {})
+    if any(w in q for w in ["anemia", "hb"]):
+        extra["risiko_anemia_pct"] = risiko_pct.get("anemia_hb_lt_11")
+    if any(w in q for w in ["bblr", "berat lahir"]):
+        extra["risiko_bblr_pct"] = risiko_pct.get("bblr_lt_2500")
+    if "lila" in q:
+        extra["risiko_lila_low_pct"] = risiko_pct.get("lila_lt_23_5")
+    if "bmi" in q:
+        extra["risiko_bmi_low_pct"] = risiko_pct.get("bmi_lt_18_5")
+    if "anc" in q:
+        extra["risiko_anc_low_pct"] = risiko_pct.get("anc_le_2")
+    if "asi" in q:
+        extra["asi_eks_tidak_pct"] = risiko_pct.get("asi_eks_tidak")
     return extra
 
 
@@ -345,8 +333,9 @@ def render_page():
     if "alias_w" not in st.session_state:
         try:
             wilayah_names = _terms(
-                es.STUNTING_INDEX, "nama_kabupaten_kota", 500
-            ) or _terms(es.STUNTING_INDEX, "Wilayah", 500)
+                es.STUNTING_INDEX,
+                schema_registry.resolve(es.STUNTING_INDEX, "wilayah", "nama_kabupaten_kota"),
+            )
             st.session_state.alias_w = build_alias_index(wilayah_names)
             st.session_state.kec2wil = kecamatan_to_wilayah_map()
         except Exception:
@@ -355,7 +344,7 @@ def render_page():
     if "alias_k" not in st.session_state:
         try:
             st.session_state.alias_k = build_alias_index(
-                _terms(es.STUNTING_INDEX, "Kecamatan", 5000)
+                _terms(es.STUNTING_INDEX, schema_registry.resolve(es.STUNTING_INDEX, "kecamatan", "Kecamatan"))
             )
         except Exception:
             st.session_state.alias_k = {}
@@ -420,11 +409,15 @@ def render_page():
         chat_filters["kecamatan"] = targets_k
 
     with st.spinner("Mengambil ringkasan data dari server..."):
-        summary = es_utils.summary_for_filters(chat_filters, min_n_kec=20)
+        # summary, jumlah balita & query tambahan saling independen -> paralel
+        res = es.fan_out({
+            "summary": lambda: es_utils.summary_for_filters(chat_filters, min_n_kec=20),
+            "balita": lambda: balita_total(chat_filters),
+            "extra": lambda: _route_extra(user_msg, chat_filters),
+        })
+        summary = res["summary"]
         try:
-            summary.setdefault("indikator_utama", {})["jumlah_balita"] = balita_total(
-                chat_filters
-            )
+            summary.setdefault("indikator_utama", {})["jumlah_balita"] = res["balita"]
         except Exception:
             pass
         try:
@@ -433,7 +426,7 @@ def render_page():
         except Exception:
             pass
 
-    extra = _route_extra(user_msg, chat_filters)
+    extra = {**res["extra"], **_risk_extra(user_msg, summary)}
     context = {"filters": chat_filters, "summary": summary, "extra": extra}
 
     final_prompt = build_final_prompt(user_msg, context)
@@ -4,7 +4,8 @@ import plotly.express as px
 import os
 # Hapus OpenAI dan gunakan Google GenAI
 from google import genai
-from src import styles, elastic_client as es
+from src import styles
+from src.data_backend import es
 from src.components import sidebar
 
 # Tambahkan konfigurasi Gemini (selaras dengan halaman lain)
@@ -113,8 +114,13 @@ def render_page():
     filters = sidebar.render()
 
     try:
-        df_trend = es.get_monthly_trend(filters)
-        df_corr_sample = es.get_numeric_sample_for_corr(filters)
+        # tren & korelasi independen -> dijalankan paralel
+        # (korelasi dihitung di server (matrix_stats) atas seluruh data terfilter)
+        res = es.fan_out({
+            "trend": lambda: es.get_monthly_trend(filters),
+            "corr": lambda: es.get_correlation_with_target(filters),
+        })
+        df_trend, corr_risk = res["trend"], res["corr"]
     except Exception as e:
         st.error(f"Gagal mengambil data dari Elasticsearch: {e}")
         return
@@ -129,58 +135,39 @@ def render_page():
 
     with c2:
         st.markdown("**Faktor Paling Berpengaruh (Korelasi thd Z-Score)**")
-        target_col = "ZScore TB/U"
 
-        corr_risk = pd.Series(dtype=float)
-
-        if (
-            not df_corr_sample.empty
-            and target_col in df_corr_sample.columns
-            and df_corr_sample.shape[1] > 1
-        ):
+        if not corr_risk.empty:
             try:
-                corr = df_corr_sample.corr(numeric_only=True)
-                if target_col in corr:
-                    corr_risk = corr[target_col].drop(target_col, errors="ignore")
-                    if not corr_risk.empty:
-                        top_features = corr_risk.abs().nlargest(6)
-                        top_corr_values = corr_risk.loc[top_features.index]
-                        df_radar = pd.DataFrame(
-                            {
-                                "Faktor": top_corr_values.index,
-                                "Korelasi Asli": top_corr_values.values,
-                                "Kekuatan Korelasi": top_corr_values.abs().values,
-                            }
-                        )
-
-                        fig = px.line_polar(
-                            df_radar,
-                            r="Kekuatan Korelasi",
-                            theta="Faktor",
-                            line_close=True,
-                            template="plotly_dark",
-                            title="Kekuatan Pengaruh Faktor terhadap Z-Score TB/U",
-                            range_r=[0, 1],
-                        )
-                        fig.update_traces(
-                            fill="toself",
-                            fillcolor="rgba(239, 68, 68, 0.3)",
-                            line=dict(color="rgba(239, 68, 68, 0.8)"),
-                            hovertemplate="<b>%{theta}</b><br>Kekuatan: %{r:.2f}<br>Korelasi Asli: %{customdata[0]:.2f}<extra></extra>",
-                            customdata=df_radar[["Korelasi Asli"]],
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                        st.caption(
-                            "Menunjukkan **kekuatan** pengaruh. Semakin rendah Z-Score, semakin tinggi risiko stunting."
-                        )
-                    else:
-                        st.warning(
-                            "Tidak ada cukup fitur lain untuk menghitung korelasi."
-                        )
-                else:
-                    st.warning(
-                        f"Kolom target '{target_col}' tidak dapat dihitung korelasinya (kemungkinan nilainya konstan)."
-                    )
+                top_features = corr_risk.abs().nlargest(6)
+                top_corr_values = corr_risk.loc[top_features.index]
+                df_radar = pd.DataFrame(
+                    {
+                        "Faktor": top_corr_values.index,
+                        "Korelasi Asli": top_corr_values.values,
+                        "Kekuatan Korelasi": top_corr_values.abs().values,
+                    }
+                )
+
+                fig = px.line_polar(
+                    df_radar,
+                    r="Kekuatan Korelasi",
+                    theta="Faktor",
+                    line_close=True,
+                    template="plotly_dark",
+                    title="Kekuatan Pengaruh Faktor terhadap Z-Score TB/U",
+                    range_r=[0, 1],
+                )
+                fig.update_traces(
+                    fill="toself",
+                    fillcolor="rgba(239, 68, 68, 0.3)",
+                    line=dict(color="rgba(239, 68, 68, 0.8)"),
+                    hovertemplate="<b>%{theta}</b><br>Kekuatan: %{r:.2f}<br>Korelasi Asli: %{customdata[0]:.2f}<extra></extra>",
+                    customdata=df_radar[["Korelasi Asli"]],
+                )
+                st.plotly_chart(fig, use_container_width=True)
+                st.caption(
+                    "Menunjukkan **kekuatan** pengaruh. Semakin rendah Z-Score, semakin tinggi risiko stunting."
+                )
             except Exception as e:
                 st.error(f"Gagal menghitung korelasi: {e}")
         else:
@@ -7,8 +7,8 @@ import os
 from google import genai
 import json
 
-from src import styles
-from src import elastic_client as es
+from src import styles, exporter
+from src.data_backend import es
 from src.components import sidebar
 
 # Tambahkan konfigurasi Gemini (selaras dengan halaman lain)
@@ -220,63 +220,64 @@ def render_page():
             if "fig" in locals() and fig is not None:
                 st.plotly_chart(fig, use_container_width=True)
 
-            # --- ZONA EKSPOR BARU ---
+            # --- ZONA EKSPOR (streaming, tanpa batas baris) ---
             st.markdown("---")
             with st.expander("📥 Buka Panel Ekspor Data"):
                 st.markdown(
-                    "Unduh data yang Anda lihat (sesuai filter di atas) dalam format CSV atau JSON."
+                    "Unduh **seluruh** data sesuai filter di atas. Data diambil bertahap dari server "
+                    "dan ditulis langsung ke file, sehingga aman untuk ratusan ribu baris."
                 )
 
-                # Menggabungkan semua filter untuk fungsi ekspor
-                all_filters = {**main_filters, **advanced_filters}
-
+                export_cols = st.multiselect(
+                    "Kolom yang diekspor", es.EXPORT_FIELDS, default=es.EXPORT_FIELDS
+                )
                 export_col1, export_col2 = st.columns(2)
                 with export_col1:
-                    if st.button("Siapkan File CSV (hingga 5.000 baris)"):
-                        with st.spinner("Mempersiapkan file CSV..."):
-                            df_export = es.get_explorer_data_for_export(
-                                main_filters, advanced_filters, size=5000
-                            )
-                            st.session_state.export_df = (
-                                df_export  # Simpan di session state
-                            )
-                            st.session_state.csv_ready = True
-                            st.success("File CSV siap!")
-
-                    if st.session_state.get("csv_ready"):
-                        now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        csv_bytes = st.session_state.export_df.to_csv(
-                            index=False
-                        ).encode("utf-8")
-                        st.download_button(
-                            "⬇️ Unduh CSV",
-                            csv_bytes,
-                            f"stuntlytics_export_{now_str}.csv",
-                            "text/csv",
-                        )
-
+                    fmt = st.selectbox("Format", exporter.available_formats())
                 with export_col2:
-                    if st.button("Siapkan File JSON (hingga 5.000 baris)"):
-                        with st.spinner("Mempersiapkan file JSON..."):
-                            # Kita bisa pakai data yang sama jika sudah di-fetch untuk CSV
-                            if "export_df" not in st.session_state:
-                                df_export = es.get_explorer_data_for_export(
-                                    main_filters, advanced_filters, size=5000
-                                )
-                                st.session_state.export_df = df_export
-                            st.session_state.json_ready = True
-                            st.success("File JSON siap!")
-
-                    if st.session_state.get("json_ready"):
-                        now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        json_string = st.session_state.export_df.to_json(
-                            orient="records", indent=4, force_ascii=False
-                        )
+                    columnar = exporter.FORMATS[fmt]["columnar"]
+                    compress = st.checkbox(
+                        "Kompres (gzip)",
+                        value=False,
+                        disabled=columnar,
+                        help="Parquet/Feather sudah terkompres (zstd)." if columnar else None,
+                    )
+
+                if st.button("Siapkan File Ekspor", disabled=not export_cols):
+                    exporter.remove(st.session_state.pop("export_path", None))
+                    total = es.count_explorer_export(main_filters, advanced_filters)
+                    bar = st.progress(0.0, text=f"Mengekspor 0 / {total:,} baris...")
+
+                    def _on_progress(rows: int):
+                        frac = min(1.0, rows / total) if total else 1.0
+                        bar.progress(frac, text=f"Mengekspor {rows:,} / {total:,} baris...")
+
+                    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    result = exporter.write_pages(
+                        es.iter_explorer_export_pages(
+                            main_filters, advanced_filters, fields=export_cols
+                        ),
+                        fmt=fmt,
+                        compress=compress,
+                        file_name=f"stuntlytics_export_{now_str}",
+                        on_progress=_on_progress,
+                        columns=export_cols,
+                    )
+                    bar.progress(1.0, text=f"Selesai: {result.rows:,} baris")
+                    st.session_state.export_path = result.path
+                    st.session_state.export_meta = result
+                    st.success(
+                        f"File siap: {result.rows:,} baris, {result.size_bytes / 1e6:.1f} MB."
+                    )
+
+                result = st.session_state.get("export_meta")
+                if result and os.path.exists(result.path):
+                    with open(result.path, "rb") as fh:
                         st.download_button(
-                            "⬇️ Unduh JSON",
-                            json_string,
-                            f"stuntlytics_export_{now_str}.json",
-                            "application/json",
+                            f"⬇️ Unduh {result.file_name}",
+                            fh,
+                            result.file_name,
+                            result.mime,
                         )
 
             # --- BAGIAN BARU: INSIGHT AI ---
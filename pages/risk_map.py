@@ -6,7 +6,7 @@ import pydeck as pdk
 import math
 
 from src import styles
-from src import elastic_client as es
+from src.data_backend import es
 from src.components import sidebar
 
 # --- Konfigurasi & Fungsi Helper ---
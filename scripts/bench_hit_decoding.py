@@ -0,0 +1,88 @@
+# StuntLytics/scripts/bench_hit_decoding.py
+# Benchmark offline decoding hit ES: cara lama (json + DataFrame dari list `_source`)
+# vs cara kolumnar (docvalue_fields + orjson/json + array NumPy, src/columnar.py).
+# Respons sintetis dibuat di memori, jadi tidak butuh ES.
+#
+#   python -m scripts.bench_hit_decoding [--sizes 5000 50000 500000]
+
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src import columnar
+from src.elastic_client import CORR_FIELDS, CORR_TARGET
+
+FIELDS = [CORR_TARGET] + CORR_FIELDS
+# Field teks yang ikut terkirim di `_source` pada cara lama.
+TEXT_FIELDS = {
+    "nama_kabupaten_kota": "KABUPATEN BANDUNG",
+    "Kecamatan": "Cileunyi",
+    "Pendidikan Ibu": "SMA",
+    "ASI Eksklusif": "Ya",
+    "Akses Air Bersih": "Tidak",
+    "Status Stunting (Biner)": "Tidak",
+}
+
+
+def _synthetic(n: int, seed: int = 0) -> Tuple[bytes, bytes]:
+    """Return (respons `_source`, respons `docvalue_fields`) untuk n hit."""
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(n, len(FIELDS))).round(3).tolist()
+    src_hits: List[Dict[str, Any]] = []
+    dv_hits: List[Dict[str, Any]] = []
+    for i, row in enumerate(values):
+        src = dict(zip(FIELDS, row))
+        src.update(TEXT_FIELDS)
+        src_hits.append({"_index": "stunting-data", "_id": str(i), "_score": 1.0, "_source": src})
+        dv_hits.append({"_index": "stunting-data", "_id": str(i), "_score": 1.0,
+                        "fields": {f: [v] for f, v in zip(FIELDS, row)}})
+    wrap = lambda hits: json.dumps({"hits": {"hits": hits}}).encode("utf-8")
+    return wrap(src_hits), wrap(dv_hits)
+
+
+def _decode_source(raw: bytes) -> pd.DataFrame:
+    hits = json.loads(raw).get("hits", {}).get("hits", [])
+    df = pd.DataFrame([h.get("_source", {}) for h in hits])
+    return df.select_dtypes(include=["number"]).copy()
+
+
+def _decode_columnar(raw: bytes) -> pd.DataFrame:
+    return columnar.numeric_frame(columnar.decode_numeric_hits(raw, FIELDS))
+
+
+def _measure(fn: Callable[[bytes], pd.DataFrame], raw: bytes) -> Tuple[float, float, int]:
+    """(detik, peak MB, jumlah baris). Waktu diukur tanpa tracemalloc agar tidak bias."""
+    t0 = time.perf_counter()
+    df = fn(raw)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    fn(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6, len(df)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark decoding hit ES")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[5000, 50000, 500000])
+    args = ap.parse_args()
+
+    parser = "orjson" if columnar._loads is not json.loads else "json"
+    print(f"parser kolumnar: {parser}")
+    print(f"{'hits':>8} | {'payload MB (src/dv)':>19} | {'lama s':>7} {'MB':>7} | {'kolumnar s':>10} {'MB':>7}")
+    for n in args.sizes:
+        raw_src, raw_dv = _synthetic(n)
+        t_old, m_old, rows_old = _measure(_decode_source, raw_src)
+        t_new, m_new, rows_new = _measure(_decode_columnar, raw_dv)
+        assert rows_old == rows_new == n
+        print(f"{n:>8} | {len(raw_src) / 1e6:>8.1f} / {len(raw_dv) / 1e6:>8.1f} | "
+              f"{t_old:>7.2f} {m_old:>7.1f} | {t_new:>10.2f} {m_new:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
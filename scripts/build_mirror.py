@@ -0,0 +1,21 @@
+# StuntLytics/scripts/build_mirror.py
+# Bangun / perbarui mirror kolumnar lokal (src/local_mirror.py) dari Elasticsearch.
+# Setelah selesai, jalankan app dengan DATA_BACKEND=local.
+#
+#   python -m scripts.build_mirror [--index stunting-data ...]
+
+import argparse
+import json
+
+from src import local_mirror
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Bangun mirror kolumnar lokal dari ES")
+    ap.add_argument("--index", action="append", help="index yang dibangun (default: stunting, balita, nakes)")
+    args = ap.parse_args()
+    print(json.dumps(local_mirror.build(args.index), indent=2))
+
+
+if __name__ == "__main__":
+    main()
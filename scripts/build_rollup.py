@@ -0,0 +1,266 @@
+# StuntLytics/scripts/build_rollup.py
+# Job offline: bangun index rollup kabupaten x kecamatan x bulan x zona risiko dari index
+# stunting raw, lalu pindahkan alias ROLLUP_INDEX ke index baru secara atomik.
+# Router di src/elastic_client.py (`rollup_query`) hanya memakai rollup jika `source_version`
+# di dokumen meta sama dengan versi data raw saat ini, jadi jalankan ulang setelah ingest.
+#
+#   python -m scripts.build_rollup [--page-size 1000] [--keep-old] [--verify]
+
+import argparse
+import json
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from src import es_transport, olap_cube, query_cache, schema_registry
+from src import elastic_client as es
+
+BULK_DOCS = 2000
+
+# missing_bucket: dokumen tanpa kabupaten/kecamatan/tanggal tetap masuk total KPI & tren, seperti
+# di data raw. Sel ber-key null tidak ikut composite kabupaten/kecamatan saat dibaca (lihat
+# `verify`), sama dengan composite raw yang tidak memakai missing_bucket.
+def _region_fields() -> Dict[str, str]:
+    """Field kabupaten & kecamatan hasil resolve _mapping; dicatat di meta untuk router."""
+    return {"wilayah_field": es.wilayah_field({}), "kecamatan_field": es.kecamatan_field({})}
+
+
+def _cell_sources(fields: Dict[str, str]) -> Dict[str, Any]:
+    term = lambda f: schema_registry.term_field(es.STUNTING_INDEX, f)
+    return {
+        "kab": {"terms": {"field": term(fields["wilayah_field"]), "missing_bucket": True}},
+        "kec": {"terms": {"field": term(fields["kecamatan_field"]), "missing_bucket": True}},
+        "bulan": {"date_histogram": {"field": "Tanggal", "calendar_interval": "month",
+                                     "format": "yyyy-MM-dd", "missing_bucket": True}},
+    }
+
+
+def _cell_aggs() -> Dict[str, Any]:
+    """Ukuran per sel; filter & field imunisasi/air mengikuti mode index (raw / ternormalisasi)
+    saat build, sama dengan query raw di elastic_client."""
+    return {
+        "stunting": {"filter": es._stunting_any_filter()},
+        "imun_lengkap": {"filter": es._imunisasi_lengkap_filter()},
+        **{f"imun_total_{i}": {"value_count": {"field": f}} for i, f in enumerate(es._imunisasi_fields(), start=1)},
+        "air_layak": {"filter": es._air_layak_filter()},
+        "air_total": {"value_count": {"field": es._air_field()}},
+        "prob_sum": {"sum": {"field": es.RISK_FIELD}},
+        "prob_count": {"value_count": {"field": es.RISK_FIELD}},
+        "anemia": {"filter": {"range": {"Hb (g/dL)": {"lt": 11.0}}}},
+        "bblr": {"filter": {"range": {"Berat Lahir (gram)": {"lt": 2500}}}},
+        "lila_low": {"filter": {"range": {"LiLA saat Hamil (cm)": {"lt": 23.5}}}},
+        "anc_low": {"filter": {"range": {"Kunjungan ANC (x)": {"lte": 2}}}},
+    }
+
+_KEYWORD = {"type": "keyword"}
+_LONG = {"type": "long"}
+MAPPING = {
+    "settings": {"number_of_shards": 1, "number_of_replicas": 0, "refresh_interval": "-1"},
+    "mappings": {
+        "dynamic": "strict",
+        "properties": {
+            "doc_type": _KEYWORD,
+            "kabupaten": _KEYWORD,
+            "kecamatan": _KEYWORD,
+            "bulan": {"type": "date", "format": "yyyy-MM-dd"},
+            "zona": _KEYWORD,
+            "n": _LONG,
+            "stunting": _LONG,
+            "imun_lengkap": _LONG,
+            "imun_total": _LONG,
+            "air_layak": _LONG,
+            "air_total": _LONG,
+            "prob_sum": {"type": "double"},
+            "prob_count": _LONG,
+            "anemia": _LONG,
+            "bblr": _LONG,
+            "lila_low": _LONG,
+            "anc_low": _LONG,
+            "built_at": {"type": "date"},
+            "source_version": _KEYWORD,
+            "wilayah_field": _KEYWORD,
+            "kecamatan_field": _KEYWORD,
+            "normalized": {"type": "boolean"},
+            "cells": _LONG,
+        },
+    },
+}
+
+
+def _zones() -> Dict[str, Dict[str, Any]]:
+    """Label zona -> filter query. Dokumen tanpa probabilitas masuk ROLLUP_NO_ZONE."""
+    out = {label: {"range": {es.RISK_FIELD: rng}} for label, rng in es.RISK_ZONES.items()}
+    out[es.ROLLUP_NO_ZONE] = {"bool": {"must_not": {"exists": {"field": es.RISK_FIELD}}}}
+    return out
+
+
+def iter_cells(page_size: int, fields: Optional[Dict[str, str]] = None) -> Iterator[Dict[str, Any]]:
+    """Satu dokumen rollup per (kabupaten, kecamatan, bulan, zona) yang punya data."""
+    sources, aggs = _cell_sources(fields or _region_fields()), _cell_aggs()
+    imun_totals = [k for k in aggs if k.startswith("imun_total_")]
+    for zona, flt in _zones().items():
+        base = {"query": {"bool": {"filter": [flt]}}}
+        buckets = es.iter_composite(es.STUNTING_INDEX, sources, base, aggs,
+                                    page_size=page_size, cache=None)
+        for b in buckets:
+            key = b["key"]
+            yield {
+                "doc_type": "cell",
+                "kabupaten": key["kab"],
+                "kecamatan": key["kec"],
+                "bulan": key["bulan"],
+                "zona": zona,
+                "n": b["doc_count"],
+                "stunting": b["stunting"]["doc_count"],
+                "imun_lengkap": b["imun_lengkap"]["doc_count"],
+                "imun_total": sum(int(b[k]["value"] or 0) for k in imun_totals),
+                "air_layak": b["air_layak"]["doc_count"],
+                "air_total": int(b["air_total"]["value"] or 0),
+                "prob_sum": b["prob_sum"]["value"] or 0.0,
+                "prob_count": int(b["prob_count"]["value"] or 0),
+                "anemia": b["anemia"]["doc_count"],
+                "bblr": b["bblr"]["doc_count"],
+                "lila_low": b["lila_low"]["doc_count"],
+                "anc_low": b["anc_low"]["doc_count"],
+            }
+
+
+def _bulk(index: str, docs: List[Dict[str, Any]]) -> None:
+    lines: List[str] = []
+    for doc in docs:
+        lines.append(json.dumps({"index": {"_index": index}}))
+        lines.append(json.dumps(doc, ensure_ascii=False))
+    res = es_transport.request("POST", "/_bulk", "\n".join(lines) + "\n", ndjson=True, timeout=120).json()
+    if res.get("errors"):
+        failed = next(i["index"]["error"] for i in res["items"] if i["index"].get("error"))
+        raise RuntimeError(f"Bulk ke {index} gagal: {failed}")
+
+
+def _alias_targets(alias: str) -> List[str]:
+    try:
+        return list(es_transport.request("GET", f"/_alias/{alias}").json())
+    except es_transport.ESHTTPError as e:
+        if e.status_code == 404:
+            return []
+        raise
+
+
+def build(page_size: int = es.COMPOSITE_PAGE_SIZE, keep_old: bool = False) -> Dict[str, Any]:
+    # versi dicatat SEBELUM scan: ingest di tengah jalan membuat rollup dianggap basi (aman)
+    query_cache.VERSIONS.invalidate(es.STUNTING_INDEX)
+    version = query_cache.data_version(es.STUNTING_INDEX)
+    if version is None:
+        raise ConnectionError(f"Tidak bisa membaca versi data {es.STUNTING_INDEX}")
+
+    started = time.monotonic()
+    target = f"{es.ROLLUP_INDEX}-{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+    es_transport.request("PUT", f"/{target}", MAPPING)
+
+    fields = _region_fields()
+    cells = 0
+    batch: List[Dict[str, Any]] = []
+    for doc in iter_cells(page_size, fields):
+        batch.append(doc)
+        if len(batch) >= BULK_DOCS:
+            _bulk(target, batch)
+            cells += len(batch)
+            batch = []
+    if batch:
+        _bulk(target, batch)
+        cells += len(batch)
+
+    meta = {
+        "doc_type": "meta",
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "source_version": version,
+        "cells": cells,
+        "normalized": es.normalized(),
+        **fields,
+    }
+    es_transport.request("PUT", f"/{target}/_doc/{es.ROLLUP_META_ID}", meta)
+    es_transport.request("PUT", f"/{target}/_settings", {"index": {"refresh_interval": None}})
+    es_transport.request("POST", f"/{target}/_refresh")
+
+    old = _alias_targets(es.ROLLUP_INDEX)
+    actions: List[Dict[str, Any]] = [{"remove": {"index": i, "alias": es.ROLLUP_INDEX}} for i in old]
+    actions.append({"add": {"index": target, "alias": es.ROLLUP_INDEX}})
+    es_transport.request("POST", "/_aliases", {"actions": actions})
+    if not keep_old:
+        for i in old:
+            es_transport.request("DELETE", f"/{i}")
+
+    return {"index": target, "cells": cells, "source_version": version,
+            "replaced": old, "seconds": round(time.monotonic() - started, 1)}
+
+
+# ------------------- verifikasi rollup vs raw -------------------
+
+def _same(a: Any, b: Any) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        if a is None or b is None:
+            return a is b
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9) or (math.isnan(a) and math.isnan(b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _answers(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Jawaban semua fungsi yang dirouting ke rollup, dalam bentuk yang bisa dibandingkan."""
+    from utils import es as ues
+
+    by_key = lambda keys: (lambda r: tuple(str(r[k]) for k in keys))
+    return {
+        "_main_stunting_stats": es._main_stunting_stats(filters),
+        "get_monthly_trend": es.get_monthly_trend(filters).to_dict(),
+        "get_risk_map_data": sorted(es.get_risk_map_data(filters).to_dict("records"),
+                                    key=by_key(["kabupaten", "kecamatan"])),
+        "kecamatan_table": sorted(ues.kecamatan_table(filters, min_n=1).to_dict("records"),
+                                  key=by_key(["Kecamatan", "Wilayah"])),
+    }
+
+
+def verify(filters_list: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Bandingkan jawaban router rollup dengan query ke data raw untuk tiap filter (default: tanpa
+    filter). Return daftar selisih; kosong berarti rollup setara raw.
+    """
+    saved = es.ROLLUP_ENABLED, olap_cube.ES_ENABLED
+    olap_cube.ES_ENABLED = False  # kedua jalur harus benar-benar ke ES, bukan ke kubus
+    diffs: List[Dict[str, Any]] = []
+    try:
+        for filters in filters_list or [{}]:
+            es.ROLLUP_ENABLED = True
+            if es.rollup_query(filters) is None:
+                diffs.append({"filters": filters, "fungsi": "rollup_query", "rollup": None, "raw": "dipakai"})
+                continue
+            rolled = _answers(filters)
+            es.ROLLUP_ENABLED = False
+            raw = _answers(filters)
+            for name, value in raw.items():
+                if not _same(rolled[name], value):
+                    diffs.append({"filters": filters, "fungsi": name, "rollup": rolled[name], "raw": value})
+    finally:
+        es.ROLLUP_ENABLED, olap_cube.ES_ENABLED = saved
+    return diffs
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Bangun index rollup kecamatan x bulan x zona")
+    ap.add_argument("--page-size", type=int, default=es.COMPOSITE_PAGE_SIZE)
+    ap.add_argument("--keep-old", action="store_true", help="jangan hapus index rollup lama")
+    ap.add_argument("--verify", action="store_true", help="bandingkan jawaban rollup dengan data raw setelah build")
+    args = ap.parse_args(argv)
+    result = build(args.page_size, args.keep_old)
+    if args.verify:
+        result["verify"] = verify()
+    print(json.dumps(result, indent=2, default=str))
+    if args.verify and result["verify"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# StuntLytics/scripts/build_sketches.py
+# Bangun sketch kuantil per kecamatan-bulan (src/quantile_sketch.py) untuk versi data saat ini.
+# Dengan --compare, bandingkan persentil sketch dengan `percentiles` ES (default δ=100) dan
+# referensi ES ber-kompresi tinggi (mendekati eksak) untuk seluruh data, N kabupaten pertama,
+# dan gabungan N kabupaten itu (banyak sel digabung -> batas galat gabungan, lihat quantile_sketch).
+#
+#   python -m scripts.build_sketches [--force] [--compare] [--regions 5]
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from src import es_transport, olap_cube, quantile_sketch
+from src.elastic_client import STUNTING_INDEX, build_query, composite_values
+
+
+def _es_percentiles(filters: Dict[str, Any], compression: float) -> Dict[str, Dict[str, Any]]:
+    body = build_query(filters)
+    body.update({"size": 0, "aggs": {
+        m: {"percentiles": {"field": f, "percents": quantile_sketch.PERCENTS, "tdigest": {"compression": compression}}}
+        for m, f in quantile_sketch.METRICS.items()
+    }})
+    aggs = es_transport.post(STUNTING_INDEX, "/_search", body)["aggregations"]
+    return {m: aggs[m]["values"] for m in quantile_sketch.METRICS}
+
+
+def _compare(store: quantile_sketch.SketchStore, filters: Dict[str, Any], label: str) -> List[Dict[str, Any]]:
+    t0 = time.perf_counter()
+    local = store.percentiles(filters)
+    local_ms = (time.perf_counter() - t0) * 1000
+    es_default = _es_percentiles(filters, 100)
+    reference = _es_percentiles(filters, 10000)
+    rows = []
+    for m in quantile_sketch.METRICS:
+        ref = reference[m]
+        iqr = (ref.get("75.0") or 0) - (ref.get("25.0") or 0)
+        for k, r in ref.items():
+            s, e = local[m].get(k), es_default[m].get(k)
+            if r is None or s is None or e is None:
+                continue
+            rows.append({
+                "filter": label, "metrik": m, "p": k, "ref": round(r, 4),
+                "sketch": round(s, 4), "es": round(e, 4),
+                # selisih dinormalisasi IQR referensi agar bisa dibandingkan antar metrik
+                "sketch_err_iqr": round(abs(s - r) / iqr, 4) if iqr else None,
+                "es_err_iqr": round(abs(e - r) / iqr, 4) if iqr else None,
+                "sketch_ms": round(local_ms, 3),
+            })
+    return rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Bangun sketch kuantil lokal")
+    ap.add_argument("--force", action="store_true", help="bangun ulang walau file versi ini sudah ada")
+    ap.add_argument("--compare", action="store_true", help="bandingkan dengan persentil ES")
+    ap.add_argument("--regions", type=int, default=5, help="jumlah kabupaten (urut nama) yang dibandingkan")
+    args = ap.parse_args()
+
+    store = quantile_sketch.build(force=args.force)
+    if store is None:
+        raise SystemExit("Elasticsearch tidak terjangkau dan mirror lokal tidak ada")
+    sizes = {m: int(len(c["mean"])) for m, c in store.centroids.items()}
+    print(json.dumps({"version": store.version, "cells": store.cells, "centroids": sizes}, indent=2, default=str))
+
+    if args.compare:
+        wil = olap_cube.WILAYAH_FIELD
+        cases = [({}, "semua")]
+        kabs = composite_values(STUNTING_INDEX, wil)[: args.regions]
+        for kab in kabs:
+            cases.append(({"wilayah": [kab], "wilayah_field": wil}, kab))
+        if len(kabs) > 1:
+            cases.append(({"wilayah": kabs, "wilayah_field": wil}, f"gabungan {len(kabs)} kabupaten"))
+        rows = [r for f, label in cases for r in _compare(store, f, label)]
+        for r in rows:
+            print(json.dumps(r, ensure_ascii=False))
+        errs = [r["sketch_err_iqr"] for r in rows if r["sketch_err_iqr"] is not None]
+        if errs:
+            print(f"galat sketch maks = {max(errs):.4f} × IQR, rata-rata = {sum(errs) / len(errs):.4f} × IQR")
+
+
+if __name__ == "__main__":
+    main()
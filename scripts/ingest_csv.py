@@ -0,0 +1,315 @@
+# StuntLytics/scripts/ingest_csv.py
+# Loader CSV survei kabupaten -> index stunting lewat `_bulk` paralel.
+# - CSV dibaca streaming per baris (modul csv, tanpa memuat seluruh file); baris dikumpulkan
+#   per batch --batch dokumen lalu dimasukkan ke antrian terbatas. Worker mengirim `_bulk`;
+#   jika semua worker sibuk, pembaca berhenti menunggu (backpressure).
+# - Header dipetakan ke nama field yang dipakai src/elastic_client.py ("Tanggal",
+#   "nama_kabupaten_kota", "Kecamatan", "Z-Score TB/U", ...) lewat perbandingan nama yang
+#   dinormalisasi + alias umum; --map KOLOM=FIELD untuk kasus lain.
+# - Angka dengan koma desimal ("12,5") dan tanggal dd/mm/yyyy dikonversi; sel kosong tidak dikirim.
+#   Titik pemisah ribuan ("2.500.000") dikenali; pada field bilangan bulat (gram, Rp, usia, jumlah)
+#   "3.200" / "3,200" juga dibaca sebagai ribuan, sedangkan pada field desimal (Z-Score, Hb,
+#   probabilitas) satu titik tetap desimal ("0.053").
+# - Item yang ditolak 429 di-retry dengan backoff oleh es_transport.bulk; throughput (docs/s)
+#   dicetak berkala. Bila index memakai skema ternormalisasi (scripts/normalize_index.py),
+#   field boolean ikut diisi.
+#
+#   python -m scripts.ingest_csv data/garut_2025_09.csv [--workers 4] [--batch 2000] [--fast-refresh]
+#   # uji retry & throughput tanpa cluster: ES lokal yang menolak 5% item bulk
+#   python -m scripts.serve_es_standin --synthetic 0 --reject-rate 0.05 --latency-ms 15 &
+#   ES_URL=http://127.0.0.1:9201 python -m scripts.ingest_csv data/garut_2025_09.csv
+
+import argparse
+import csv
+import json
+import queue
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src import es_transport, query_cache
+from src import elastic_client as es
+from scripts.normalize_index import normalize
+
+# Field teks/kategori yang dibaca aplikasi (selain field numerik di bawah)
+TEXT_FIELDS = [
+    "nama_kabupaten_kota", "Kecamatan", "Wilayah",
+    "Status Stunting (Biner)", "Status Stunting (Stunting / Berisiko / Normal)",
+    "Imunisasi (lengkap/tidak lengkap)", "Status Imunisasi Anak",
+    "ASI Eksklusif", "ASI Eksklusif (ya/tidak)", "Akses Air", "Akses Air Bersih",
+    "Pendidikan Ibu",
+]
+NUMERIC_FIELDS = [es.CORR_TARGET] + es.CORR_FIELDS + ["Jarak Kehamilan Sebelumnya (bulan)"]
+# field bilangan bulat: pemisah ribuan tidak bisa tertukar dengan desimal
+INTEGER_FIELDS = [
+    "Usia Anak (bulan)", "Berat Lahir (gram)", "Upah Keluarga (Rp/bulan)", "Rata-rata UMP Wilayah (Rp/bulan)",
+    "Jumlah Anak", "Kunjungan ANC (x)", "Usia Ibu saat Hamil (tahun)", "Jarak Kehamilan Sebelumnya (bulan)",
+]
+DATE_FIELD = "Tanggal"
+FIELDS = [DATE_FIELD] + TEXT_FIELDS + NUMERIC_FIELDS
+
+# header umum dari kabupaten -> field (kunci dalam bentuk _norm)
+ALIASES: Dict[str, str] = {
+    "tgl": DATE_FIELD, "tanggalpengukuran": DATE_FIELD, "tanggalukur": DATE_FIELD, "date": DATE_FIELD,
+    "kabupaten": "nama_kabupaten_kota", "kabupatenkota": "nama_kabupaten_kota", "kabkota": "nama_kabupaten_kota",
+    "namakabupaten": "nama_kabupaten_kota", "kota": "nama_kabupaten_kota",
+    "kec": "Kecamatan", "namakecamatan": "Kecamatan",
+    "zscore": "Z-Score TB/U", "zscoretbu": "Z-Score TB/U", "haz": "Z-Score TB/U", "zstbu": "Z-Score TB/U",
+    "usiaanak": "Usia Anak (bulan)", "umurbulan": "Usia Anak (bulan)", "usiabulan": "Usia Anak (bulan)",
+    "beratlahir": "Berat Lahir (gram)", "bblahir": "Berat Lahir (gram)",
+    "hb": "Hb (g/dL)", "kadarhb": "Hb (g/dL)",
+    "lila": "LiLA saat Hamil (cm)", "kunjungananc": "Kunjungan ANC (x)", "anc": "Kunjungan ANC (x)",
+    "bmi": "BMI Pra-Hamil", "imt": "BMI Pra-Hamil", "imtprahamil": "BMI Pra-Hamil",
+    "statusstunting": "Status Stunting (Biner)", "stunting": "Status Stunting (Biner)",
+    "imunisasi": "Status Imunisasi Anak", "asi": "ASI Eksklusif", "airbersih": "Akses Air Bersih",
+    "probabilitasstunting": es.RISK_FIELD, "risiko": es.RISK_FIELD,
+}
+_DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%Y-%m-%dT%H:%M:%S", "%d/%m/%Y %H:%M"]
+_GROUPED = {sep: re.compile(rf"^[+-]?\d{{1,3}}(\{sep}\d{{3}})+$") for sep in ".,"}
+
+
+def _norm(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def column_map(header: List[str], overrides: Optional[Dict[str, str]] = None, keep_unmapped: bool = True) -> Dict[str, str]:
+    """Header CSV -> nama field ES. Kolom tak dikenal dipertahankan apa adanya (atau dibuang)."""
+    exact = {_norm(f): f for f in FIELDS}
+    out: Dict[str, str] = {}
+    for col in header:
+        key = _norm(col)
+        field = (overrides or {}).get(col) or exact.get(key) or ALIASES.get(key)
+        if field:
+            out[col] = field
+        elif keep_unmapped and col.strip():
+            out[col] = col.strip()
+    return out
+
+
+def _to_number(v: str, integer: bool = False) -> Optional[float]:
+    s = v.strip().replace(" ", "")
+    for sep in ".,":
+        # "2.500.000" / "1,250,000"; satu grup ("3.200") hanya untuk field bilangan bulat
+        if _GROUPED[sep].match(s) and (integer or s.count(sep) > 1):
+            s = s.replace(sep, "")
+            break
+    else:
+        if "," in s and s.rfind(",") > s.rfind("."):  # "12,5" / "1.234,5" (format Indonesia)
+            s = s.replace(".", "").replace(",", ".")
+        else:
+            s = s.replace(",", "")
+    try:
+        num = float(s)
+    except ValueError:
+        return None
+    return int(num) if integer and num.is_integer() else num
+
+
+def _to_date(v: str) -> Optional[str]:
+    s = v.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+_NUMERIC = set(NUMERIC_FIELDS)
+_INTEGER = set(INTEGER_FIELDS)
+
+
+def convert(row: Dict[str, str], mapping: Dict[str, str], add_normalized: bool) -> Dict[str, Any]:
+    doc: Dict[str, Any] = {}
+    for col, field in mapping.items():
+        raw = row.get(col)
+        if raw is None or not raw.strip():
+            continue
+        if field in _NUMERIC:
+            value: Any = _to_number(raw, field in _INTEGER)
+        elif field == DATE_FIELD:
+            value = _to_date(raw)
+        else:
+            value = raw.strip()
+        if value is not None:
+            doc[field] = value
+    if add_normalized:
+        doc.update(normalize(doc))
+    return doc
+
+
+# ------------------- pembaca CSV -------------------
+
+def _open_reader(path: str, delimiter: Optional[str]) -> Tuple[Any, "csv.DictReader"]:
+    fh = open(path, newline="", encoding="utf-8-sig")
+    if delimiter is None:
+        sample = fh.read(64 * 1024)
+        fh.seek(0)
+        try:
+            delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+        except csv.Error:
+            delimiter = ","
+    return fh, csv.DictReader(fh, delimiter=delimiter)
+
+
+def iter_batches(
+    paths: List[str],
+    batch: int,
+    overrides: Dict[str, str],
+    keep_unmapped: bool,
+    add_normalized: bool,
+    delimiter: Optional[str] = None,
+    id_column: Optional[str] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    docs: List[Dict[str, Any]] = []
+    for path in paths:
+        fh, reader = _open_reader(path, delimiter)
+        with fh:
+            mapping = column_map(reader.fieldnames or [], overrides, keep_unmapped)
+            for row in reader:
+                doc = convert(row, mapping, add_normalized)
+                if not doc:
+                    continue
+                if id_column and row.get(id_column):
+                    doc["_id"] = row[id_column].strip()
+                docs.append(doc)
+                if len(docs) >= batch:
+                    yield docs
+                    docs = []
+    if docs:
+        yield docs
+
+
+# ------------------- bulk paralel -------------------
+
+class _Progress:
+    def __init__(self, every: float) -> None:
+        self.lock = threading.Lock()
+        self.stats = {"indexed": 0, "failed": 0, "retried": 0, "batches": 0}
+        self.started = self.last = time.monotonic()
+        self.every = every
+
+    def add(self, res: Dict[str, int]) -> None:
+        with self.lock:
+            for k in ("indexed", "failed", "retried"):
+                self.stats[k] += res[k]
+            self.stats["batches"] += 1
+            now = time.monotonic()
+            if self.every and now - self.last >= self.every:
+                self.last = now
+                print(f"  {self.stats['indexed']:>10} dok | {self.rate():>9.0f} dok/s | "
+                      f"gagal {self.stats['failed']} | retry {self.stats['retried']}", file=sys.stderr)
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.stats["indexed"] / elapsed if elapsed else 0.0
+
+
+def ingest(
+    paths: List[str],
+    index: str = es.STUNTING_INDEX,
+    workers: int = 4,
+    batch: int = 2000,
+    overrides: Optional[Dict[str, str]] = None,
+    keep_unmapped: bool = True,
+    normalized: Optional[bool] = None,
+    delimiter: Optional[str] = None,
+    id_column: Optional[str] = None,
+    fast_refresh: bool = False,
+    progress_every: float = 5.0,
+) -> Dict[str, Any]:
+    if normalized is None:
+        normalized = index == es.STUNTING_INDEX and es.normalized()
+    workers = max(1, workers)
+    progress = _Progress(progress_every)
+    # antrian terbatas: paling banyak 2 batch menunggu per worker
+    pending: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue(maxsize=workers * 2)
+    errors: List[BaseException] = []
+
+    def worker() -> None:
+        while True:
+            docs = pending.get()
+            if docs is None:
+                return
+            try:
+                progress.add(es_transport.bulk(index, docs, id_field="_id"))
+            except BaseException as e:  # error request utuh (bukan per item) -> hentikan ingest
+                errors.append(e)
+
+    refresh_before = None
+    if fast_refresh:
+        settings = es_transport.get(index, "/_settings")
+        refresh_before = next(iter(settings.values()), {}).get("settings", {}).get("index", {}).get("refresh_interval")
+        es_transport.request("PUT", f"/{index}/_settings", {"index": {"refresh_interval": "-1"}})
+
+    threads = [threading.Thread(target=worker, name=f"ingest-{i}", daemon=True) for i in range(workers)]
+    for t in threads:
+        t.start()
+    try:
+        for docs in iter_batches(paths, batch, overrides or {}, keep_unmapped, normalized, delimiter, id_column):
+            if errors:
+                break
+            pending.put(docs)  # blok saat antrian penuh
+    finally:
+        for _ in threads:
+            pending.put(None)
+        for t in threads:
+            t.join()
+        if fast_refresh:
+            es_transport.request("PUT", f"/{index}/_settings", {"index": {"refresh_interval": refresh_before}})
+    if errors:
+        raise errors[0]
+
+    es_transport.request("POST", f"/{index}/_refresh")
+    query_cache.VERSIONS.invalidate(index)
+    seconds = time.monotonic() - progress.started
+    return {"index": index, "files": paths, **progress.stats, "normalized_fields": normalized,
+            "seconds": round(seconds, 1), "docs_per_s": round(progress.rate(), 1)}
+
+
+def _parse_map(items: List[str]) -> Dict[str, str]:
+    out = {}
+    for item in items:
+        col, sep, field = item.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"--map harus KOLOM=FIELD, bukan {item!r}")
+        out[col] = field
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Ingest CSV survei ke index stunting dengan _bulk paralel")
+    ap.add_argument("paths", nargs="+", help="file CSV")
+    ap.add_argument("--index", default=es.STUNTING_INDEX)
+    ap.add_argument("--workers", type=int, default=4, help="request _bulk bersamaan")
+    ap.add_argument("--batch", type=int, default=2000, help="dokumen per request _bulk")
+    ap.add_argument("--map", nargs="*", default=[], metavar="KOLOM=FIELD", help="pemetaan kolom tambahan")
+    ap.add_argument("--drop-unmapped", action="store_true", help="buang kolom yang tidak dikenali")
+    ap.add_argument("--delimiter", default=None, help="default: deteksi otomatis (, ; tab |)")
+    ap.add_argument("--id-column", default=None, help="kolom CSV sebagai _id (ingest ulang jadi idempoten)")
+    ap.add_argument("--fast-refresh", action="store_true", help="matikan refresh selama ingest")
+    ap.add_argument("--dry-run", action="store_true", help="tampilkan pemetaan kolom & contoh dokumen saja")
+    args = ap.parse_args(argv)
+    overrides = _parse_map(args.map)
+
+    if args.dry_run:
+        fh, reader = _open_reader(args.paths[0], args.delimiter)
+        with fh:
+            mapping = column_map(reader.fieldnames or [], overrides, not args.drop_unmapped)
+            first = next(reader, {})
+        print(json.dumps({"mapping": mapping, "contoh": convert(first, mapping, False)}, indent=2, ensure_ascii=False))
+        return
+
+    result = ingest(args.paths, args.index, args.workers, args.batch, overrides,
+                    keep_unmapped=not args.drop_unmapped, delimiter=args.delimiter,
+                    id_column=args.id_column, fast_refresh=args.fast_refresh)
+    print(json.dumps(result, indent=2))
+    if result["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# StuntLytics/scripts/normalize_index.py
+# Job offline: tulis ulang index stunting ke skema ternormalisasi. Field asli dipertahankan,
+# ditambah empat field boolean hasil normalisasi varian nilai saat ingest:
+#   is_stunting       <- Status Stunting (Biner) / kategori "Stunting" / Z-Score TB/U <= -2
+#   imunisasi_lengkap <- dua kolom imunisasi ("lengkap"/"Lengkap"/"complete"/...)
+#   akses_air_layak   <- "Akses Air" / "Akses Air Bersih" ("Layak"/"Ya"/"Bersih"/"Aman")
+#   asi_eksklusif     <- dua kolom ASI ("Ya"/"ya"/"1"/"true" vs "Tidak"/"0"/"false")
+# Nilai tidak diketahui (semua kolom sumber kosong) tidak ditulis, jadi value_count tetap
+# menghitung hanya dokumen yang punya data.
+# - Baca: PIT + sliced search_after, satu thread per slice. Tulis: `_bulk` per halaman dari
+#   thread yang sama (backpressure alami; item 429 di-retry es_transport.bulk). `_id` dipertahankan.
+# - Setelah index baru dipasang ke alias STUNTING_INDEX (--alias), src/elastic_client.py
+#   mendeteksi field boolean di mapping (ES_NORMALIZED=auto) dan memakai filter `term` tunggal.
+#
+#   python -m scripts.normalize_index [--target NAMA] [--slices 4] [--alias stunting-data]
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from src import es_transport, query_cache, schema_registry
+from src import elastic_client as es
+
+_BOOL = {"type": "boolean"}
+_STATUS_STUNTING = {"Stunting", "stunting"}
+
+
+def _to_float(v: Any) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _first_match(src: Dict[str, Any], fields: List[str], yes: List[str]) -> Optional[bool]:
+    """True jika salah satu field bernilai `yes`, False jika ada nilai lain, None jika semua kosong."""
+    seen = False
+    for f in fields:
+        v = src.get(f)
+        if v is None or v == "":
+            continue
+        if str(v) in yes:
+            return True
+        seen = True
+    return False if seen else None
+
+
+def normalize(src: Dict[str, Any]) -> Dict[str, Any]:
+    """Field boolean ternormalisasi untuk satu dokumen (hanya yang diketahui nilainya)."""
+    out: Dict[str, Any] = {}
+
+    biner = src.get("Status Stunting (Biner)")
+    status = src.get("Status Stunting (Stunting / Berisiko / Normal)")
+    z = _to_float(src.get("Z-Score TB/U"))
+    if biner is not None or status is not None or z is not None:
+        out["is_stunting"] = (
+            str(biner) in es._STUNTING_BINER or status in _STATUS_STUNTING or (z is not None and z <= -2.0)
+        )
+
+    imun = _first_match(src, es._IMUNISASI_FIELDS, es._IMUN_LENGKAP)
+    if imun is not None:
+        out["imunisasi_lengkap"] = imun
+
+    air = _first_match(src, es.AIR_FIELDS, es._AIR_LAYAK)
+    if air is not None:
+        out["akses_air_layak"] = air
+
+    for f in es.ASI_FIELDS:
+        v = src.get(f)
+        if str(v) in es.ASI_VALUES["Ya"]:
+            out["asi_eksklusif"] = True
+            break
+        if str(v) in es.ASI_VALUES["Tidak"]:
+            out["asi_eksklusif"] = False
+    return out
+
+
+def _target_body(source: str, shards: Optional[int]) -> Dict[str, Any]:
+    mapping = es_transport.get(source, "/_mapping")
+    props: Dict[str, Any] = {}
+    for m in mapping.values():  # alias bisa menunjuk beberapa index
+        props.update(m.get("mappings", {}).get("properties", {}))
+    for f in es.NORMALIZED_FIELDS:
+        props[f] = _BOOL
+    settings: Dict[str, Any] = {"number_of_replicas": 0, "refresh_interval": "-1"}
+    if shards:
+        settings["number_of_shards"] = shards
+    return {"settings": settings, "mappings": {"properties": props}}
+
+
+def _copy_slice(pit_id: str, target: str, slice_id: int, slices: int, page_size: int) -> Dict[str, int]:
+    stats = {"read": 0, "indexed": 0, "failed": 0, "retried": 0}
+    for hits in es._iter_pit_pages(pit_id, {"query": {"match_all": {}}}, slice_id=slice_id,
+                                   slice_max=slices, page_size=page_size):
+        docs = [{**h.get("_source", {}), **normalize(h.get("_source", {})), "_id": h["_id"]} for h in hits]
+        res = es_transport.bulk(target, docs, id_field="_id")
+        stats["read"] += len(hits)
+        for k in ("indexed", "failed", "retried"):
+            stats[k] += res[k]
+    return stats
+
+
+def _alias_targets(alias: str) -> List[str]:
+    try:
+        return list(es_transport.request("GET", f"/_alias/{alias}").json())
+    except es_transport.ESHTTPError as e:
+        if e.status_code == 404:
+            return []
+        raise
+
+
+def run(
+    source: str = es.STUNTING_INDEX,
+    target: Optional[str] = None,
+    slices: int = es.SCAN_SLICES,
+    page_size: int = 2000,
+    shards: Optional[int] = None,
+    alias: Optional[str] = None,
+) -> Dict[str, Any]:
+    started = time.monotonic()
+    target = target or f"{source}-norm-{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+    es_transport.request("PUT", f"/{target}", _target_body(source, shards))
+
+    pit_id = es._open_pit(source, keep_alive="5m")
+    try:
+        slices = max(1, slices)
+        with ThreadPoolExecutor(max_workers=slices, thread_name_prefix="normalize") as pool:
+            parts = list(pool.map(lambda i: _copy_slice(pit_id, target, i, slices, page_size), range(slices)))
+    finally:
+        es._close_pit(pit_id)
+    totals = {k: sum(p[k] for p in parts) for k in ("read", "indexed", "failed", "retried")}
+
+    es_transport.request("PUT", f"/{target}/_settings", {"index": {"refresh_interval": None}})
+    es_transport.request("POST", f"/{target}/_refresh")
+    count = es_transport.get(target, "/_count").get("count", 0)
+
+    replaced: List[str] = []
+    if alias:
+        if totals["failed"] or count != totals["read"]:
+            raise RuntimeError(f"Alias {alias} tidak dipindah: {count} dokumen di {target}, {totals}")
+        replaced = _alias_targets(alias)
+        actions: List[Dict[str, Any]] = [{"remove": {"index": i, "alias": alias}} for i in replaced]
+        actions.append({"add": {"index": target, "alias": alias}})
+        es_transport.request("POST", "/_aliases", {"actions": actions})
+        query_cache.VERSIONS.invalidate(alias)
+        schema_registry.invalidate(alias)
+
+    seconds = time.monotonic() - started
+    return {"source": source, "index": target, "count": count, **totals, "alias": alias,
+            "replaced": replaced, "seconds": round(seconds, 1),
+            "docs_per_s": round(totals["indexed"] / seconds, 1) if seconds else None}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Reindex data stunting ke skema boolean ternormalisasi")
+    ap.add_argument("--source", default=es.STUNTING_INDEX)
+    ap.add_argument("--target", default=None, help="nama index tujuan (default <source>-norm-<waktu>)")
+    ap.add_argument("--slices", type=int, default=es.SCAN_SLICES, help="jumlah slice PIT / worker bulk paralel")
+    ap.add_argument("--page-size", type=int, default=2000, help="dokumen per halaman = per request _bulk")
+    ap.add_argument("--shards", type=int, default=None)
+    ap.add_argument("--alias", default=None,
+                    help="pindahkan alias ini ke index baru (mis. nama STUNTING_INDEX jika berupa alias)")
+    args = ap.parse_args(argv)
+    print(json.dumps(run(args.source, args.target, args.slices, args.page_size, args.shards, args.alias), indent=2))
+
+
+if __name__ == "__main__":
+    main()
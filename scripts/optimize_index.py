@@ -0,0 +1,222 @@
+# StuntLytics/scripts/optimize_index.py
+# Job offline: buat index stunting dengan layout yang dioptimalkan untuk pola query dashboard,
+# reindex data ke sana, lalu bandingkan latensi fungsi src/elastic_client.py sebelum & sesudah.
+# - Index sort: `Z-Score TB/U` asc (Explorer selalu sort Z-Score) atau `Tanggal` desc (tren);
+#   get_explorer_data tidak menghitung total sehingga bisa berhenti lebih awal per segmen.
+# - eager_global_ordinals pada keyword wilayah/kecamatan (schema_registry.DIMENSIONS): ordinal
+#   dibangun saat refresh, bukan pada agregasi terms/composite pertama setelah refresh.
+# - Field numerik yang tidak pernah difilter range -> doc_values saja (`index: false`);
+#   field range (Z-Score, Hb, berat lahir, LiLA, ANC, probabilitas, Tanggal) tetap diindex.
+# - norms dimatikan pada field text (tidak ada query relevansi/scoring di aplikasi).
+#
+#   python -m scripts.optimize_index [--sort zscore|tanggal|none] [--force-merge] [--alias stunting-data]
+#   python -m scripts.optimize_index --bench-only --target stunting-data-opt-20260101000000
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from src import es_transport, olap_cube, query_cache, schema_registry
+from src import elastic_client as es
+
+SORTS = {
+    "zscore": {"index.sort.field": "Z-Score TB/U", "index.sort.order": "asc"},
+    "tanggal": {"index.sort.field": "Tanggal", "index.sort.order": "desc"},
+    "none": {},
+}
+# field yang dipakai filter range / sort -> tetap punya struktur index (BKD)
+_RANGE_FIELDS = {
+    "Z-Score TB/U", "Hb (g/dL)", "Berat Lahir (gram)", "LiLA saat Hamil (cm)", "BMI Pra-Hamil",
+    "Kunjungan ANC (x)", es.RISK_FIELD, "Tanggal",
+}
+_NUMERIC = {"long", "integer", "short", "byte", "double", "float", "half_float", "scaled_float", "unsigned_long"}
+_NO_ADVANCED = {"pendidikan_ibu": [], "asi_eksklusif": "Semua", "akses_air": "Semua"}
+
+
+# ------------------- mapping teroptimasi -------------------
+
+def optimized_mapping(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Salin properties mapping sumber dengan penyesuaian layout (return dict baru)."""
+    props = json.loads(json.dumps(properties))
+    regions = {f for fields in schema_registry.DIMENSIONS.values() for f in fields}
+    for name, spec in props.items():
+        ftype = spec.get("type")
+        if ftype in _NUMERIC and name not in _RANGE_FIELDS:
+            spec["index"] = False
+            spec["doc_values"] = True
+        if ftype == "text":
+            spec["norms"] = False
+        if name in regions:
+            if ftype == "keyword":
+                spec["eager_global_ordinals"] = True
+            for sub_spec in spec.get("fields", {}).values():
+                if sub_spec.get("type") == "keyword":
+                    sub_spec["eager_global_ordinals"] = True
+    return props
+
+
+def _source_properties(source: str) -> Dict[str, Any]:
+    props: Dict[str, Any] = {}
+    for m in es_transport.get(source, "/_mapping").values():  # alias bisa menunjuk beberapa index
+        props.update(m.get("mappings", {}).get("properties", {}))
+    return props
+
+
+def _reindex(source: str, target: str, poll: float = 5.0) -> Dict[str, Any]:
+    """`_reindex` sisi server (slices=auto) sebagai task; tunggu sampai selesai."""
+    task = es_transport.request(
+        "POST", "/_reindex", {"source": {"index": source, "size": 2000}, "dest": {"index": target}},
+        params={"slices": "auto", "wait_for_completion": "false"},
+    ).json()["task"]
+    while True:
+        res = es_transport.request("GET", f"/_tasks/{task}").json()
+        if res.get("completed"):
+            break
+        time.sleep(poll)
+    if res.get("error"):
+        raise RuntimeError(f"Reindex {source} -> {target} gagal: {res['error']}")
+    response = res.get("response", {})
+    if response.get("failures"):
+        raise RuntimeError(f"Reindex {source} -> {target} gagal: {response['failures'][:3]}")
+    return response
+
+
+def _alias_targets(alias: str) -> List[str]:
+    try:
+        return list(es_transport.request("GET", f"/_alias/{alias}").json())
+    except es_transport.ESHTTPError as e:
+        if e.status_code == 404:
+            return []
+        raise
+
+
+def build(
+    source: str = es.STUNTING_INDEX,
+    target: Optional[str] = None,
+    sort: str = "zscore",
+    force_merge: bool = False,
+) -> Dict[str, Any]:
+    started = time.monotonic()
+    target = target or f"{source}-opt-{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+    settings: Dict[str, Any] = {"number_of_replicas": 0, "refresh_interval": "-1", **SORTS[sort]}
+    es_transport.request("PUT", f"/{target}", {
+        "settings": settings,
+        "mappings": {"properties": optimized_mapping(_source_properties(source))},
+    })
+
+    response = _reindex(source, target)
+    es_transport.request("PUT", f"/{target}/_settings", {"index": {"refresh_interval": None}})
+    es_transport.request("POST", f"/{target}/_refresh")
+    if force_merge:
+        es_transport.request("POST", f"/{target}/_forcemerge", params={"max_num_segments": 1}, timeout=3600)
+
+    count = es_transport.get(target, "/_count").get("count", 0)
+    return {"source": source, "index": target, "sort": sort, "count": count,
+            "total": response.get("total"), "created": response.get("created"),
+            "seconds": round(time.monotonic() - started, 1)}
+
+
+def swap_alias(alias: str, target: str) -> List[str]:
+    """Pindahkan alias ke `target` secara atomik; return index yang sebelumnya ditunjuk."""
+    replaced = _alias_targets(alias)
+    actions: List[Dict[str, Any]] = [{"remove": {"index": i, "alias": alias}} for i in replaced]
+    actions.append({"add": {"index": target, "alias": alias}})
+    es_transport.request("POST", "/_aliases", {"actions": actions})
+    query_cache.VERSIONS.invalidate(alias)
+    schema_registry.invalidate(alias)
+    return replaced
+
+
+# ------------------- benchmark -------------------
+
+def bench_calls(filters: Dict[str, Any]) -> Dict[str, Callable[[], Any]]:
+    return {
+        "get_main_page_summary": lambda: es.get_main_page_summary(filters),
+        "get_monthly_trend": lambda: es.get_monthly_trend(filters),
+        "get_risk_map_data": lambda: es.get_risk_map_data(filters),
+        "get_region_hierarchy": lambda: es.get_region_hierarchy({"date_from": None, "date_to": None}),
+        "get_explorer_data": lambda: es.get_explorer_data(filters, _NO_ADVANCED),
+        "get_top_counts_for_explorer_chart": lambda: es.get_top_counts_for_explorer_chart(filters, _NO_ADVANCED),
+        "get_correlation_with_target": lambda: es.get_correlation_with_target(filters),
+    }
+
+
+def bench_index(index: str, filters: Dict[str, Any], rounds: int = 5) -> Dict[str, Dict[str, float]]:
+    """Latensi (ms) tiap fungsi terhadap `index`: cache proses, kubus, rollup & request cache ES dimatikan."""
+    saved = es.STUNTING_INDEX, es.ROLLUP_ENABLED, query_cache.ENABLED, olap_cube.ES_ENABLED
+    es.STUNTING_INDEX, es.ROLLUP_ENABLED, query_cache.ENABLED, olap_cube.ES_ENABLED = index, False, False, False
+    schema_registry.invalidate(index)
+    out: Dict[str, Dict[str, float]] = {}
+    try:
+        for name, fn in bench_calls(filters).items():
+            fn()  # pemanasan (koneksi, mapping, global ordinals yang tidak eager)
+            times: List[float] = []
+            for _ in range(rounds):
+                es_transport.request("POST", f"/{index}/_cache/clear", params={"request": "true"})
+                t0 = time.perf_counter()
+                fn()
+                times.append((time.perf_counter() - t0) * 1000)
+            times.sort()
+            out[name] = {"median_ms": round(statistics.median(times), 1),
+                         "max_ms": round(times[-1], 1)}
+    finally:
+        es.STUNTING_INDEX, es.ROLLUP_ENABLED, query_cache.ENABLED, olap_cube.ES_ENABLED = saved
+    return out
+
+
+def compare(before: str, after: str, filters: Dict[str, Any], rounds: int = 5) -> List[Dict[str, Any]]:
+    a, b = bench_index(before, filters, rounds), bench_index(after, filters, rounds)
+    rows = []
+    for name in a:
+        t0, t1 = a[name]["median_ms"], b[name]["median_ms"]
+        rows.append({"fungsi": name, "sebelum_ms": t0, "sesudah_ms": t1,
+                     "speedup": round(t0 / t1, 2) if t1 else None})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Buat index stunting teroptimasi (index sort, eager ordinals) + benchmark")
+    ap.add_argument("--source", default=es.STUNTING_INDEX)
+    ap.add_argument("--target", default=None, help="nama index tujuan (default <source>-opt-<waktu>)")
+    ap.add_argument("--sort", choices=sorted(SORTS), default="zscore")
+    ap.add_argument("--force-merge", action="store_true", help="force merge ke 1 segmen setelah reindex")
+    ap.add_argument("--alias", default=None, help="pindahkan alias ini ke index baru setelah benchmark")
+    ap.add_argument("--bench-only", action="store_true", help="lewati build; bandingkan --source dengan --target")
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--wilayah", nargs="*", default=[], help="filter kabupaten untuk benchmark (default semua)")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+
+    result: Dict[str, Any] = {}
+    target = args.target
+    if not args.bench_only:
+        result["build"] = build(args.source, target, args.sort, args.force_merge)
+        target = result["build"]["index"]
+    elif not target:
+        ap.error("--bench-only butuh --target")
+
+    filters = {"wilayah": args.wilayah, "wilayah_field": "nama_kabupaten_kota"} if args.wilayah else {}
+    rows = compare(args.source, target, filters, args.rounds)
+    result["benchmark"] = rows
+
+    if args.alias and not args.bench_only:
+        built = result["build"]
+        if built["count"] != built["total"]:
+            raise RuntimeError(f"Alias {args.alias} tidak dipindah: {built['count']} dari {built['total']} dokumen")
+        result["alias"] = {"alias": args.alias, "index": target, "replaced": swap_alias(args.alias, target)}
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    if "build" in result:
+        print(json.dumps(result["build"], indent=2))
+    print(f"{'fungsi':<36} | {'sebelum ms':>10} | {'sesudah ms':>10} | {'speedup':>7}")
+    for r in rows:
+        print(f"{r['fungsi']:<36} | {r['sebelum_ms']:>10.1f} | {r['sesudah_ms']:>10.1f} | {r['speedup'] or 0:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
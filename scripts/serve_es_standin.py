@@ -0,0 +1,109 @@
+# StuntLytics/scripts/serve_es_standin.py
+# Jalankan pengganti Elasticsearch lokal (src/es_standin.py) untuk benchmark & uji offline.
+# - Dataset: sintetis (--synthetic N, default jika tanpa --data) atau file --data PATH[:INDEX]
+#   (.ndjson/.jsonl satu dokumen per baris, .json list dokumen, .csv lewat pemetaan kolom
+#   scripts/ingest_csv). Index default mengikuti env STUNTING_INDEX/NUTRITION_INDEX/BALITA_INDEX.
+# - --latency-ms/--jitter-ms menambah jeda per request; --reject-rate menolak item _bulk (429),
+#   --error-rate mengembalikan 503 per request (menguji retry es_transport).
+# - Rekam dari cluster asli: --proxy http://es:9200 --record rec.ndjson; putar ulang offline:
+#   --replay rec.ndjson [--replay-strict]. Statistik latensi per endpoint: GET /_standin/stats.
+#
+#   python -m scripts.serve_es_standin --port 9201 --synthetic 50000 --latency-ms 20 --jitter-ms 10
+#   ES_URL=http://127.0.0.1:9201 streamlit run app.py
+
+import argparse
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src import es_standin
+
+STUNTING_INDEX = os.getenv("STUNTING_INDEX", "stunting-data")
+NUTRITION_INDEX = os.getenv("NUTRITION_INDEX", "jabar-tenaga-gizi")
+BALITA_INDEX = os.getenv("BALITA_INDEX", "jabar-balita-desa")
+
+
+def _split_target(spec: str) -> Tuple[str, str]:
+    path, sep, index = spec.rpartition(":")
+    if sep and path and not index.startswith(("\\", "/")):
+        return path, index
+    return spec, STUNTING_INDEX
+
+
+def _read_docs(path: str) -> Iterator[Dict[str, Any]]:
+    if path.endswith(".csv"):
+        # konversi tipe & nama kolom sama persis dengan loader produksi
+        from scripts.ingest_csv import iter_batches
+
+        for batch in iter_batches([path], 5000, {}, keep_unmapped=True, add_normalized=False):
+            yield from batch
+        return
+    with open(path, encoding="utf-8") as fh:
+        if path.endswith(".json"):
+            yield from json.load(fh)
+            return
+        pending_meta: Optional[Dict[str, Any]] = None
+        for line in fh:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            # format _bulk (baris aksi + dokumen) juga diterima
+            if len(obj) == 1 and next(iter(obj)) in ("index", "create") and isinstance(next(iter(obj.values())), dict):
+                pending_meta = next(iter(obj.values()))
+                continue
+            if pending_meta is not None and pending_meta.get("_id") is not None:
+                obj = {**obj, "_id": pending_meta["_id"]}
+            pending_meta = None
+            yield obj
+
+
+def build_cluster(data: List[str], synthetic: Optional[int], seed: int, dynamic_text: bool) -> Tuple[es_standin.Cluster, Dict[str, int]]:
+    cluster = es_standin.Cluster(dynamic_text=dynamic_text)
+    loaded: Dict[str, int] = {}
+    if synthetic:
+        ds = es_standin.synthetic_docs(synthetic, seed=seed)
+        for key, index in (("stunting", STUNTING_INDEX), ("nutrition", NUTRITION_INDEX), ("balita", BALITA_INDEX)):
+            loaded[index] = loaded.get(index, 0) + cluster.load(index, ds[key])
+    for spec in data:
+        path, index = _split_target(spec)
+        loaded[index] = loaded.get(index, 0) + cluster.load(index, _read_docs(path))
+    return cluster, loaded
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Server pengganti Elasticsearch lokal (in-memory) untuk uji & benchmark")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9201)
+    ap.add_argument("--data", nargs="*", default=[], metavar="PATH[:INDEX]", help="file dataset (.ndjson/.json/.csv)")
+    ap.add_argument("--synthetic", type=int, default=None, help="jumlah dokumen stunting sintetis (default 20000 tanpa --data)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--dynamic-text", action="store_true", help="mapping string sebagai text + subfield .keyword (mirip dynamic mapping ES)")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--reject-rate", type=float, default=0.0, help="peluang item _bulk ditolak 429")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="peluang request dijawab 503")
+    ap.add_argument("--record", default=None, help="rekam respons baca ke file NDJSON")
+    ap.add_argument("--replay", default=None, help="putar ulang respons dari file rekaman")
+    ap.add_argument("--replay-strict", action="store_true", help="404 untuk request baca yang tidak ada di rekaman")
+    ap.add_argument("--proxy", default=None, help="teruskan semua request ke cluster ini (dipakai bersama --record)")
+    args = ap.parse_args(argv)
+
+    synthetic = args.synthetic if args.synthetic is not None else (0 if args.data or args.proxy else 20000)
+    cluster, loaded = build_cluster(args.data, synthetic, args.seed, args.dynamic_text)
+    recorder = es_standin.Recorder(args.replay, args.record) if (args.replay or args.record) else None
+    app = es_standin.StandIn(cluster, args.latency_ms, args.jitter_ms, args.reject_rate, args.error_rate,
+                             recorder, args.proxy, args.replay_strict, args.seed)
+    server = es_standin.serve(app, args.host, args.port)
+    print(json.dumps({"url": f"http://{args.host}:{server.server_address[1]}", "indices": loaded,
+                      "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                      "proxy": args.proxy, "record": args.record, "replay": args.replay}, indent=2))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# StuntLytics/scripts/sync_snapshot.py
+# Sinkron inkremental index ES -> dataset Parquet lokal (src/snapshot_sync.py).
+#
+#   python -m scripts.sync_snapshot                   # sync ketiga index
+#   python -m scripts.sync_snapshot --index stunting-data --verify
+#   python -m scripts.sync_snapshot --lookback 90     # tarik ulang 90 hari di bawah HWM
+#   python -m scripts.sync_snapshot --full --compact  # tarik ulang semua lalu gabung part
+#   python -m scripts.sync_snapshot --mirror          # sekalian perbarui mirror lokal
+
+import argparse
+import json
+import sys
+
+from src import local_mirror, snapshot_sync
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Sinkron inkremental ES -> Parquet")
+    ap.add_argument("--index", action="append", help="index (default: stunting, balita, nakes)")
+    ap.add_argument("--full", action="store_true", help="abaikan high-water mark, tarik ulang semua")
+    ap.add_argument("--lookback", type=float, default=None,
+                    help="jendela tarik-ulang di bawah HWM (hari untuk Tanggal, tahun untuk field tahun)")
+    ap.add_argument("--compact", action="store_true", help="gabungkan part setelah sync")
+    ap.add_argument("--verify", action="store_true", help="bandingkan jumlah dokumen dengan ES")
+    ap.add_argument("--mirror", action="store_true", help="bangun ulang mirror lokal dari snapshot")
+    args = ap.parse_args()
+
+    indices = args.index or local_mirror.INDICES
+    report = {"sync": [snapshot_sync.sync(i, full=args.full, lookback=args.lookback) for i in indices]}
+    if args.compact:
+        report["compact"] = [snapshot_sync.compact(i) for i in indices]
+    if args.verify:
+        report["verify"] = [snapshot_sync.verify(i) for i in indices]
+    if args.mirror:
+        report["mirror"] = local_mirror.build_from_snapshot(indices)
+    print(json.dumps(report, indent=2, default=str))
+    if args.verify and not all(v["ok"] for v in report["verify"]):
+        for v in report["verify"]:
+            if not v["ok"]:
+                print(v["message"], file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
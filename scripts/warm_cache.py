@@ -0,0 +1,44 @@
+# StuntLytics/scripts/warm_cache.py
+# Panaskan cache ES untuk view dashboard tanpa filter dan per kabupaten (src/cache_warmer.py),
+# lalu cetak waktu per view. Cocok dijalankan via cron sebelum jam kerja / setelah ingest.
+#
+#   python -m scripts.warm_cache [--concurrency 4] [--limit 5] [--json]
+
+import argparse
+import asyncio
+import json
+from collections import defaultdict
+
+from src import cache_warmer
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Panaskan cache dashboard")
+    ap.add_argument("--concurrency", type=int, default=cache_warmer.WARM_CONCURRENCY, help="query paralel maksimum")
+    ap.add_argument("--limit", type=int, default=None, help="hanya N kabupaten pertama")
+    ap.add_argument("--json", action="store_true", help="cetak baris timing sebagai JSON")
+    args = ap.parse_args()
+
+    views = asyncio.run(cache_warmer.default_views(args.limit))
+    rows = cache_warmer.warm(views, args.concurrency)
+    if args.json:
+        for r in rows:
+            print(json.dumps(r, ensure_ascii=False))
+        return
+
+    per_view = defaultdict(list)
+    for r in rows:
+        per_view[r["view"]].append(r)
+    for label, _ in views:
+        items = per_view.get(label, [])
+        detail = "  ".join(f"{r['fungsi']}={r['ms']:.0f}ms" if r["ok"] else f"{r['fungsi']}=GAGAL" for r in items)
+        slowest = max((r["ms"] for r in items if r["ok"]), default=0.0)
+        print(f"{label:<30} maks {slowest:>8.0f} ms  {detail}")
+    failed = [r for r in rows if not r["ok"]]
+    print(f"{len(views)} view, {len(rows)} query, {len(failed)} gagal")
+    for r in failed[:10]:
+        print(f"  {r['view']} / {r['fungsi']}: {r['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# StuntLytics/src/cache_warmer.py
+# Pemanasan cache untuk tampilan dashboard default & per kabupaten.
+# - View = filter persis seperti yang dibentuk sidebar (tanpa filter, lalu satu kabupaten),
+#   sehingga body query & kunci src/query_cache.py sama dengan yang dipakai halaman.
+# - Per view: get_main_page_summary, get_monthly_trend, get_risk_map_data (elastic_client)
+#   dan summary_for_filters (utils/es, filter ala InsightNow). Hierarki wilayah sidebar ikut
+#   terpanaskan saat daftar view dibentuk.
+# - Dijalankan lewat src/elastic_client_async (konkurensi terbatas). Dalam proses app,
+#   hasilnya mengisi cache proses; dari CLI (scripts/warm_cache.py) yang terisi cache ES
+#   (request cache & page cache node).
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src import elastic_client_async as aes
+
+# Startup hook app: CACHE_WARM_ON_START=1 -> warm di thread latar saat proses pertama kali render.
+WARM_ON_START = os.getenv("CACHE_WARM_ON_START", "0").lower() in ("1", "true", "yes")
+WARM_CONCURRENCY = int(os.getenv("CACHE_WARM_CONCURRENCY", "4"))
+
+View = Tuple[str, Dict[str, Any]]
+
+
+def _sidebar_filters(wilayah_field: Optional[str], wilayah: List[str], kecamatan_field: Optional[str]) -> Dict[str, Any]:
+    # bentuk sama dengan components/sidebar.render()
+    return {
+        "date_from": None,
+        "date_to": None,
+        "wilayah": wilayah,
+        "kecamatan": [],
+        "risk_level": [],
+        "wilayah_field": wilayah_field,
+        "kecamatan_field": kecamatan_field,
+    }
+
+
+def _insight_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    # InsightNow selalu memakai field kanonik
+    out = dict(filters)
+    out["wilayah_field"], out["kecamatan_field"] = "nama_kabupaten_kota", "Kecamatan"
+    return out
+
+
+def _view_calls(filters: Dict[str, Any]) -> Dict[str, Callable[[], Any]]:
+    from utils import es as es_utils
+
+    return {
+        "get_main_page_summary": lambda: aes.get_main_page_summary(filters),
+        "get_monthly_trend": lambda: aes.get_monthly_trend(filters),
+        "get_risk_map_data": lambda: aes.get_risk_map_data(filters),
+        "summary_for_filters": lambda: aes.call(es_utils.summary_for_filters, _insight_filters(filters), min_n_kec=20),
+    }
+
+
+async def default_views(limit: Optional[int] = None) -> List[View]:
+    """View tanpa filter + satu view per kabupaten dari hierarki wilayah sidebar."""
+    hierarchy = await aes.get_region_hierarchy({"date_from": None, "date_to": None})
+    wilayah_field, kecamatan_field = hierarchy["wilayah_field"], hierarchy["kecamatan_field"]
+    kabupaten = sorted(hierarchy["tree"])
+    views: List[View] = [("(semua)", _sidebar_filters(wilayah_field, [], None))]
+    for kab in kabupaten[:limit] if limit else kabupaten:
+        views.append((kab, _sidebar_filters(wilayah_field, [kab], kecamatan_field)))
+    return views
+
+
+async def warm_async(views: Optional[List[View]] = None, concurrency: int = WARM_CONCURRENCY) -> List[Dict[str, Any]]:
+    """Jalankan semua fungsi per view; return baris timing {view, fungsi, ms, ok, error}."""
+    if views is None:
+        views = await default_views()
+    jobs = [(label, name, fn) for label, filters in views for name, fn in _view_calls(filters).items()]
+
+    async def run(job: Tuple[str, str, Callable[[], Any]]) -> float:
+        t0 = time.perf_counter()
+        await job[2]()
+        return (time.perf_counter() - t0) * 1000
+
+    rows = []
+    async for (label, name, _), res in aes.amap(run, jobs, limit=max(1, concurrency)):
+        ok = not isinstance(res, BaseException)
+        rows.append({"view": label, "fungsi": name, "ms": round(res, 1) if ok else None,
+                     "ok": ok, "error": None if ok else str(res)})
+    return rows
+
+
+def warm(views: Optional[List[View]] = None, concurrency: int = WARM_CONCURRENCY) -> List[Dict[str, Any]]:
+    return asyncio.run(warm_async(views, concurrency))
+
+
+# ------------------- startup hook -------------------
+
+_STARTED = {"done": False}
+_START_LOCK = threading.Lock()
+
+
+def start_background() -> bool:
+    """Mulai warm di thread daemon sekali per proses (jika CACHE_WARM_ON_START aktif)."""
+    with _START_LOCK:
+        if not WARM_ON_START or _STARTED["done"]:
+            return False
+        _STARTED["done"] = True
+
+    def run() -> None:
+        try:
+            warm()
+        except Exception:
+            pass  # warm-up bersifat best effort; halaman tetap query normal
+
+    threading.Thread(target=run, name="cache-warmer", daemon=True).start()
+    return True
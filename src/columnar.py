@@ -0,0 +1,71 @@
+# StuntLytics/src/columnar.py
+# Decoding hit ES langsung ke kolom (tanpa `pd.DataFrame([h["_source"] ...])`).
+# - Request memakai `docvalue_fields` + `_source: false`: ES mengirim nilai numerik yang
+#   sudah diketik dari doc values, payload lebih kecil daripada `_source` lengkap.
+# - Respons di-parse dengan orjson jika terpasang (fallback json stdlib).
+# - Nilai diisi ke array float64 yang dialokasikan sekali (NaN = kosong), tanpa dict
+#   per baris dan tanpa inferensi dtype oleh pandas.
+
+import json
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+def source_columns(hits: List[Dict[str, Any]], fields: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+    """Susun `_source` hit menjadi dict kolom -> list nilai (tanpa dict per baris).
+    `fields=None` memakai gabungan semua key yang muncul, urut kemunculan."""
+    sources = [h.get("_source", {}) for h in hits]
+    if fields is None:
+        seen: Dict[str, None] = {}
+        for src in sources:
+            for k in src:
+                seen.setdefault(k, None)
+        fields = list(seen)
+    return {f: [src.get(f) for src in sources] for f in fields}
+
+
+def docvalue_body(body: Dict[str, Any], fields: List[str], size: int) -> Dict[str, Any]:
+    """Salin body query dan minta hanya doc values `fields` (tanpa _source)."""
+    out = dict(body)
+    out.update({
+        "size": size,
+        "_source": False,
+        "docvalue_fields": [{"field": f} for f in fields],
+        "track_total_hits": False,
+    })
+    return out
+
+
+def decode_numeric_hits(raw: Union[bytes, str, Dict[str, Any]], fields: List[str]) -> Dict[str, np.ndarray]:
+    """Respons search (bytes/str/dict) -> {field: np.ndarray float64} sepanjang jumlah hit."""
+    data = _loads(raw) if isinstance(raw, (bytes, bytearray, str)) else raw
+    hits = data.get("hits", {}).get("hits", [])
+    n = len(hits)
+    cols = {f: np.full(n, np.nan, dtype=np.float64) for f in fields}
+    for i, h in enumerate(hits):
+        fv = h.get("fields")
+        if not fv:
+            continue
+        for f, vals in fv.items():
+            arr = cols.get(f)
+            if arr is None or not vals:
+                continue
+            v = vals[0]
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                arr[i] = v
+    return cols
+
+
+def numeric_frame(cols: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """DataFrame float64 tanpa salinan ulang; kolom yang seluruhnya kosong dibuang."""
+    keep = {f: a for f, a in cols.items() if a.size and not np.isnan(a).all()}
+    return pd.DataFrame(keep, copy=False)
@@ -2,7 +2,7 @@
 # VERSI FINAL - dengan nama fungsi render() yang standar dan filter risk level
 import streamlit as st
 from typing import Dict, Any, List
-from src import elastic_client as es
+from src.data_backend import es
 
 # BARU: Menambahkan kembali definisi RISK_LEVELS
 RISK_LEVELS: List[str] = [
@@ -16,7 +16,7 @@ RISK_LEVELS: List[str] = [
 def render() -> Dict[str, Any]:
     """
     Merender sidebar filter dinamis yang mengambil opsi dari Elasticsearch
-    dan mengembalikan dictionary berisi pilihan filter.
+    (hierarki wilayah ter-cache) dan mengembalikan dictionary berisi pilihan filter.
     """
     st.sidebar.header("Filter Data")
 
@@ -26,23 +26,18 @@ def render() -> Dict[str, Any]:
 
     base_filters = {"date_from": date_from, "date_to": date_to}
 
-    # Filter Wilayah (Kabupaten/Kota)
-    wilayah_field, wilayah_opts = es.get_filter_options(
-        base_filters, es.CANDIDATES_WILAYAH
-    )
+    # Hierarki kabupaten -> kecamatan: satu query ter-cache per versi data & rentang tanggal,
+    # opsi kecamatan diturunkan lokal sehingga ganti pilihan wilayah tidak query ke ES lagi.
+    hierarchy = es.get_region_hierarchy(base_filters)
+    wilayah_field = hierarchy["wilayah_field"]
+    wilayah_opts = sorted(hierarchy["tree"])
     selected_wilayah = st.sidebar.multiselect("Kabupaten/Kota", options=wilayah_opts)
 
     # Filter Kecamatan (berdasarkan pilihan wilayah)
     kecamatan_field, kecamatan_opts = None, []
     if selected_wilayah:
-        # Buat filter sementara untuk mengambil opsi kecamatan yang relevan
-        tmp_filters_for_kec = dict(base_filters)
-        tmp_filters_for_kec.update(
-            {"wilayah_field": wilayah_field, "wilayah": selected_wilayah}
-        )
-        kecamatan_field, kecamatan_opts = es.get_filter_options(
-            tmp_filters_for_kec, es.CANDIDATES_KECAMATAN, size=3000
-        )
+        kecamatan_field = hierarchy["kecamatan_field"]
+        kecamatan_opts = es.kecamatan_options(hierarchy, selected_wilayah)
 
     selected_kecamatan = st.sidebar.multiselect("Kecamatan", options=kecamatan_opts)
 
@@ -9,6 +9,7 @@ ES_URL = os.getenv("ES_URL", "http://localhost:9200")
 STUNTING_INDEX = os.getenv("STUNTING_INDEX", "stunting-data")
 BALITA_INDEX = os.getenv("BALITA_INDEX", "jabar-balita-desa")
 NUTRITION_INDEX = os.getenv("NUTRITION_INDEX", "jabar-tenaga-gizi")
+ROLLUP_INDEX = os.getenv("ROLLUP_INDEX", "stunting-rollup")
 
 # --- Konfigurasi API Lain ---
 DEFAULT_INSIGHT_API = os.getenv("OPENAI_API_KEY")
@@ -0,0 +1,15 @@
+# StuntLytics/src/data_backend.py
+# Pilih sumber data untuk halaman lewat config: DATA_BACKEND=es (default, query langsung ke
+# Elasticsearch) atau DATA_BACKEND=local (mirror kolumnar in-process, src/local_mirror.py).
+# Jika mirror lokal diminta tetapi belum dibangun / pyarrow tidak ada, tetap pakai ES.
+#
+#   from src.data_backend import es
+#   es.get_main_page_summary(filters)
+
+import os
+
+from src import elastic_client, local_mirror
+
+BACKEND = os.getenv("DATA_BACKEND", "es").lower()
+
+es = local_mirror if BACKEND == "local" and local_mirror.available() else elastic_client
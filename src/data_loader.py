@@ -1,8 +1,13 @@
+import os
 import pandas as pd
 import streamlit as st
-from . import elastic_client, config
+from . import elastic_client, config, query_cache
 import numpy as np
 
+# SNAPSHOT_SYNC=1: muat dari snapshot Parquet lokal yang disinkron inkremental
+# (src/snapshot_sync.py) alih-alih menarik ulang seluruh index dari ES.
+USE_SNAPSHOT = os.getenv("SNAPSHOT_SYNC", "0").lower() in ("1", "true", "yes")
+
 
 # --- (Salin dari implementasi sebelumnya, karena ini masih relevan) ---
 def create_dummy_data() -> pd.DataFrame:
@@ -88,6 +93,25 @@ def create_dummy_data() -> pd.DataFrame:
     return df
 
 
+# Kolom yang benar-benar dipakai process_and_merge_data (proyeksi _source saat ambil data)
+STUNTING_FIELDS = [
+    "nama_kabupaten_kota",
+    "Kecamatan",
+    "Tanggal",
+    "Usia Anak (bulan)",
+    "ASI Eksklusif (ya/tidak)",
+    "Imunisasi (lengkap/tidak lengkap)",
+    "Akses Air Bersih",
+    "Upah Keluarga (Rp/bulan)",
+    "Jumlah Anak",
+    "Pendidikan Ibu",
+    "Berat Lahir (gram)",
+    "Status Stunting (Stunting / Berisiko / Normal)",
+]
+BALITA_FIELDS = ["bps_nama_kabupaten_kota", "bps_nama_kecamatan", "jumlah_balita"]
+NAKES_FIELDS = ["nama_kabupaten_kota", "jumlah_nakes_gizi"]
+
+
 def _normalize_location(series: pd.Series) -> pd.Series:
     """Mengubah kolom lokasi menjadi format standar (UPPERCASE, STRIPPED)."""
     return series.astype(str).str.upper().str.strip()
@@ -228,18 +252,39 @@ def process_and_merge_data(df_stunting, df_balita, df_nakes):
     return df
 
 
+def _fetch_index(index: str, fields: list) -> pd.DataFrame:
+    if USE_SNAPSHOT:
+        from . import snapshot_sync
+
+        snapshot_sync.sync(index)
+        return snapshot_sync.load(index, fields)
+    return elastic_client.get_all_data(index, fields=fields)
+
+
+def load_data() -> pd.DataFrame:
+    """Fungsi utama untuk memuat dan memproses data dari Elasticsearch.
+
+    Cache Streamlit di-key dengan versi data ketiga index, sehingga hasil
+    hanya dimuat ulang setelah ada ingest baru.
+    """
+    versions = tuple(
+        query_cache.data_version(idx)
+        for idx in (config.STUNTING_INDEX, config.BALITA_INDEX, config.NUTRITION_INDEX)
+    )
+    return _load_data(versions)
+
+
 # !! PENTING: JIKA SUDAH BERHASIL, AKTIFKAN LAGI CACHE DI BAWAH INI !!
 @st.cache_data(show_spinner="Memuat data dari database...")
-def load_data() -> pd.DataFrame:
-    """Fungsi utama untuk memuat dan memproses data dari Elasticsearch."""
+def _load_data(versions: tuple) -> pd.DataFrame:
     ok, msg = elastic_client.ping()
     if not ok:
         st.error(msg)
         return create_dummy_data()
 
-    df_stunting = elastic_client.get_all_data(config.STUNTING_INDEX)
-    df_balita = elastic_client.get_all_data(config.BALITA_INDEX)
-    df_nakes = elastic_client.get_all_data(config.NUTRITION_INDEX)
+    df_stunting = _fetch_index(config.STUNTING_INDEX, STUNTING_FIELDS)
+    df_balita = _fetch_index(config.BALITA_INDEX, BALITA_FIELDS)
+    df_nakes = _fetch_index(config.NUTRITION_INDEX, NAKES_FIELDS)
 
     if df_stunting.empty:
         st.error(
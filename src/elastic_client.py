@@ -6,10 +6,19 @@
 #   (Jika mapping text, aktifkan fielddata/normalizer atau tambahkan subfield keyword di ES.)
 
 import os
-import time
+import queue
+import threading
 import requests
 import pandas as pd
-from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+try:  # opsional: perakitan kolom via Arrow lebih hemat memori
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from src import columnar, es_transport, query_cache, schema_registry
 
 try:
     from pathlib import Path
@@ -20,39 +29,103 @@ try:
 except Exception:
     pass
 
-ES_URL = os.getenv("ES_URL", "http://localhost:9200")
+ES_URL = es_transport.ES_URL
 STUNTING_INDEX = os.getenv("STUNTING_INDEX", "stunting-data")
 NUTRITION_INDEX = os.getenv("NUTRITION_INDEX", "jabar-tenaga-gizi")
 
 # ==== kandidat field tanpa ".keyword" (selaras dengan utils/es.py) ====
-CANDIDATES_WILAYAH = ["nama_kabupaten_kota", "Wilayah", "bps_nama_kabupaten_kota"]
-CANDIDATES_KECAMATAN = ["Kecamatan", "bps_nama_kecamatan"]
+# Field yang benar-benar dipakai di-resolve dari _mapping oleh src/schema_registry.py.
+CANDIDATES_WILAYAH = schema_registry.DIMENSIONS["wilayah"]
+CANDIDATES_KECAMATAN = schema_registry.DIMENSIONS["kecamatan"]
 
 # ------------------- HTTP helpers -------------------
-_SESSION = requests.Session()
-
-
-def _es_post(index: str, path: str, body: Dict[str, Any], timeout: int = 60, retries: int = 1) -> Dict[str, Any]:
-    url = f"{ES_URL}/{index}{path}"
-    last = None
-    for attempt in range(retries + 1):
+# Koneksi, pool, gzip & retry/backoff ditangani src/es_transport.py (dipakai bersama utils/es.py).
+
+
+# TTL cache hasil query per fungsi (detik), dipakai bersama semua sesi dalam proses.
+# Entri otomatis dibuang begitu versi data index berubah (lihat src/query_cache.py),
+# jadi TTL di sini hanya batas atas. Fungsi yang tidak terdaftar (mis. ekspor) tidak di-cache.
+CACHE_TTL: Dict[str, float] = {
+    "get_filter_options": 6 * 3600,
+    "get_main_page_summary": 6 * 3600,
+    "get_monthly_trend": 6 * 3600,
+    "get_numeric_sample_for_corr": 3600,
+    "get_correlation_with_target": 6 * 3600,
+    "get_explorer_data": 1800,
+    "get_top_counts_for_explorer_chart": 3600,
+    "get_risk_map_data": 6 * 3600,
+    "iter_composite": 6 * 3600,
+    "get_region_hierarchy": 6 * 3600,
+    "rollup_meta": query_cache.VERSION_CHECK_INTERVAL,
+}
+
+
+def _es_post(index: str, path: str, body: Dict[str, Any], timeout: int = 60, retries: Optional[int] = None,
+             cache: Optional[str] = None) -> Dict[str, Any]:
+    """POST ke ES; jika `cache` (nama fungsi) diisi, hasil di-cache sesuai CACHE_TTL."""
+    def fetch() -> Dict[str, Any]:
         try:
-            r = _SESSION.post(url, json=body, timeout=timeout)
-            r.raise_for_status()
-            return r.json()
+            return es_transport.post(index, path, body, timeout=timeout, retries=retries)
         except requests.exceptions.RequestException as e:
-            last = e
-            if attempt < retries:
-                time.sleep(0.5 * (2 ** attempt))
-    raise ConnectionError(f"Gagal menghubungi Elasticsearch di {url}: {last}")
+            raise ConnectionError(f"Gagal menghubungi Elasticsearch di {ES_URL}/{index}{path}: {e}")
+
+    if cache is None or cache not in CACHE_TTL:
+        return fetch()
+    return query_cache.cached(cache, index, path, body, fetch, ttl=CACHE_TTL[cache])
 
 
 def ping() -> Tuple[bool, str]:
+    return es_transport.ping()
+
+
+# ------------------- fan-out paralel -------------------
+# Query independen dalam satu render halaman dijalankan bersamaan di pool thread bersama,
+# sehingga latensi halaman ~ max() query, bukan sum(). Pool dibatasi FANOUT_WORKERS
+# (tetap di bawah ES_POOL_SIZE) dan seluruh grup dibatasi satu deadline.
+FANOUT_WORKERS = int(os.getenv("ES_FANOUT_WORKERS", "8"))
+FANOUT_DEADLINE = float(os.getenv("ES_FANOUT_DEADLINE", "90"))
+
+_FANOUT_POOL: Optional[ThreadPoolExecutor] = None
+_FANOUT_LOCK = threading.Lock()
+_FANOUT_LOCAL = threading.local()
+
+
+def _fanout_pool() -> ThreadPoolExecutor:
+    global _FANOUT_POOL
+    if _FANOUT_POOL is None:
+        with _FANOUT_LOCK:
+            if _FANOUT_POOL is None:
+                _FANOUT_POOL = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="es-fanout")
+    return _FANOUT_POOL
+
+
+def _in_worker(fn: Callable[[], Any]) -> Any:
+    _FANOUT_LOCAL.active = True
     try:
-        r = _SESSION.get(ES_URL, timeout=5)
-        return r.status_code == 200, f"ES {ES_URL} status {r.status_code}"
-    except Exception as e:
-        return False, f"Gagal hubungi ES: {e}"
+        return fn()
+    finally:
+        _FANOUT_LOCAL.active = False
+
+
+def fan_out(calls: Dict[str, Callable[[], Any]], deadline: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Jalankan `calls` (nama -> fungsi tanpa argumen) secara paralel, return nama -> hasil.
+    Exception pertama (urut `calls`) dilempar ulang; jika `deadline` detik terlampaui,
+    TimeoutError (query yang masih jalan tetap selesai di belakang dan mengisi cache).
+    Dipanggil dari dalam worker fan-out, semua dijalankan berurutan agar pool tidak deadlock.
+    """
+    if len(calls) <= 1 or getattr(_FANOUT_LOCAL, "active", False):
+        return {name: fn() for name, fn in calls.items()}
+    deadline = FANOUT_DEADLINE if deadline is None else deadline
+    pool = _fanout_pool()
+    futures = {name: pool.submit(_in_worker, fn) for name, fn in calls.items()}
+    _, pending = wait(futures.values(), timeout=deadline)
+    if pending:
+        for f in pending:
+            f.cancel()
+        late = [name for name, f in futures.items() if f in pending]
+        raise TimeoutError(f"Query ES melewati batas {deadline:g} detik: {', '.join(late)}")
+    return {name: f.result() for name, f in futures.items()}
 
 
 # ------------------- filter & query builder -------------------
@@ -68,8 +141,28 @@ def _date_range(field: str, start: Optional[pd.Timestamp], end: Optional[pd.Time
     return {"range": {field: rng}}
 
 
+# Zona risiko (label sama dengan sidebar.RISK_LEVELS) -> range probabilitas.
+RISK_FIELD = "Probabilitas Stunting (simulasi)"
+RISK_ZONES: Dict[str, Dict[str, float]] = {
+    "Zona 3 (>=0.70)": {"gte": 0.70},
+    "Zona 2 (0.40-<0.70)": {"gte": 0.40, "lt": 0.70},
+    "Zona 1 (0.10-<0.40)": {"gte": 0.10, "lt": 0.40},
+    "Zona 0 (<0.10)": {"lt": 0.10},
+}
+
+
+def wilayah_field(filters: Dict[str, Any]) -> str:
+    """Field wilayah filter: pilihan sidebar, kalau kosong hasil resolve _mapping."""
+    return filters.get("wilayah_field") or schema_registry.resolve(STUNTING_INDEX, "wilayah", "Wilayah")
+
+
+def kecamatan_field(filters: Dict[str, Any]) -> str:
+    return filters.get("kecamatan_field") or schema_registry.resolve(STUNTING_INDEX, "kecamatan", "Kecamatan")
+
+
 def build_query(filters: Dict[str, Any]) -> Dict[str, Any]:
-    """Selaras utils/es.py: gunakan wilayah_field/kecamatan_field jika ada, fallback default.
+    """Selaras utils/es.py: gunakan wilayah_field/kecamatan_field jika ada, fallback ke field
+    hasil resolve _mapping (subfield keyword dipakai otomatis jika field utama bertipe text).
     - date_from/date_to boleh pd.Timestamp atau string ISO.
     - terms diisi dari list pada filters["wilayah"]/["kecamatan"].
     """
@@ -78,37 +171,47 @@ def build_query(filters: Dict[str, Any]) -> Dict[str, Any]:
     if filters.get("date_from") or filters.get("date_to"):
         must.append(_date_range("Tanggal", filters.get("date_from"), filters.get("date_to")))
 
-    field_w = filters.get("wilayah_field") or "Wilayah"
-    field_k = filters.get("kecamatan_field") or "Kecamatan"
-
     if filters.get("wilayah"):
+        field_w = schema_registry.term_field(STUNTING_INDEX, wilayah_field(filters))
         must.append({"terms": {field_w: filters["wilayah"]}})
     if filters.get("kecamatan"):
+        field_k = schema_registry.term_field(STUNTING_INDEX, kecamatan_field(filters))
         must.append({"terms": {field_k: filters["kecamatan"]}})
 
     # Risk bucket (opsional, jika dipakai di beberapa layar)
     if filters.get("risk_level"):
-        ranges: List[Dict[str, Any]] = []
-        for rl in filters["risk_level"]:
-            if rl == "Zona 3 (>=0.70)":
-                ranges.append({"range": {"Probabilitas Stunting (simulasi)": {"gte": 0.70}}})
-            elif rl == "Zona 2 (0.40-<0.70)":
-                ranges.append({"range": {"Probabilitas Stunting (simulasi)": {"gte": 0.40, "lt": 0.70}}})
-            elif rl == "Zona 1 (0.10-<0.40)":
-                ranges.append({"range": {"Probabilitas Stunting (simulasi)": {"gte": 0.10, "lt": 0.40}}})
-            elif rl == "Zona 0 (<0.10)":
-                ranges.append({"range": {"Probabilitas Stunting (simulasi)": {"lt": 0.10}}})
+        ranges = [{"range": {RISK_FIELD: RISK_ZONES[rl]}} for rl in filters["risk_level"] if rl in RISK_ZONES]
         if ranges:
             must.append({"bool": {"should": ranges, "minimum_should_match": 1}})
 
     return {"query": {"bool": {"must": must}}} if must else {"query": {"match_all": {}}}
 
 
+# ------------------- Mode index ternormalisasi -------------------
+# scripts/normalize_index.py menulis ulang index stunting dengan field boolean tunggal hasil
+# normalisasi varian nilai ("Ya"/"ya"/"1"/"true"/..., dua nama field, fallback Z-Score).
+# Jika mapping index punya semua field ini (ES_NORMALIZED=auto) atau dipaksa ES_NORMALIZED=1,
+# filter memakai satu `term` boolean alih-alih terms multi-nilai + OR lintas field.
+NORMALIZED_FIELDS = ["is_stunting", "imunisasi_lengkap", "akses_air_layak", "asi_eksklusif"]
+NORMALIZED_MODE = os.getenv("ES_NORMALIZED", "auto").lower()
+
+
+def normalized() -> bool:
+    if NORMALIZED_MODE in ("0", "off", "false", "no"):
+        return False
+    if NORMALIZED_MODE in ("1", "on", "true", "yes"):
+        return True
+    schema = schema_registry.get(STUNTING_INDEX)
+    return schema is not None and all(schema.fields.get(f) == "boolean" for f in NORMALIZED_FIELDS)
+
+
 # ------------------- Pola filter stunting_any (shared) -------------------
 _STUNTING_BINER = ["Stunting", "Ya", "YA", "ya", "1", "true", "TRUE", "True"]
 
 
 def _stunting_any_filter() -> Dict[str, Any]:
+    if normalized():
+        return {"term": {"is_stunting": True}}
     return {
         "bool": {
             "should": [
@@ -121,15 +224,215 @@ def _stunting_any_filter() -> Dict[str, Any]:
     }
 
 
+# ------------------- Composite aggregation pager -------------------
+# Pengganti `terms` ber-size besar (3000-5000) yang berat di node koordinator dan diam-diam
+# memotong hasil: composite agg dibaca per halaman dengan `after_key` sampai habis.
+COMPOSITE_PAGE_SIZE = int(os.getenv("ES_COMPOSITE_PAGE_SIZE", "1000"))
+
+
+def composite_body(
+    base: Dict[str, Any],
+    sources: Dict[str, Any],
+    aggs: Optional[Dict[str, Any]] = None,
+    size: int = COMPOSITE_PAGE_SIZE,
+    after: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Body `size: 0` berisi composite agg "c". `sources` = nama kunci -> field (jadi source
+    `terms`) atau spesifikasi source lengkap (mis. `date_histogram`); urutan dipertahankan."""
+    comp: Dict[str, Any] = {
+        "size": size,
+        "sources": [
+            {name: spec if isinstance(spec, dict) else {"terms": {"field": spec}}}
+            for name, spec in sources.items()
+        ],
+    }
+    if after:
+        comp["after"] = after
+    agg: Dict[str, Any] = {"composite": comp}
+    if aggs:
+        agg["aggs"] = aggs
+    body = dict(base)
+    body.update({"size": 0, "aggs": {"c": agg}})
+    return body
+
+
+def iter_composite(
+    index: str,
+    sources: Dict[str, Any],
+    base: Optional[Dict[str, Any]] = None,
+    aggs: Optional[Dict[str, Any]] = None,
+    page_size: int = COMPOSITE_PAGE_SIZE,
+    first_page: Optional[Dict[str, Any]] = None,
+    cache: Optional[str] = "iter_composite",
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream semua bucket composite agg, halaman demi halaman. Tiap bucket berbentuk
+    {"key": {nama: nilai, ...}, "doc_count": n, <sub-agg>...}.
+    `first_page` = respons halaman pertama yang sudah diambil (mis. lewat `_msearch`)
+    dengan body `composite_body(base, sources, aggs, page_size)`.
+    """
+    base = base or {}
+    data = first_page
+    after: Optional[Dict[str, Any]] = None
+    while True:
+        if data is None:
+            body = composite_body(base, sources, aggs, page_size, after)
+            data = _es_post(index, "/_search", body, cache=cache)
+        comp = data.get("aggregations", {}).get("c", {})
+        buckets = comp.get("buckets", [])
+        yield from buckets
+        after = comp.get("after_key")
+        if after is None or len(buckets) < page_size:
+            return
+        data = None
+
+
+def composite_values(index: str, field: str, base: Optional[Dict[str, Any]] = None) -> List[Any]:
+    """Semua nilai unik `field` (tanpa batas size), urut sesuai key."""
+    return [b["key"]["v"] for b in iter_composite(index, {"v": field}, base)]
+
+
+# ------------------- Rollup kabupaten x kecamatan x bulan x zona -------------------
+# Index pra-agregasi dari scripts/build_rollup.py (satu dokumen per sel, berisi count & sum).
+# Fungsi agregat di bawah menjawab dari rollup bila filter aktif hanya menyentuh dimensi
+# rollup (kabupaten, kecamatan, bulan penuh, zona risiko), rollup dibangun dari versi data
+# index raw yang sama, dan field wilayah/kecamatan filter serta mode ternormalisasi sama dengan
+# yang dicatat di dokumen meta saat build; selain itu tetap query ke data raw.
+# Opt-in (ES_ROLLUP=1) setelah scripts/build_rollup.py dijalankan: tanpa rollup, router hanya
+# menambah satu GET dokumen meta (404) sebelum jatuh ke raw.
+ROLLUP_INDEX = os.getenv("ROLLUP_INDEX", "stunting-rollup")
+ROLLUP_ENABLED = os.getenv("ES_ROLLUP", "0").lower() in ("1", "true", "yes")
+ROLLUP_NO_ZONE = "Tanpa Zona"
+ROLLUP_META_ID = "meta"
+
+_AIR_LAYAK = ["Layak", "Ya", "Bersih", "Aman"]
+_IMUN_LENGKAP = ["lengkap", "Lengkap", "complete", "Complete"]
+_IMUNISASI_FIELDS = ["Imunisasi (lengkap/tidak lengkap)", "Status Imunisasi Anak"]
+
+
+def _imunisasi_fields() -> List[str]:
+    """Field yang dihitung sebagai total imunisasi (satu field boolean pada index ternormalisasi)."""
+    return ["imunisasi_lengkap"] if normalized() else _IMUNISASI_FIELDS
+
+
+def _imunisasi_lengkap_filter() -> Dict[str, Any]:
+    if normalized():
+        return {"term": {"imunisasi_lengkap": True}}
+    return {"bool": {"should": [{"terms": {f: _IMUN_LENGKAP}} for f in _IMUNISASI_FIELDS], "minimum_should_match": 1}}
+
+
+def _air_field() -> str:
+    """Field yang dihitung sebagai total akses air (boolean pada index ternormalisasi)."""
+    return "akses_air_layak" if normalized() else "Akses Air Bersih"
+
+
+def _air_layak_filter() -> Dict[str, Any]:
+    if normalized():
+        return {"term": {"akses_air_layak": True}}
+    return {"terms": {"Akses Air Bersih": _AIR_LAYAK}}
+
+
+def _sum(field: str) -> Dict[str, Any]:
+    return {"sum": {"field": field}}
+
+
+def _rollup_meta() -> Dict[str, Any]:
+    """Dokumen meta rollup ({} jika rollup belum pernah dibangun / tidak terjangkau)."""
+    path = f"/_doc/{ROLLUP_META_ID}"
+
+    def fetch() -> Dict[str, Any]:
+        try:
+            return es_transport.get(ROLLUP_INDEX, path, timeout=10, retries=0).get("_source", {})
+        except requests.exceptions.RequestException:
+            return {}
+
+    return query_cache.cached("rollup_meta", ROLLUP_INDEX, path, None, fetch, ttl=CACHE_TTL["rollup_meta"])
+
+
+def _whole_months(date_from: Any, date_to: Any) -> bool:
+    if date_from and pd.Timestamp(date_from).day != 1:
+        return False
+    if date_to and not pd.Timestamp(date_to).is_month_end:
+        return False
+    return True
+
+
+def rollup_query(filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Query untuk ROLLUP_INDEX yang setara `build_query(filters)`, atau None jika harus ke raw."""
+    if not ROLLUP_ENABLED:
+        return None
+    if not _whole_months(filters.get("date_from"), filters.get("date_to")):
+        return None
+    meta = _rollup_meta()
+    if not meta or meta.get("source_version") != query_cache.data_version(STUNTING_INDEX):
+        return None
+    if wilayah_field(filters) != meta.get("wilayah_field") or kecamatan_field(filters) != meta.get("kecamatan_field"):
+        return None
+    if bool(meta.get("normalized")) != normalized():
+        return None
+
+    must: List[Dict[str, Any]] = [{"term": {"doc_type": "cell"}}]
+    if filters.get("date_from") or filters.get("date_to"):
+        must.append(_date_range("bulan", filters.get("date_from"), filters.get("date_to")))
+    if filters.get("wilayah"):
+        must.append({"terms": {"kabupaten": filters["wilayah"]}})
+    if filters.get("kecamatan"):
+        must.append({"terms": {"kecamatan": filters["kecamatan"]}})
+    zones = [rl for rl in filters.get("risk_level") or [] if rl in RISK_ZONES]
+    if zones:
+        must.append({"terms": {"zona": zones}})
+    return {"query": {"bool": {"filter": must}}}
+
+
+def rollup_kecamatan_rows(filters: Dict[str, Any]) -> Optional[Iterator[Dict[str, Any]]]:
+    """Baris per kecamatan (n, avg_prob, jumlah stunting/anemia/bblr/lila_low/anc_low) dari
+    rollup, atau None jika filter tidak bisa dijawab rollup."""
+    rq = rollup_query(filters)
+    return None if rq is None else _iter_rollup_kecamatan(rq)
+
+
+def _iter_rollup_kecamatan(rq: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    counts = ["stunting", "anemia", "bblr", "lila_low", "anc_low"]
+    aggs = {f: _sum(f) for f in ["n", "prob_sum", "prob_count"] + counts}
+    # kabupaten dengan dokumen terbanyak (bukan sel terbanyak), sama dengan `wil` di utils/es.py
+    aggs["wil"] = {"terms": {"field": "kabupaten", "size": 1, "order": [{"n": "desc"}, {"_key": "asc"}]},
+                   "aggs": {"n": _sum("n")}}
+    for b in iter_composite(ROLLUP_INDEX, {"kec": "kecamatan"}, rq, aggs):
+        prob_n = b["prob_count"]["value"]
+        wil = b["wil"]["buckets"]
+        row = {
+            "Wilayah": wil[0]["key"] if wil else None,
+            "Kecamatan": b["key"]["kec"],
+            "n": int(b["n"]["value"]),
+            "avg_prob": (b["prob_sum"]["value"] / prob_n) if prob_n else None,
+        }
+        row.update({f: int(b[f]["value"]) for f in counts})
+        yield row
+
+
+# ------------------- Kubus OLAP in-process -------------------
+# KPI, trend, peta risiko & top-N explorer dijawab dulu dari kubus src/olap_cube.py bila filternya
+# bisa. Kubus dibangun di thread latar sekali per versi data (query_cache.data_version); selama
+# kubus versi terbaru belum siap, atau OLAP_CUBE_ES=0, jawaban tetap dari rollup / data raw.
+
+def _cube(filters: Dict[str, Any], advanced: Optional[Dict[str, Any]] = None) -> Any:
+    from src import olap_cube  # impor lambat: olap_cube bergantung pada modul ini
+
+    if not olap_cube.ES_ENABLED:
+        return None
+    return olap_cube.for_filters(filters, advanced, wait=False)
+
+
 # ------------------- Fungsi untuk Sidebar (deteksi opsi) -------------------
 
 def get_filter_options(base_filters: Dict[str, Any], field_candidates: List[str], size: int = 500) -> Tuple[Optional[str], List[str]]:
-    """Coba field candidates berurutan, return (field_terpakai, opsi_terurut)."""
-    for field in field_candidates:
+    """Coba field candidates (hanya yang ada di _mapping) berurutan, return (field_terpakai, opsi_terurut)."""
+    for field in schema_registry.candidates(STUNTING_INDEX, field_candidates):
         try:
             body = build_query(base_filters)
-            body.update({"size": 0, "aggs": {"opts": {"terms": {"field": field, "size": size}}}})
-            data = _es_post(STUNTING_INDEX, "/_search", body)
+            agg_field = schema_registry.term_field(STUNTING_INDEX, field)
+            body.update({"size": 0, "aggs": {"opts": {"terms": {"field": agg_field, "size": size}}}})
+            data = _es_post(STUNTING_INDEX, "/_search", body, cache="get_filter_options")
             buckets = data.get("aggregations", {}).get("opts", {}).get("buckets", [])
             if buckets:
                 options = [b["key"] for b in buckets]
@@ -139,42 +442,119 @@ def get_filter_options(base_filters: Dict[str, Any], field_candidates: List[str]
     return None, []
 
 
+def _region_hierarchy(base: Dict[str, Any]) -> Dict[str, Any]:
+    fallback = None
+    term = lambda f: schema_registry.term_field(STUNTING_INDEX, f)
+    kec_fields = schema_registry.candidates(STUNTING_INDEX, CANDIDATES_KECAMATAN) or [None]
+    for wf in schema_registry.candidates(STUNTING_INDEX, CANDIDATES_WILAYAH):
+        for kf in kec_fields:
+            sources: Dict[str, Any] = {"kab": term(wf)}
+            if kf is not None:
+                sources["kec"] = {"terms": {"field": term(kf), "missing_bucket": True}}
+            tree: Dict[str, List[str]] = {}
+            try:
+                for b in iter_composite(STUNTING_INDEX, sources, base, cache=None):
+                    kecs = tree.setdefault(b["key"]["kab"], [])
+                    if b["key"].get("kec") is not None:
+                        kecs.append(b["key"]["kec"])
+            except Exception:
+                continue
+            if any(tree.values()):
+                return {"wilayah_field": wf, "kecamatan_field": kf, "tree": tree}
+            if tree and fallback is None:
+                # field kabupaten ada tetapi kandidat kecamatan ini kosong -> coba kandidat lain dulu
+                fallback = {"wilayah_field": wf, "kecamatan_field": None, "tree": tree}
+        if fallback is not None:
+            return fallback
+    return {"wilayah_field": None, "kecamatan_field": None, "tree": {}}
+
+
+def get_region_hierarchy(base_filters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pohon kabupaten -> [kecamatan] untuk sidebar dari satu composite agg dua source,
+    di-cache sebagai satu entri per versi data & rentang tanggal. Opsi kecamatan untuk
+    pilihan kabupaten mana pun diturunkan lokal dari pohon ini (lihat `kecamatan_options`).
+    Return {"wilayah_field", "kecamatan_field", "tree": {kabupaten: [kecamatan, ...]}}.
+    """
+    base = build_query({"date_from": base_filters.get("date_from"), "date_to": base_filters.get("date_to")})
+    key = {"base": base, "wilayah": CANDIDATES_WILAYAH, "kecamatan": CANDIDATES_KECAMATAN}
+    return query_cache.cached("get_region_hierarchy", STUNTING_INDEX, "/_search", key,
+                              lambda: _region_hierarchy(base), ttl=CACHE_TTL["get_region_hierarchy"])
+
+
+def kecamatan_options(hierarchy: Dict[str, Any], wilayah: List[str]) -> List[str]:
+    tree = hierarchy.get("tree", {})
+    return sorted({k for w in wilayah for k in tree.get(w, [])})
+
+
 # ------------------- Halaman Utama (summary) -------------------
 
-def get_main_page_summary(filters: Dict[str, Any]) -> Dict[str, Any]:
-    """Ambil KPI & chart, diselaraskan dengan utils/es.py (tanpa .keyword)."""
-    # 1) Query utama stunting
-    stunting_body = build_query(filters)
-    stunting_body.update(
+def _main_stunting_stats(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Angka dasar KPI halaman utama, dari kubus / rollup jika bisa, selain itu dari data raw."""
+    cube = _cube(filters)
+    if cube is not None:
+        return cube.main_stats(filters)
+    rq = rollup_query(filters)
+    if rq is not None:
+        body = dict(rq)
+        body.update({
+            "size": 0,
+            "aggs": {
+                **{f: _sum(f) for f in ["n", "stunting", "imun_lengkap", "imun_total", "air_layak", "air_total"]},
+                "trend": {
+                    "date_histogram": {"field": "bulan", "calendar_interval": "month", "format": "yyyy-MM"},
+                    "aggs": {"n": _sum("n"), "imun_lengkap": _sum("imun_lengkap")},
+                },
+            },
+        })
+        agg = _es_post(ROLLUP_INDEX, "/_search", body, cache="get_main_page_summary").get("aggregations", {})
+        out = {k: int(agg[k]["value"] or 0) for k in ["stunting", "imun_lengkap", "imun_total", "air_layak", "air_total"]}
+        out["total"] = int(agg["n"]["value"] or 0)
+        out["trend"] = [
+            (b["key_as_string"], int(b["n"]["value"] or 0), int(b["imun_lengkap"]["value"] or 0))
+            for b in agg.get("trend", {}).get("buckets", [])
+        ]
+        return out
+
+    body = build_query(filters)
+    body.update(
         {
             "size": 0,
             "track_total_hits": True,
             "aggs": {
                 "stunting_count": {"filter": _stunting_any_filter()},
-                "imunisasi_lengkap": {
-                    "filter": {"bool": {"should": [
-                        {"terms": {"Imunisasi (lengkap/tidak lengkap)": ["lengkap", "Lengkap", "complete", "Complete"]}},
-                        {"terms": {"Status Imunisasi Anak": ["lengkap", "Lengkap", "complete", "Complete"]}},
-                    ], "minimum_should_match": 1}},
-                },
-                "total_imunisasi_field_1": {"value_count": {"field": "Imunisasi (lengkap/tidak lengkap)"}},
-                "total_imunisasi_field_2": {"value_count": {"field": "Status Imunisasi Anak"}},
-                "air_bersih_dist": {"terms": {"field": "Akses Air Bersih", "size": 10}},
+                "imunisasi_lengkap": {"filter": _imunisasi_lengkap_filter()},
+                **{f"total_imunisasi_field_{i}": {"value_count": {"field": f}}
+                   for i, f in enumerate(_imunisasi_fields(), start=1)},
+                "air_layak": {"filter": _air_layak_filter()},
+                "air_total": {"value_count": {"field": _air_field()}},
                 "imunisasi_trend": {
                     "date_histogram": {"field": "Tanggal", "calendar_interval": "month", "format": "yyyy-MM"},
-                    "aggs": {
-                        "imunisasi_lengkap_in_bucket": {
-                            "filter": {"bool": {"should": [
-                                {"terms": {"Imunisasi (lengkap/tidak lengkap)": ["lengkap", "Lengkap", "complete", "Complete"]}},
-                                {"terms": {"Status Imunisasi Anak": ["lengkap", "Lengkap", "complete", "Complete"]}},
-                            ], "minimum_should_match": 1}}
-                        }
-                    },
+                    "aggs": {"imunisasi_lengkap_in_bucket": {"filter": _imunisasi_lengkap_filter()}},
                 },
             },
         }
     )
+    data = _es_post(STUNTING_INDEX, "/_search", body, cache="get_main_page_summary")
+    s_agg = data.get("aggregations", {})
+    return {
+        "total": data.get("hits", {}).get("total", {}).get("value", 0),
+        "stunting": s_agg.get("stunting_count", {}).get("doc_count", 0),
+        "imun_lengkap": s_agg.get("imunisasi_lengkap", {}).get("doc_count", 0),
+        "imun_total": (s_agg.get("total_imunisasi_field_1", {}).get("value", 0) or 0)
+        + (s_agg.get("total_imunisasi_field_2", {}).get("value", 0) or 0),
+        "air_layak": s_agg.get("air_layak", {}).get("doc_count", 0),
+        "air_total": int(s_agg.get("air_total", {}).get("value", 0) or 0),
+        "trend": [
+            (b["key_as_string"], b["doc_count"], b["imunisasi_lengkap_in_bucket"]["doc_count"])
+            for b in s_agg.get("imunisasi_trend", {}).get("buckets", [])
+        ],
+    }
+
 
+def get_main_page_summary(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Ambil KPI & chart, diselaraskan dengan utils/es.py (tanpa .keyword)."""
+    # 1) Angka stunting: lihat _main_stunting_stats (rollup atau raw)
     # 2) Query nakes (index jabar-tenaga-gizi)
     nakes_must: List[Dict[str, Any]] = []
     if filters.get("wilayah"):
@@ -193,25 +573,23 @@ def get_main_page_summary(filters: Dict[str, Any]) -> Dict[str, Any]:
                                             "aggs": {"sum_nakes_in_bucket": {"sum": {"field": "jumlah_nakes_gizi"}}}},
                   }}
 
-    stunting_data = _es_post(STUNTING_INDEX, "/_search", stunting_body)
-    nakes_data = _es_post(NUTRITION_INDEX, "/_search", nakes_body)
-
-    s_agg = stunting_data.get("aggregations", {})
+    res = fan_out({
+        "stunting": lambda: _main_stunting_stats(filters),
+        "nakes": lambda: _es_post(NUTRITION_INDEX, "/_search", nakes_body, cache="get_main_page_summary"),
+    })
+    st_stats, nakes_data = res["stunting"], res["nakes"]
     n_agg = nakes_data.get("aggregations", {})
 
-    total_lahir = stunting_data.get("hits", {}).get("total", {}).get("value", 0)
-    total_stunting = s_agg.get("stunting_count", {}).get("doc_count", 0)
+    total_lahir = st_stats["total"]
+    total_stunting = st_stats["stunting"]
 
     # imunisasi coverage
-    imun_lengkap = s_agg.get("imunisasi_lengkap", {}).get("doc_count", 0)
-    tot1 = s_agg.get("total_imunisasi_field_1", {}).get("value", 0)
-    tot2 = s_agg.get("total_imunisasi_field_2", {}).get("value", 0)
-    imun_total = (tot1 or 0) + (tot2 or 0)
+    imun_lengkap = st_stats["imun_lengkap"]
+    imun_total = st_stats["imun_total"]
     imun_cov_pct = (imun_lengkap / imun_total * 100.0) if imun_total else 0.0
 
-    air_buckets = s_agg.get("air_bersih_dist", {}).get("buckets", [])
-    air_layak_count = sum(b["doc_count"] for b in air_buckets if b["key"] in ["Layak", "Ya", "Bersih", "Aman"])
-    air_total = sum(b["doc_count"] for b in air_buckets)
+    air_layak_count = st_stats["air_layak"]
+    air_total = st_stats["air_total"]
     air_cov_pct = (air_layak_count / air_total * 100.0) if air_total else 0.0
 
     nakes_buckets = n_agg.get("nakes_by_region", {}).get("buckets", [])
@@ -226,11 +604,9 @@ def get_main_page_summary(filters: Dict[str, Any]) -> Dict[str, Any]:
         nakes_grouped = pd.Series([], dtype="float64", name="jumlah_nakes")
 
     imun_trend_rows: List[Dict[str, Any]] = []
-    for b in s_agg.get("imunisasi_trend", {}).get("buckets", []):
-        total_in_bucket = b["doc_count"]
-        lengkap_in_bucket = b["imunisasi_lengkap_in_bucket"]["doc_count"]
+    for bulan, total_in_bucket, lengkap_in_bucket in st_stats["trend"]:
         imun_trend_rows.append({
-            "tanggal": pd.to_datetime(b["key_as_string"]),
+            "tanggal": pd.to_datetime(bulan),
             "imunisasi_lengkap": (lengkap_in_bucket / total_in_bucket) if total_in_bucket > 0 else 0,
         })
     imunisasi_per_bulan = pd.DataFrame(imun_trend_rows)
@@ -256,44 +632,143 @@ def get_main_page_summary(filters: Dict[str, Any]) -> Dict[str, Any]:
 # ------------------- Correlation trend (mirror utils/es.py) -------------------
 
 def get_monthly_trend(filters: Dict[str, Any]) -> pd.DataFrame:
-    body = build_query(filters)
-    body.update({
-        "size": 0,
-        "aggs": {
-            "per_month": {
-                "date_histogram": {"field": "Tanggal", "calendar_interval": "month", "format": "yyyy-MM"},
-                "aggs": {
-                    "stunting_any": {"filter": _stunting_any_filter()},
-                    "total_in_month": {"filter": {"match_all": {}}},
-                },
-            }
-        },
-    })
-    res = _es_post(STUNTING_INDEX, "/_search", body)
+    cube = _cube(filters)
+    if cube is not None:
+        return cube.monthly_trend(filters)
+    rq = rollup_query(filters)
+    if rq is not None:
+        body = dict(rq)
+        body.update({
+            "size": 0,
+            "aggs": {
+                "per_month": {
+                    "date_histogram": {"field": "bulan", "calendar_interval": "month", "format": "yyyy-MM"},
+                    "aggs": {"n": _sum("n"), "stunting": _sum("stunting")},
+                }
+            },
+        })
+        res = _es_post(ROLLUP_INDEX, "/_search", body, cache="get_monthly_trend")
+        months = [(b["key_as_string"], b["n"]["value"] or 0, b["stunting"]["value"] or 0)
+                  for b in res["aggregations"]["per_month"]["buckets"]]
+    else:
+        body = build_query(filters)
+        body.update({
+            "size": 0,
+            "aggs": {
+                "per_month": {
+                    "date_histogram": {"field": "Tanggal", "calendar_interval": "month", "format": "yyyy-MM"},
+                    "aggs": {
+                        "stunting_any": {"filter": _stunting_any_filter()},
+                        "total_in_month": {"filter": {"match_all": {}}},
+                    },
+                }
+            },
+        })
+        res = _es_post(STUNTING_INDEX, "/_search", body, cache="get_monthly_trend")
+        months = [(b["key_as_string"], b["total_in_month"]["doc_count"], b["stunting_any"]["doc_count"])
+                  for b in res["aggregations"]["per_month"]["buckets"]]
     rows: List[Dict[str, Any]] = []
-    for b in res["aggregations"]["per_month"]["buckets"]:
-        total = b["total_in_month"]["doc_count"]
-        stunting = b["stunting_any"]["doc_count"]
+    for bulan, total, stunting in months:
         percent = (stunting / total * 100) if total > 0 else 0
-        rows.append({"Bulan": b["key_as_string"], "Stunting %": round(percent, 2)})
+        rows.append({"Bulan": bulan, "Stunting %": round(percent, 2)})
     return pd.DataFrame(rows).set_index("Bulan")
 
 
 # ------------------- Numeric sample for correlation -------------------
 
-def get_numeric_sample_for_corr(filters: Dict[str, Any], size: int = 5000) -> pd.DataFrame:
+def _es_post_raw(index: str, path: str, body: Dict[str, Any], timeout: int = 60, cache: Optional[str] = None) -> bytes:
+    """Seperti _es_post tetapi mengembalikan bytes mentah (di-decode oleh src/columnar.py)."""
+    def fetch() -> bytes:
+        try:
+            return es_transport.post_raw(index, path, body, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            raise ConnectionError(f"Gagal menghubungi Elasticsearch di {ES_URL}/{index}{path}: {e}")
+
+    if cache is None or cache not in CACHE_TTL:
+        return fetch()
+    return query_cache.cached(cache, index, path + "#raw", body, fetch, ttl=CACHE_TTL[cache])
+
+
+def get_numeric_sample_for_corr(filters: Dict[str, Any], size: int = 5000, fields: Optional[List[str]] = None) -> pd.DataFrame:
+    """Sampel kolom numerik (float64) via docvalue_fields, di-decode langsung ke array NumPy.
+    Tanpa `fields`: semua field numerik di _mapping (setara kolom numerik `_source` sebelumnya)."""
+    fields = fields or schema_registry.numeric_fields(STUNTING_INDEX, [CORR_TARGET] + CORR_FIELDS)
+    body = columnar.docvalue_body(build_query(filters), fields, size)
+    raw = _es_post_raw(STUNTING_INDEX, "/_search", body, cache="get_numeric_sample_for_corr")
+    return columnar.numeric_frame(columnar.decode_numeric_hits(raw, fields))
+
+
+# ------------------- Korelasi server-side (matrix_stats) -------------------
+
+CORR_TARGET = "Z-Score TB/U"
+CORR_FIELDS: List[str] = [
+    "Probabilitas Stunting (simulasi)",
+    "Usia Anak (bulan)",
+    "Berat Lahir (gram)",
+    "Upah Keluarga (Rp/bulan)",
+    "Rata-rata UMP Wilayah (Rp/bulan)",
+    "Jumlah Anak",
+    "Tinggi Badan Ibu (cm)",
+    "BMI Pra-Hamil",
+    "Hb (g/dL)",
+    "LiLA saat Hamil (cm)",
+    "Kunjungan ANC (x)",
+    "Usia Ibu saat Hamil (tahun)",
+]
+
+
+def _corr_from_sample(filters: Dict[str, Any], target: str, size: int) -> pd.Series:
+    df = get_numeric_sample_for_corr(filters, size=size)
+    if df.empty or target not in df.columns or df.shape[1] < 2:
+        return pd.Series(dtype=float)
+    return df.corr(numeric_only=True)[target].drop(target, errors="ignore").dropna()
+
+
+def get_correlation_with_target(
+    filters: Dict[str, Any],
+    target: str = CORR_TARGET,
+    fields: Optional[List[str]] = None,
+    sample_size: int = 5000,
+) -> pd.Series:
+    """
+    Korelasi Pearson tiap field numerik terhadap `target` atas SELURUH dokumen yang
+    lolos filter, dihitung ES lewat agregasi `matrix_stats` berpasangan (target, field),
+    sehingga setara `DataFrame.corr` pairwise tanpa mengunduh dokumen.
+    Jika agregasi gagal (mis. field bukan numerik), jatuh ke sampel `sample_size` dokumen.
+    """
+    fields = [f for f in (fields or CORR_FIELDS) if f != target]
     body = build_query(filters)
-    body.update({"size": size})
-    data = _es_post(STUNTING_INDEX, "/_search", body)
-    hits = data.get("hits", {}).get("hits", [])
-    df_sample = pd.DataFrame([h.get("_source", {}) for h in hits])
-    if df_sample.empty:
-        return pd.DataFrame()
-    return df_sample.select_dtypes(include=["number"]).copy()
+    body.update({
+        "size": 0,
+        "aggs": {f"m{i}": {"matrix_stats": {"fields": [target, f]}} for i, f in enumerate(fields)},
+    })
+    try:
+        data = _es_post(STUNTING_INDEX, "/_search", body, cache="get_correlation_with_target")
+    except Exception:
+        return _corr_from_sample(filters, target, sample_size)
+
+    aggs = data.get("aggregations", {})
+    corr: Dict[str, float] = {}
+    for i, f in enumerate(fields):
+        for stat in aggs.get(f"m{i}", {}).get("fields", []):
+            if stat.get("name") == target:
+                val = (stat.get("correlation") or {}).get(f)
+                if val is not None and stat.get("count", 0) > 1:
+                    corr[f] = float(val)
+    if not corr:
+        return _corr_from_sample(filters, target, sample_size)
+    return pd.Series(corr, dtype=float).dropna()
 
 
 # ------------------- Explorer Data -------------------
 
+# Nilai filter lanjutan (ASI / akses air) -> nilai field yang cocok; field lama & baru sama-sama dicek.
+ASI_FIELDS = ["ASI Eksklusif", "ASI Eksklusif (ya/tidak)"]
+ASI_VALUES = {"Ya": ["Ya", "ya", "True", "true", "1"], "Tidak": ["Tidak", "tidak", "False", "false", "0"]}
+AIR_FIELDS = ["Akses Air", "Akses Air Bersih"]
+AIR_VALUES = {"Ada": ["Layak", "Ada", "Ya", "Bersih", "Aman"], "Tidak": ["Tidak Layak", "Tidak", "Tidak Ada"]}
+
+
 def _apply_advanced_filters_to_query(body: dict, advanced_filters: dict) -> dict:
     has_advanced = any(
         (isinstance(advanced_filters.get(k), list) and advanced_filters.get(k))
@@ -316,20 +791,18 @@ def _apply_advanced_filters_to_query(body: dict, advanced_filters: dict) -> dict
         must.append({"terms": {"Pendidikan Ibu": advanced_filters["pendidikan_ibu"]}})
 
     if advanced_filters.get("asi_eksklusif") != "Semua":
-        val = (["Ya", "ya", "True", "true", "1"] if advanced_filters["asi_eksklusif"] == "Ya"
-               else ["Tidak", "tidak", "False", "false", "0"])
-        must.append({"bool": {"should": [
-            {"terms": {"ASI Eksklusif": val}},
-            {"terms": {"ASI Eksklusif (ya/tidak)": val}},
-        ], "minimum_should_match": 1}})
+        if normalized():
+            must.append({"term": {"asi_eksklusif": advanced_filters["asi_eksklusif"] == "Ya"}})
+        else:
+            val = ASI_VALUES["Ya" if advanced_filters["asi_eksklusif"] == "Ya" else "Tidak"]
+            must.append({"bool": {"should": [{"terms": {f: val}} for f in ASI_FIELDS], "minimum_should_match": 1}})
 
     if advanced_filters.get("akses_air") != "Semua":
-        val = (["Layak", "Ada", "Ya", "Bersih", "Aman"] if advanced_filters["akses_air"] == "Ada"
-               else ["Tidak Layak", "Tidak", "Tidak Ada"])
-        must.append({"bool": {"should": [
-            {"terms": {"Akses Air": val}},
-            {"terms": {"Akses Air Bersih": val}},
-        ], "minimum_should_match": 1}})
+        if normalized():
+            must.append({"term": {"akses_air_layak": advanced_filters["akses_air"] == "Ada"}})
+        else:
+            val = AIR_VALUES["Ada" if advanced_filters["akses_air"] == "Ada" else "Tidak"]
+            must.append({"bool": {"should": [{"terms": {f: val}} for f in AIR_FIELDS], "minimum_should_match": 1}})
 
     return body
 
@@ -355,10 +828,13 @@ def get_explorer_data(filters: dict, advanced_filters: dict, size: int = 1000) -
     body["_source"] = source_fields
     body["size"] = size
     body["sort"] = [{"Z-Score TB/U": "asc"}]
+    # total tidak dipakai; tanpa hitungan total, index yang di-sort Z-Score (scripts/optimize_index.py)
+    # bisa berhenti setelah `size` dokumen pertama per segmen
+    body["track_total_hits"] = False
 
-    data = _es_post(STUNTING_INDEX, "/_search", body)
+    data = _es_post(STUNTING_INDEX, "/_search", body, cache="get_explorer_data")
     hits = data.get("hits", {}).get("hits", [])
-    df = pd.DataFrame([h.get("_source", {}) for h in hits])
+    df = pd.DataFrame(columnar.source_columns(hits, source_fields), columns=source_fields) if hits else pd.DataFrame()
 
     if not df.empty:
         df = df.rename(columns={
@@ -372,17 +848,20 @@ def get_explorer_data(filters: dict, advanced_filters: dict, size: int = 1000) -
 
 def get_top_counts_for_explorer_chart(filters: dict, advanced_filters: dict) -> pd.DataFrame:
     """Chart berjenjang 5 besar; jika ada filters['wilayah'] -> agregasi kecamatan, else kabupaten."""
+    cube = _cube(filters, advanced_filters)
+    if cube is not None:
+        return cube.top_counts(filters, advanced_filters)
     if filters.get("wilayah"):
-        agg_field, level_label = "Kecamatan", "Kecamatan"
+        agg_field, level_label = kecamatan_field(filters), "Kecamatan"
     else:
-        agg_field, level_label = "nama_kabupaten_kota", "Kabupaten/Kota"
+        agg_field, level_label = wilayah_field(filters), "Kabupaten/Kota"
 
     body = build_query(filters)
     body = _apply_advanced_filters_to_query(body, advanced_filters)
     body["size"] = 0
-    body["aggs"] = {"counts_by_region": {"terms": {"field": agg_field, "size": 5}}}
+    body["aggs"] = {"counts_by_region": {"terms": {"field": schema_registry.term_field(STUNTING_INDEX, agg_field), "size": 5}}}
 
-    data = _es_post(STUNTING_INDEX, "/_search", body)
+    data = _es_post(STUNTING_INDEX, "/_search", body, cache="get_top_counts_for_explorer_chart")
     buckets = data.get("aggregations", {}).get("counts_by_region", {}).get("buckets", [])
 
     if not buckets:
@@ -392,73 +871,307 @@ def get_top_counts_for_explorer_chart(filters: dict, advanced_filters: dict) ->
     return df
 
 
+# ------------------- Ekspor massal (PIT + sliced search_after) -------------------
+SCAN_PAGE_SIZE = int(os.getenv("ES_SCAN_PAGE_SIZE", "5000"))
+SCAN_SLICES = int(os.getenv("ES_SCAN_SLICES", "4"))
+PIT_KEEP_ALIVE = os.getenv("ES_PIT_KEEP_ALIVE", "2m")
+_SCAN_FILTER_PATH = "pit_id,hits.hits._id,hits.hits._source,hits.hits.sort"
+
+
+def _open_pit(index: str, keep_alive: str = PIT_KEEP_ALIVE) -> str:
+    try:
+        return es_transport.request("POST", f"/{index}/_pit", params={"keep_alive": keep_alive}).json()["id"]
+    except requests.exceptions.RequestException as e:
+        raise ConnectionError(f"Gagal membuka point-in-time untuk index {index}: {e}")
+
+
+def _close_pit(pit_id: str) -> None:
+    try:
+        es_transport.request("DELETE", "/_pit", {"id": pit_id}, retries=0)
+    except Exception:
+        pass  # PIT akan kedaluwarsa sendiri setelah keep_alive
+
+
+def _iter_pit_pages(
+    pit_id: str,
+    body: Dict[str, Any],
+    sort: Optional[List[Any]] = None,
+    slice_id: Optional[int] = None,
+    slice_max: int = 1,
+    page_size: int = SCAN_PAGE_SIZE,
+    search_after: Optional[List[Any]] = None,
+    keep_alive: str = PIT_KEEP_ALIVE,
+    filter_path: str = _SCAN_FILTER_PATH,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield list hit per halaman dari satu PIT (opsional satu slice), paging dengan search_after."""
+    while True:
+        req = dict(body)
+        req.update({
+            "size": page_size,
+            "pit": {"id": pit_id, "keep_alive": keep_alive},
+            "sort": sort or [{"_shard_doc": "asc"}],
+            "track_total_hits": False,
+        })
+        if slice_max > 1 and slice_id is not None:
+            req["slice"] = {"id": slice_id, "max": slice_max}
+        if search_after is not None:
+            req["search_after"] = search_after
+        try:
+            res = es_transport.request("POST", "/_search", req, params={"filter_path": filter_path}).json()
+        except requests.exceptions.RequestException as e:
+            raise ConnectionError(f"Gagal membaca halaman PIT dari Elasticsearch: {e}")
+        pit_id = res.get("pit_id", pit_id)
+        hits = res.get("hits", {}).get("hits", [])
+        if not hits:
+            return
+        yield hits
+        if len(hits) < page_size:
+            return
+        search_after = hits[-1]["sort"]
+
+
+def _hits_to_columns(hits: List[Dict[str, Any]], fields: Optional[List[str]], include_id: bool = False) -> Dict[str, List[Any]]:
+    """Susun hit menjadi dict kolom -> list nilai (tanpa membangun dict per baris)."""
+    cols = columnar.source_columns(hits, fields)
+    if include_id:
+        cols = {"_id": [h.get("_id") for h in hits], **cols}
+    return cols
+
+
+def _columns_to_table(cols: Dict[str, List[Any]]):
+    """Satu halaman -> pyarrow.Table (jika tersedia) atau DataFrame."""
+    if pa is not None:
+        try:
+            return pa.Table.from_pydict(cols)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # tipe campur dalam satu kolom (mis. angka & string) -> simpan sebagai string
+            return pa.Table.from_pydict({
+                k: [None if v is None else str(v) for v in vals] if _mixed(vals) else vals
+                for k, vals in cols.items()
+            })
+    return pd.DataFrame(cols)
+
+
+def _mixed(vals: List[Any]) -> bool:
+    kinds = {type(v) for v in vals if v is not None}
+    return len(kinds) > 1 and not kinds <= {int, float}
+
+
+def _concat_tables(tables: List[Any]) -> pd.DataFrame:
+    """Gabungkan tabel halaman menjadi satu DataFrame. `tables` dikosongkan: dengan pyarrow,
+    buffer kolom dilepas satu per satu selama konversi (self_destruct), jadi puncak memori
+    ~ satu salinan data + satu kolom, bukan seluruh halaman + salinan gabungannya."""
+    if not tables:
+        return pd.DataFrame()
+    if pa is not None:
+        try:
+            table = pa.concat_tables(tables, promote_options="permissive")
+        except TypeError:  # pyarrow < 14
+            table = pa.concat_tables(tables, promote=True)
+        tables.clear()  # concat_tables tidak menyalin; referensi tinggal di `table`
+        return table.to_pandas(self_destruct=True, split_blocks=True)
+    df = pd.concat(tables, ignore_index=True, sort=False)
+    tables.clear()
+    return df
+
+
+_SLICE_DONE = object()
+
+
+def scan_index(
+    index: str,
+    fields: Optional[List[str]] = None,
+    query: Optional[Dict[str, Any]] = None,
+    slices: int = SCAN_SLICES,
+    page_size: int = SCAN_PAGE_SIZE,
+    include_id: bool = False,
+    max_pending: Optional[int] = None,
+) -> Iterator[Any]:
+    """
+    Stream seluruh dokumen `index` (opsional dibatasi `query`) memakai satu point-in-time
+    dan `slices` sliced search_after paralel. Yield satu tabel per halaman (pyarrow.Table
+    jika tersedia, kalau tidak DataFrame) begitu tiba dari slice mana pun; urutan antar
+    slice tidak dijamin. Slice berhenti membaca selama `max_pending` halaman (default
+    2 x slices) belum diambil pemanggil, jadi memori dibatasi jumlah halaman itu.
+    """
+    body: Dict[str, Any] = {"query": query or {"match_all": {}}}
+    body["_source"] = fields if fields is not None else True
+    slices = max(1, int(slices))
+    pit_id = _open_pit(index)
+    try:
+        if slices == 1:
+            for hits in _iter_pit_pages(pit_id, body, page_size=page_size):
+                yield _columns_to_table(_hits_to_columns(hits, fields, include_id))
+            return
+
+        pending: "queue.Queue[Any]" = queue.Queue(maxsize=max_pending or 2 * slices)
+        stop = threading.Event()
+
+        def put(item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False  # pemanggil berhenti membaca / slice lain gagal
+
+        def run_slice(slice_id: int) -> None:
+            try:
+                for hits in _iter_pit_pages(pit_id, body, slice_id=slice_id, slice_max=slices, page_size=page_size):
+                    if not put(_columns_to_table(_hits_to_columns(hits, fields, include_id))):
+                        return
+            except BaseException as e:
+                put(e)
+                return
+            put(_SLICE_DONE)
+
+        pool = ThreadPoolExecutor(max_workers=slices, thread_name_prefix="es-scan")
+        try:
+            for i in range(slices):
+                pool.submit(run_slice, i)
+            done = 0
+            while done < slices:
+                item = pending.get()
+                if item is _SLICE_DONE:
+                    done += 1
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
+            pool.shutdown(wait=True)
+    finally:
+        _close_pit(pit_id)
+
+
+def get_all_data(
+    index: str,
+    fields: Optional[List[str]] = None,
+    query: Optional[Dict[str, Any]] = None,
+    slices: int = SCAN_SLICES,
+    page_size: int = SCAN_PAGE_SIZE,
+) -> pd.DataFrame:
+    """Ambil seluruh isi index sebagai DataFrame (PIT + sliced search_after paralel, perakitan kolom via Arrow).
+
+    `fields` membatasi `_source` agar payload kecil; None = semua field. Halaman dari
+    `scan_index` langsung dijadikan tabel kolom (hit mentah tidak ditahan), lalu
+    dikonversi sekali tanpa menyimpan salinan ganda (lihat `_concat_tables`).
+    """
+    return _concat_tables(list(scan_index(index, fields=fields, query=query, slices=slices, page_size=page_size)))
+
+
 # ------------------- Ekspor data explorer -------------------
 
-def get_explorer_data_for_export(filters: dict, advanced_filters: dict, size: int = 5000) -> pd.DataFrame:
+EXPORT_FIELDS: List[str] = [
+    "Tanggal",
+    "nama_kabupaten_kota",
+    "Kecamatan",
+    "Status Stunting (Biner)",
+    "Z-Score TB/U",
+    "Probabilitas Stunting (simulasi)",
+    "Usia Anak (bulan)",
+    "Berat Lahir (gram)",
+    "ASI Eksklusif",
+    "Status Imunisasi Anak",
+    "Pendidikan Ibu",
+    "Akses Air Bersih",
+    "Kepesertaan Program Bantuan",
+    "Upah Keluarga (Rp/bulan)",
+    "Jumlah Anak",
+    "Tinggi Badan Ibu (cm)",
+    "BMI Pra-Hamil",
+    "Hb (g/dL)",
+    "LiLA saat Hamil (cm)",
+    "Kunjungan ANC (x)",
+    "Paparan Asap Rokok",
+    "Jenis Pekerjaan Orang Tua",
+]
+_EXPORT_SORT = [{"Z-Score TB/U": "asc"}]
+
+
+def _explorer_export_query(filters: dict, advanced_filters: dict) -> Dict[str, Any]:
     body = build_query(filters)
-    body = _apply_advanced_filters_to_query(body, advanced_filters)
-    source_fields = [
-        "Tanggal",
-        "nama_kabupaten_kota",
-        "Kecamatan",
-        "Status Stunting (Biner)",
-        "Z-Score TB/U",
-        "Probabilitas Stunting (simulasi)",
-        "Usia Anak (bulan)",
-        "Berat Lahir (gram)",
-        "ASI Eksklusif",
-        "Status Imunisasi Anak",
-        "Pendidikan Ibu",
-        "Akses Air Bersih",
-        "Kepesertaan Program Bantuan",
-        "Upah Keluarga (Rp/bulan)",
-        "Jumlah Anak",
-        "Tinggi Badan Ibu (cm)",
-        "BMI Pra-Hamil",
-        "Hb (g/dL)",
-        "LiLA saat Hamil (cm)",
-        "Kunjungan ANC (x)",
-        "Paparan Asap Rokok",
-        "Jenis Pekerjaan Orang Tua",
-    ]
-    body["_source"] = source_fields
+    return _apply_advanced_filters_to_query(body, advanced_filters)
+
+
+def get_explorer_data_for_export(filters: dict, advanced_filters: dict, size: int = 5000) -> pd.DataFrame:
+    body = _explorer_export_query(filters, advanced_filters)
+    body["_source"] = EXPORT_FIELDS
     body["size"] = size
-    body["sort"] = [{"Z-Score TB/U": "asc"}]
+    body["sort"] = _EXPORT_SORT
 
     data = _es_post(STUNTING_INDEX, "/_search", body)
     hits = data.get("hits", {}).get("hits", [])
     return pd.DataFrame([h.get("_source", {}) for h in hits])
 
 
+def count_explorer_export(filters: dict, advanced_filters: dict) -> int:
+    """Jumlah baris yang akan diekspor (untuk progress bar)."""
+    body = {"query": _explorer_export_query(filters, advanced_filters)["query"]}
+    return int(_es_post(STUNTING_INDEX, "/_count", body).get("count", 0))
+
+
+def iter_explorer_export_pages(
+    filters: dict,
+    advanced_filters: dict,
+    fields: Optional[List[str]] = None,
+    page_size: int = SCAN_PAGE_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream seluruh hasil filter explorer per halaman (DataFrame), urut Z-Score naik,
+    memakai point-in-time + search_after sehingga tidak ada batas jumlah baris
+    dan memori tetap datar.
+    """
+    fields = fields or EXPORT_FIELDS
+    body = _explorer_export_query(filters, advanced_filters)
+    body["_source"] = fields
+    pit_id = _open_pit(STUNTING_INDEX)
+    try:
+        for hits in _iter_pit_pages(pit_id, body, sort=_EXPORT_SORT, page_size=page_size):
+            yield pd.DataFrame(_hits_to_columns(hits, fields), columns=fields)
+    finally:
+        _close_pit(pit_id)
+
+
 # ------------------- Risk Map (kabupaten & kecamatan) -------------------
 
-def get_risk_map_data(filters: dict) -> pd.DataFrame:
-    body = build_query(filters)
-    body["size"] = 0
-    body["aggs"] = {
-        "by_kab": {
-            "terms": {"field": "nama_kabupaten_kota", "size": 100},
-            "aggs": {
-                "by_kec": {
-                    "terms": {"field": "Kecamatan", "size": 5000},
-                    "aggs": {"stunting_count": {"filter": _stunting_any_filter()}}
-                }
-            }
-        }
+def _region_sources(filters: Dict[str, Any]) -> Dict[str, str]:
+    """Source composite kabupaten & kecamatan: field hasil resolve, subfield keyword bila text."""
+    return {
+        "kabupaten": schema_registry.term_field(STUNTING_INDEX, wilayah_field(filters)),
+        "kecamatan": schema_registry.term_field(STUNTING_INDEX, kecamatan_field(filters)),
     }
 
-    data = _es_post(STUNTING_INDEX, "/_search", body)
 
+def get_risk_map_data(filters: dict) -> pd.DataFrame:
+    cube = _cube(filters)
+    if cube is not None:
+        return cube.risk_map(filters)
     rows: List[Dict[str, Any]] = []
-    kab_buckets = data.get("aggregations", {}).get("by_kab", {}).get("buckets", [])
-    for kab_b in kab_buckets:
-        kab_name = kab_b["key"]
-        for kec_b in kab_b.get("by_kec", {}).get("buckets", []):
-            rows.append({
-                "kabupaten": kab_name,
-                "kecamatan": kec_b["key"],
-                "total_anak": kec_b["doc_count"],
-                "jumlah_stunting": kec_b["stunting_count"]["doc_count"],
-            })
+    rq = rollup_query(filters)
+    if rq is not None:
+        buckets = iter_composite(
+            ROLLUP_INDEX, {"kabupaten": "kabupaten", "kecamatan": "kecamatan"}, rq,
+            aggs={"n": _sum("n"), "stunting": _sum("stunting")}, cache="get_risk_map_data",
+        )
+        counts = ((b, int(b["n"]["value"]), int(b["stunting"]["value"])) for b in buckets)
+    else:
+        buckets = iter_composite(
+            STUNTING_INDEX,
+            _region_sources(filters),
+            build_query(filters),
+            aggs={"stunting_count": {"filter": _stunting_any_filter()}},
+            cache="get_risk_map_data",
+        )
+        counts = ((b, b["doc_count"], b["stunting_count"]["doc_count"]) for b in buckets)
+    for b, total, stunting in counts:
+        rows.append({
+            "kabupaten": b["key"]["kabupaten"],
+            "kecamatan": b["key"]["kecamatan"],
+            "total_anak": total,
+            "jumlah_stunting": stunting,
+        })
 
-    return pd.DataFrame(rows)
+    return pd.DataFrame(rows, columns=["kabupaten", "kecamatan", "total_anak", "jumlah_stunting"])
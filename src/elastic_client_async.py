@@ -0,0 +1,196 @@
+# StuntLytics/src/elastic_client_async.py
+# Varian asyncio dari src/elastic_client.py untuk job batch (laporan per kabupaten,
+# cache warming, build rollup) yang mengirim ratusan query agregasi.
+# - Fungsi publik sama nama & argumen dengan elastic_client, tetapi `async`.
+#   Logika query/parse tidak diduplikasi: tiap panggilan menjalankan fungsi sinkron di
+#   executor khusus, jadi cache (src/query_cache.py), rollup, sketch, dsb. ikut terpakai.
+# - Konkurensi dibatasi ES_ASYNC_CONCURRENCY (semaphore + executor berukuran sama) dan tidak
+#   melebihi pool koneksi keep-alive es_transport (ES_POOL_SIZE).
+# - Backpressure: `amap` hanya menarik item berikutnya dari iterable jika ada slot kosong
+#   (antrian terbatas); respons 429/503 ES di-retry dengan backoff oleh es_transport.
+#
+#   async def job():
+#       kabs = (await get_filter_options({}, CANDIDATES_WILAYAH))[1]
+#       async for kab, res in amap(lambda k: get_main_page_summary({"wilayah": [k]}), kabs):
+#           ...
+#   asyncio.run(job())
+
+import asyncio
+import functools
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+import pandas as pd
+
+from src import elastic_client as ec
+from src import es_transport
+
+CONCURRENCY = max(1, min(int(os.getenv("ES_ASYNC_CONCURRENCY", "16")), es_transport.POOL_SIZE))
+
+# builder query murni (tanpa I/O) -> dipakai langsung
+build_query = ec.build_query
+kecamatan_options = ec.kecamatan_options
+STUNTING_INDEX = ec.STUNTING_INDEX
+NUTRITION_INDEX = ec.NUTRITION_INDEX
+CANDIDATES_WILAYAH = ec.CANDIDATES_WILAYAH
+CANDIDATES_KECAMATAN = ec.CANDIDATES_KECAMATAN
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+# semaphore terikat ke event loop -> satu per loop; entri hilang bersama loop-nya
+# (asyncio.run per job membuat loop baru, id(loop) bisa dipakai ulang oleh loop lain)
+_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_SEMAPHORES_LOCK = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="es-async")
+    return _EXECUTOR
+
+
+def _semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _SEMAPHORES_LOCK:
+        sem = _SEMAPHORES.get(loop)
+        if sem is None:
+            sem = _SEMAPHORES[loop] = asyncio.Semaphore(CONCURRENCY)
+    return sem
+
+
+async def _run(fn: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+    async with _semaphore():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor(), functools.partial(fn, *args, **kwargs))
+
+
+# ------------------- helper batch -------------------
+
+async def call(fn: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+    """Jalankan fungsi sinkron lain (mis. utils/es) di bawah batas konkurensi yang sama."""
+    return await _run(fn, *args, **kwargs)
+
+
+async def gather(*aws: Awaitable[Any], return_exceptions: bool = False) -> List[Any]:
+    """asyncio.gather; konkurensi ES tetap dibatasi semaphore di `_run`."""
+    return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+
+async def amap(
+    fn: Callable[[T], Awaitable[R]],
+    items: Iterable[T],
+    limit: int = CONCURRENCY,
+) -> AsyncIterator[Tuple[T, Any]]:
+    """
+    Jalankan `fn(item)` untuk tiap item dengan paling banyak `limit` berjalan bersamaan,
+    yield (item, hasil) sesuai urutan selesai. Exception per item di-yield sebagai hasil
+    (job batch biasanya ingin lanjut); item baru hanya diambil saat ada slot kosong.
+    """
+    it = iter(items)
+    pending: Dict[asyncio.Task, T] = {}
+
+    def fill() -> None:
+        while len(pending) < limit:
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            pending[asyncio.ensure_future(fn(item))] = item
+
+    fill()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = pending.pop(task)
+                exc = task.exception()
+                yield item, exc if exc is not None else task.result()
+            fill()
+    finally:
+        # konsumen berhenti lebih awal -> jangan tinggalkan task menggantung
+        for task in pending:
+            task.cancel()
+
+
+# ------------------- fungsi setara elastic_client -------------------
+
+async def ping() -> Tuple[bool, str]:
+    return await _run(ec.ping)
+
+
+async def get_filter_options(base_filters: Dict[str, Any], field_candidates: List[str], size: int = 500) -> Tuple[Optional[str], List[str]]:
+    return await _run(ec.get_filter_options, base_filters, field_candidates, size)
+
+
+async def get_region_hierarchy(base_filters: Dict[str, Any]) -> Dict[str, Any]:
+    return await _run(ec.get_region_hierarchy, base_filters)
+
+
+async def composite_values(index: str, field: str, base: Optional[Dict[str, Any]] = None) -> List[Any]:
+    return await _run(ec.composite_values, index, field, base)
+
+
+async def get_main_page_summary(filters: Dict[str, Any]) -> Dict[str, Any]:
+    return await _run(ec.get_main_page_summary, filters)
+
+
+async def get_monthly_trend(filters: Dict[str, Any]) -> pd.DataFrame:
+    return await _run(ec.get_monthly_trend, filters)
+
+
+async def get_risk_map_data(filters: dict) -> pd.DataFrame:
+    return await _run(ec.get_risk_map_data, filters)
+
+
+async def get_numeric_sample_for_corr(filters: Dict[str, Any], size: int = 5000, fields: Optional[List[str]] = None) -> pd.DataFrame:
+    return await _run(ec.get_numeric_sample_for_corr, filters, size, fields)
+
+
+async def get_correlation_with_target(
+    filters: Dict[str, Any],
+    target: str = ec.CORR_TARGET,
+    fields: Optional[List[str]] = None,
+    sample_size: int = 5000,
+) -> pd.Series:
+    return await _run(ec.get_correlation_with_target, filters, target, fields, sample_size)
+
+
+async def get_explorer_data(filters: dict, advanced_filters: dict, size: int = 1000) -> pd.DataFrame:
+    return await _run(ec.get_explorer_data, filters, advanced_filters, size)
+
+
+async def get_top_counts_for_explorer_chart(filters: dict, advanced_filters: dict) -> pd.DataFrame:
+    return await _run(ec.get_top_counts_for_explorer_chart, filters, advanced_filters)
+
+
+async def count_explorer_export(filters: dict, advanced_filters: dict) -> int:
+    return await _run(ec.count_explorer_export, filters, advanced_filters)
+
+
+async def get_explorer_data_for_export(filters: dict, advanced_filters: dict, size: int = 5000) -> pd.DataFrame:
+    return await _run(ec.get_explorer_data_for_export, filters, advanced_filters, size)
+
+
+async def get_all_data(
+    index: str,
+    fields: Optional[List[str]] = None,
+    query: Optional[Dict[str, Any]] = None,
+    slices: int = ec.SCAN_SLICES,
+    page_size: int = ec.SCAN_PAGE_SIZE,
+) -> pd.DataFrame:
+    # scan_index sudah paralel per slice di dalam satu slot
+    return await _run(ec.get_all_data, index, fields, query, slices, page_size)
+
+
+async def search(index: str, body: Dict[str, Any], cache: Optional[str] = None) -> Dict[str, Any]:
+    """`_search` mentah untuk agregasi khusus job batch (cache opsional, lihat CACHE_TTL)."""
+    return await _run(ec._es_post, index, "/_search", body, cache=cache)
@@ -0,0 +1,1546 @@
+# StuntLytics/src/es_standin.py
+# Pengganti Elasticsearch lokal (stdlib saja) untuk benchmark & uji fungsi src/elastic_client.py,
+# utils/es.py dan script di scripts/ tanpa cluster.
+# - Dataset in-memory per index (dokumen JSON datar), mapping diinfer dari nilai pertama
+#   (atau dari mapping eksplisit PUT /<index>).
+# - Subset API yang dipakai repo: ping, `_search` (query bool/term/terms/range/exists/ids/match,
+#   sort, search_after, PIT + slice, _source, docvalue_fields, filter_path), agregasi terms,
+#   filter(s), date_histogram, histogram, avg/sum/min/max/stats/value_count/cardinality,
+#   percentiles, top_hits, composite, matrix_stats, missing; `_count`, `_msearch`, `_bulk`,
+#   `_mapping`, `_settings`, `_pit`, `_aliases`, `_reindex` (+ `_tasks`), `_doc`.
+# - Latensi (+ jitter) disuntik per request; penolakan 429 per item `_bulk` dan 503 per
+#   request bisa disimulasikan untuk menguji retry es_transport.
+# - Rekam & putar ulang: respons baca (search/msearch/count) bisa direkam ke NDJSON, termasuk
+#   dari cluster asli (mode proxy), lalu diputar ulang offline berdasarkan hash (method, path, body).
+# Jalankan lewat scripts/serve_es_standin.py; `ES_URL=http://127.0.0.1:9201` untuk aplikasi.
+
+import calendar
+import fnmatch
+import functools
+import gzip
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+Doc = Tuple[str, Dict[str, Any], int]  # (_id, _source, urutan/seq_no)
+Pred = Callable[[Doc], bool]
+
+_NUMERIC = {"long", "integer", "short", "byte", "double", "float", "half_float", "scaled_float", "unsigned_long"}
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$")
+_DEFAULT_DATE_FORMAT = "yyyy-MM-dd'T'HH:mm:ss.SSS'Z'"
+
+
+class ESError(Exception):
+    """Error dengan bentuk respons error ES (type, reason, status HTTP)."""
+
+    def __init__(self, status: int, etype: str, reason: str) -> None:
+        super().__init__(reason)
+        self.status, self.etype, self.reason = status, etype, reason
+
+    def body(self) -> Dict[str, Any]:
+        err = {"type": self.etype, "reason": self.reason}
+        return {"error": {"root_cause": [err], **err}, "status": self.status}
+
+
+def _bad_request(reason: str) -> ESError:
+    return ESError(400, "parsing_exception", reason)
+
+
+# ------------------- tanggal -------------------
+
+@functools.lru_cache(maxsize=200_000)
+def _parse_date_str(s: str) -> Optional[int]:
+    s = s.strip()
+    if re.fullmatch(r"-?\d+", s) and len(s) > 8:
+        return int(s)  # epoch_millis
+    if re.fullmatch(r"\d{4}", s):
+        s += "-01-01"
+    elif re.fullmatch(r"\d{4}-\d{2}", s):
+        s += "-01"
+    try:
+        dt = datetime.fromisoformat(s.replace("Z", "+00:00").replace(" ", "T"))
+    except ValueError:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return calendar.timegm(dt.timetuple()) * 1000 + dt.microsecond // 1000
+
+
+def to_millis(v: Any) -> Optional[int]:
+    if isinstance(v, bool) or v is None:
+        return None
+    if isinstance(v, (int, float)):
+        return int(v)
+    if isinstance(v, datetime):
+        return _parse_date_str(v.isoformat())
+    if isinstance(v, date):
+        return _parse_date_str(v.isoformat())
+    return _parse_date_str(str(v))
+
+
+def _dt(ms: int) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(milliseconds=ms)
+
+
+@functools.lru_cache(maxsize=64)
+def _strftime_pattern(java: str) -> str:
+    out, i = [], 0
+    tokens = [("yyyy", "%Y"), ("MM", "%m"), ("dd", "%d"), ("HH", "%H"), ("mm", "%M"), ("ss", "%S"), ("SSS", "{ms}")]
+    while i < len(java):
+        if java[i] == "'":
+            j = java.find("'", i + 1)
+            out.append(java[i + 1:j if j > 0 else None])
+            i = j + 1 if j > 0 else len(java)
+            continue
+        for tok, rep in tokens:
+            if java.startswith(tok, i):
+                out.append(rep)
+                i += len(tok)
+                break
+        else:
+            out.append(java[i])
+            i += 1
+    return "".join(out)
+
+
+def format_date(ms: int, fmt: Optional[str] = None) -> str:
+    if fmt in ("epoch_millis",):
+        return str(ms)
+    if fmt in (None, "strict_date_optional_time", "date_optional_time"):
+        fmt = _DEFAULT_DATE_FORMAT
+    pattern = _strftime_pattern(fmt.split("||")[0])
+    return _dt(ms).strftime(pattern.replace("{ms}", f"{ms % 1000:03d}"))
+
+
+_CALENDAR_UNITS = {
+    "minute": "minute", "1m": "minute", "hour": "hour", "1h": "hour", "day": "day", "1d": "day",
+    "week": "week", "1w": "week", "month": "month", "1M": "month", "quarter": "quarter", "1q": "quarter",
+    "year": "year", "1y": "year",
+}
+_FIXED_UNITS = {"ms": 1, "s": 1000, "m": 60_000, "h": 3_600_000, "d": 86_400_000}
+
+
+def _calendar_floor(ms: int, unit: str) -> int:
+    d = _dt(ms)
+    if unit == "minute":
+        d = d.replace(second=0, microsecond=0)
+    elif unit == "hour":
+        d = d.replace(minute=0, second=0, microsecond=0)
+    elif unit == "day":
+        d = d.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif unit == "week":
+        d = (d - timedelta(days=d.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    elif unit == "month":
+        d = datetime(d.year, d.month, 1)
+    elif unit == "quarter":
+        d = datetime(d.year, 3 * ((d.month - 1) // 3) + 1, 1)
+    else:
+        d = datetime(d.year, 1, 1)
+    return calendar.timegm(d.timetuple()) * 1000
+
+
+def _calendar_next(ms: int, unit: str) -> int:
+    d = _dt(ms)
+    if unit in ("minute", "hour", "day", "week"):
+        step = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1),
+                "day": timedelta(days=1), "week": timedelta(weeks=1)}[unit]
+        return ms + int(step.total_seconds() * 1000)
+    months = {"month": 1, "quarter": 3, "year": 12}[unit]
+    y, m = divmod(d.month - 1 + months, 12)
+    return calendar.timegm(datetime(d.year + y, m + 1, 1).timetuple()) * 1000
+
+
+def _fixed_ms(spec: str) -> int:
+    m = re.fullmatch(r"(\d+)(ms|s|m|h|d)", str(spec))
+    if not m:
+        raise _bad_request(f"interval tidak dikenal: {spec}")
+    return int(m.group(1)) * _FIXED_UNITS[m.group(2)]
+
+
+class _DateBucketer:
+    """Kunci bucket (ms) + langkah berikutnya untuk date_histogram / sumber composite."""
+
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        cal = spec.get("calendar_interval") or spec.get("interval")
+        if cal in _CALENDAR_UNITS:
+            unit = _CALENDAR_UNITS[cal]
+            self.floor = lambda ms: _calendar_floor(ms, unit)
+            self.next = lambda ms: _calendar_next(ms, unit)
+        else:
+            step = _fixed_ms(spec.get("fixed_interval") or cal)
+            self.floor = lambda ms: ms - ms % step
+            self.next = lambda ms: ms + step
+
+
+# ------------------- index -------------------
+
+class Index:
+    def __init__(self, name: str, mappings: Optional[Dict[str, Any]] = None, settings: Optional[Dict[str, Any]] = None) -> None:
+        self.name = name
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.seq: Dict[str, int] = {}
+        self.properties: Dict[str, Any] = dict((mappings or {}).get("properties", {}))
+        self.inferred: Dict[str, str] = {}
+        self.settings: Dict[str, Any] = {"number_of_shards": "1", "number_of_replicas": "0", **_flat_settings(settings or {})}
+        self._next_seq = 0
+
+    # --- tipe field ---
+    def field_type(self, field: str) -> Optional[str]:
+        spec = self.properties.get(field)
+        if spec and "type" in spec:
+            return spec["type"]
+        if field in self.inferred:
+            return self.inferred[field]
+        base, _, sub = field.rpartition(".")
+        if base and sub in ("keyword", "raw") and (base in self.properties or base in self.inferred):
+            return "keyword"
+        return None
+
+    def source_field(self, field: str) -> str:
+        """`x.keyword` -> `x` (subfield berbagi nilai _source field induknya)."""
+        if field in self.properties or field in self.inferred:
+            return field
+        base, _, sub = field.rpartition(".")
+        if base and sub in ("keyword", "raw"):
+            return base
+        return field
+
+    def _infer(self, src: Dict[str, Any]) -> None:
+        for k, v in src.items():
+            if k in self.inferred or k in self.properties or v is None:
+                continue
+            sample = v[0] if isinstance(v, list) and v else v
+            if isinstance(sample, bool):
+                self.inferred[k] = "boolean"
+            elif isinstance(sample, int):
+                self.inferred[k] = "long"
+            elif isinstance(sample, float):
+                self.inferred[k] = "double"
+            elif isinstance(sample, str):
+                self.inferred[k] = "date" if _DATE_RE.match(sample) else "keyword"
+            elif isinstance(sample, dict):
+                continue
+            else:
+                self.inferred[k] = "keyword"
+
+    def put(self, doc_id: Optional[str], src: Dict[str, Any]) -> Tuple[str, str]:
+        doc_id = doc_id or uuid.uuid4().hex[:20]
+        result = "updated" if doc_id in self.docs else "created"
+        self._infer(src)
+        self.docs[doc_id] = src
+        self.seq[doc_id] = self._next_seq
+        self._next_seq += 1
+        return doc_id, result
+
+    def delete(self, doc_id: str) -> bool:
+        self.seq.pop(doc_id, None)
+        return self.docs.pop(doc_id, None) is not None
+
+    def snapshot(self) -> List[Doc]:
+        return [(i, s, self.seq[i]) for i, s in self.docs.items()]
+
+    def mapping(self, dynamic_text: bool = False) -> Dict[str, Any]:
+        props = dict(self.properties)
+        for k, t in self.inferred.items():
+            if k in props:
+                continue
+            if t == "keyword" and dynamic_text:
+                props[k] = {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}}
+            else:
+                props[k] = {"type": t}
+        return {"properties": props}
+
+
+def _flat_settings(settings: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for k, v in settings.items():
+        key = f"{prefix}{k}"
+        if key.startswith("index."):
+            key = key[len("index."):]
+        if isinstance(v, dict):
+            out.update(_flat_settings(v, f"{key}."))
+        else:
+            out[key] = v
+    return out
+
+
+# ------------------- nilai field -------------------
+
+def _raw_values(src: Dict[str, Any], field: str) -> List[Any]:
+    if field in src:
+        v = src[field]
+    else:
+        v = src
+        for part in field.split("."):
+            if not isinstance(v, dict) or part not in v:
+                return []
+            v = v[part]
+    if v is None:
+        return []
+    if isinstance(v, list):
+        return [x for x in v if x is not None]
+    return [v]
+
+
+def _coerce(v: Any, ftype: Optional[str]) -> Any:
+    """Nilai -> bentuk pembanding sesuai tipe field (None jika tidak bisa dikonversi)."""
+    if ftype in _NUMERIC:
+        if isinstance(v, bool):
+            return float(v)
+        try:
+            return float(v)
+        except (TypeError, ValueError):
+            return None
+    if ftype in ("date", "date_nanos"):
+        return to_millis(v)
+    if ftype == "boolean":
+        if isinstance(v, bool):
+            return v
+        s = str(v).lower()
+        return True if s in ("true", "1") else False if s in ("false", "0", "") else None
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    return str(v) if not isinstance(v, (dict, list)) else json.dumps(v, sort_keys=True)
+
+
+class _Ctx:
+    """Akses nilai field bertipe untuk sekumpulan index (satu request)."""
+
+    def __init__(self, indices: List[Index], dynamic_text: bool = False) -> None:
+        self.indices = indices
+        self.dynamic_text = dynamic_text
+        self._types: Dict[str, Optional[str]] = {}
+        self._sources: Dict[str, str] = {}
+
+    def ftype(self, field: str) -> Optional[str]:
+        if field not in self._types:
+            self._types[field] = next((t for t in (i.field_type(field) for i in self.indices) if t), None)
+        return self._types[field]
+
+    def src_field(self, field: str) -> str:
+        if field not in self._sources:
+            self._sources[field] = next((f for f in (i.source_field(field) for i in self.indices) if f != field), field)
+        return self._sources[field]
+
+    def doc_values(self, field: str) -> str:
+        """Field untuk agregasi/sort; field text (dynamic_text) ditolak seperti ES tanpa fielddata."""
+        if self.dynamic_text and any(i.inferred.get(field) == "keyword" and field not in i.properties for i in self.indices):
+            raise ESError(400, "illegal_argument_exception",
+                          f"Text fields are not optimised for operations that require per-document field data "
+                          f"like aggregations and sorting. Please use a keyword field instead [{field}]")
+        return field
+
+    def values(self, doc: Doc, field: str) -> List[Any]:
+        t = self.ftype(field)
+        out = []
+        for v in _raw_values(doc[1], self.src_field(field)):
+            c = _coerce(v, t)
+            if c is not None:
+                out.append(c)
+        return out
+
+    def numbers(self, doc: Doc, field: str) -> List[float]:
+        t = self.ftype(field)
+        if t in ("date", "date_nanos"):
+            return [float(v) for v in self.values(doc, field)]
+        out = []
+        for v in _raw_values(doc[1], self.src_field(field)):
+            c = _coerce(v, "double")
+            if c is not None and not math.isnan(c):
+                out.append(c)
+        return out
+
+
+# ------------------- query -------------------
+
+def compile_query(q: Optional[Dict[str, Any]], ctx: _Ctx) -> Pred:
+    if not q:
+        return lambda d: True
+    if len(q) != 1:
+        raise _bad_request(f"query harus punya tepat satu jenis: {list(q)}")
+    kind, spec = next(iter(q.items()))
+
+    if kind == "match_all":
+        return lambda d: True
+    if kind == "match_none":
+        return lambda d: False
+
+    if kind == "bool":
+        def clauses(key: str) -> List[Pred]:
+            c = spec.get(key) or []
+            return [compile_query(x, ctx) for x in (c if isinstance(c, list) else [c])]
+
+        must = clauses("must") + clauses("filter")
+        must_not = clauses("must_not")
+        should = clauses("should")
+        msm = spec.get("minimum_should_match")
+        if msm is None:
+            msm = 1 if should and not must else 0
+        elif isinstance(msm, str):
+            msm = math.floor(len(should) * int(msm.rstrip("%")) / 100) if msm.endswith("%") else int(msm)
+        msm = min(int(msm), len(should))
+
+        def pred(d: Doc) -> bool:
+            if not all(p(d) for p in must) or any(p(d) for p in must_not):
+                return False
+            return msm == 0 or sum(1 for p in should if p(d)) >= msm
+        return pred
+
+    if kind == "ids":
+        ids = set(spec.get("values", []))
+        return lambda d: d[0] in ids
+
+    if kind not in ("term", "terms", "range", "exists", "match", "match_phrase", "prefix"):
+        raise _bad_request(f"[{kind}] query tidak didukung stand-in")
+    field, arg = _field_arg(spec)
+    t = ctx.ftype(field)
+
+    if kind == "term":
+        value = arg.get("value") if isinstance(arg, dict) else arg
+        target = _coerce(value, t)
+        return lambda d: target in ctx.values(d, field)
+
+    if kind == "terms":
+        if isinstance(arg, dict):
+            raise _bad_request("terms lookup tidak didukung stand-in")
+        targets = {_coerce(v, t) for v in arg}
+        return lambda d: any(v in targets for v in ctx.values(d, field))
+
+    if kind == "range":
+        fmt = arg.get("format")
+        bounds = []
+        for op in ("gt", "gte", "lt", "lte"):
+            if arg.get(op) is None:
+                continue
+            raw = arg[op]
+            if t in ("date", "date_nanos"):
+                b = int(raw) if fmt == "epoch_millis" else to_millis(raw)
+                if b is None:
+                    raise _bad_request(f"tanggal range tidak dikenal: {raw}")
+                if op == "lte" and isinstance(raw, str) and len(raw) == 10:
+                    b += 86_400_000 - 1  # "yyyy-MM-dd" sebagai batas atas mencakup sehari penuh
+            else:
+                b = _coerce(raw, t or "double")
+            bounds.append((op, b))
+        ops = {"gt": lambda v, b: v > b, "gte": lambda v, b: v >= b, "lt": lambda v, b: v < b, "lte": lambda v, b: v <= b}
+
+        def in_range(d: Doc) -> bool:
+            for v in ctx.values(d, field):
+                try:
+                    if all(ops[op](v, b) for op, b in bounds):
+                        return True
+                except TypeError:
+                    continue
+            return False
+        return in_range
+
+    if kind == "exists":
+        f = spec.get("field")
+        return lambda d: bool(_raw_values(d[1], ctx.src_field(f)))
+
+    if kind in ("match", "match_phrase"):
+        text = str(arg.get("query") if isinstance(arg, dict) else arg).lower()
+        return lambda d: any(str(v).lower() == text or text in str(v).lower().split()
+                             for v in _raw_values(d[1], ctx.src_field(field)))
+
+    if kind == "prefix":
+        value = str(arg.get("value") if isinstance(arg, dict) else arg)
+        return lambda d: any(str(v).startswith(value) for v in _raw_values(d[1], ctx.src_field(field)))
+
+    raise AssertionError(kind)
+
+
+def _field_arg(spec: Dict[str, Any]) -> Tuple[str, Any]:
+    items = [(k, v) for k, v in spec.items() if k not in ("boost", "_name")]
+    if len(items) != 1:
+        raise _bad_request(f"query butuh tepat satu field: {list(spec)}")
+    return items[0]
+
+
+# ------------------- sort & hits -------------------
+
+def _sort_spec(sort: Any) -> List[Tuple[str, bool, str]]:
+    """-> [(field, desc, missing)]"""
+    if sort is None:
+        return []
+    out = []
+    for s in sort if isinstance(sort, list) else [sort]:
+        if isinstance(s, str):
+            out.append((s, s == "_score", "_last"))
+            continue
+        field, opt = next(iter(s.items()))
+        if isinstance(opt, str):
+            opt = {"order": opt}
+        desc = opt.get("order", "desc" if field == "_score" else "asc") == "desc"
+        out.append((field, desc, opt.get("missing", "_last")))
+    return out
+
+
+def _sort_values(doc: Doc, spec: List[Tuple[str, bool, str]], ctx: _Ctx) -> List[Any]:
+    vals = []
+    for field, desc, _ in spec:
+        if field in ("_doc", "_shard_doc"):
+            vals.append(doc[2])
+        elif field == "_score":
+            vals.append(1.0)
+        elif field == "_id":
+            vals.append(doc[0])
+        else:
+            vs = ctx.values(doc, ctx.doc_values(field))
+            vals.append((max(vs) if desc else min(vs)) if vs else None)
+    return vals
+
+
+def _cmp_values(a: List[Any], b: List[Any], spec: List[Tuple[str, bool, str]]) -> int:
+    for x, y, (_, desc, missing) in zip(a, b, spec):
+        if x == y:
+            continue
+        if x is None or y is None:
+            first = missing == "_first"
+            return (-1 if first else 1) if x is None else (1 if first else -1)
+        try:
+            c = -1 if x < y else 1
+        except TypeError:
+            c = -1 if str(x) < str(y) else 1
+        return -c if desc else c
+    return 0
+
+
+def _source_filter(src: Dict[str, Any], spec: Any) -> Optional[Dict[str, Any]]:
+    if spec is None or spec is True:
+        return src
+    if spec is False:
+        return None
+    if isinstance(spec, (str, list)):
+        includes, excludes = ([spec] if isinstance(spec, str) else spec), []
+    else:
+        includes = spec.get("includes", spec.get("include", [])) or []
+        excludes = spec.get("excludes", spec.get("exclude", [])) or []
+        includes = [includes] if isinstance(includes, str) else includes
+        excludes = [excludes] if isinstance(excludes, str) else excludes
+    return {k: v for k, v in src.items()
+            if (not includes or any(fnmatch.fnmatchcase(k, p) for p in includes))
+            and not any(fnmatch.fnmatchcase(k, p) for p in excludes)}
+
+
+def _docvalue(v: Any, ftype: Optional[str], fmt: Optional[str]) -> Any:
+    if ftype in ("date", "date_nanos"):
+        return format_date(int(v), fmt)
+    return v
+
+
+def _hit(doc: Doc, index: str, body: Dict[str, Any], ctx: _Ctx, sort_vals: Optional[List[Any]]) -> Dict[str, Any]:
+    h: Dict[str, Any] = {"_index": index, "_id": doc[0], "_score": None if sort_vals is not None else 1.0}
+    src = _source_filter(doc[1], body.get("_source"))
+    if src is not None:
+        h["_source"] = src
+    dvf = body.get("docvalue_fields")
+    if dvf:
+        fields: Dict[str, List[Any]] = {}
+        for f in dvf:
+            name, fmt = (f, None) if isinstance(f, str) else (f["field"], f.get("format"))
+            t = ctx.ftype(name)
+            vals = ctx.values(doc, name)
+            if vals:
+                fields[name] = [_docvalue(v, t, fmt) for v in vals]
+        h["fields"] = fields
+    if body.get("seq_no_primary_term"):
+        h["_seq_no"], h["_primary_term"] = doc[2], 1
+    if sort_vals is not None:
+        h["sort"] = sort_vals
+    return h
+
+
+# ------------------- agregasi -------------------
+
+def _agg_kind(spec: Dict[str, Any]) -> Tuple[str, Any, Dict[str, Any]]:
+    sub = spec.get("aggs") or spec.get("aggregations") or {}
+    kinds = [k for k in spec if k not in ("aggs", "aggregations", "meta")]
+    if len(kinds) != 1:
+        raise _bad_request(f"agregasi butuh tepat satu tipe: {kinds}")
+    return kinds[0], spec[kinds[0]], sub
+
+
+def run_aggs(aggs: Dict[str, Any], docs: List[Doc], ctx: _Ctx) -> Dict[str, Any]:
+    return {name: _run_agg(spec, docs, ctx) for name, spec in aggs.items()}
+
+
+def _bucket(key_fields: Dict[str, Any], docs: List[Doc], sub: Dict[str, Any], ctx: _Ctx) -> Dict[str, Any]:
+    out = dict(key_fields)
+    out["doc_count"] = len(docs)
+    out.update(run_aggs(sub, docs, ctx))
+    return out
+
+
+def _metric_values(docs: List[Doc], p: Dict[str, Any], ctx: _Ctx) -> List[float]:
+    field, missing = p.get("field"), p.get("missing")
+    if field is None:
+        raise _bad_request("agregasi metric tanpa script butuh `field`")
+    out: List[float] = []
+    for d in docs:
+        vs = ctx.numbers(d, field)
+        if vs:
+            out.extend(vs)
+        elif missing is not None:
+            m = _coerce(missing, ctx.ftype(field) if ctx.ftype(field) in ("date", "date_nanos") else "double")
+            if m is not None:
+                out.append(float(m))
+    return out
+
+
+def _with_date_string(res: Dict[str, Any], field: str, ctx: _Ctx) -> Dict[str, Any]:
+    if res.get("value") is not None and ctx.ftype(field) in ("date", "date_nanos"):
+        res["value_as_string"] = format_date(int(res["value"]))
+    return res
+
+
+def _percentile(sorted_vals: List[float], p: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    pos = (len(sorted_vals) - 1) * p / 100.0
+    lo, hi = math.floor(pos), math.ceil(pos)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (pos - lo)
+
+
+def _bucket_key(v: Any, ftype: Optional[str]) -> Dict[str, Any]:
+    if ftype == "boolean":
+        return {"key": 1 if v else 0, "key_as_string": "true" if v else "false"}
+    if ftype in ("date", "date_nanos"):
+        return {"key": int(v), "key_as_string": format_date(int(v))}
+    if ftype in _NUMERIC:
+        return {"key": int(v) if ftype not in ("double", "float", "half_float", "scaled_float") and float(v).is_integer() else v}
+    return {"key": v}
+
+
+def _order_buckets(buckets: List[Dict[str, Any]], order: Any) -> List[Dict[str, Any]]:
+    orders = order if isinstance(order, list) else [order]
+    for o in reversed(orders):  # sort stabil: kunci terakhir dulu
+        (k, direction), = o.items()
+        rev = direction == "desc"
+        if k == "_count":
+            keyf = lambda b: b["doc_count"]
+        elif k in ("_key", "_term"):
+            keyf = lambda b: b["key"]
+        else:
+            name, _, prop = k.partition(".")
+            keyf = lambda b, name=name, prop=prop: (b[name].get(prop or "value") if isinstance(b.get(name), dict) else None) or 0
+        buckets.sort(key=keyf, reverse=rev)
+    return buckets
+
+
+def _composite_source_keys(doc: Doc, name: str, kind: str, p: Dict[str, Any], ctx: _Ctx) -> List[Any]:
+    field = p.get("field")
+    if kind == "terms":
+        vals = ctx.values(doc, ctx.doc_values(field))
+        t = ctx.ftype(field)
+        if t == "boolean":
+            vals = [1 if v else 0 for v in vals]
+        elif t in _NUMERIC and t not in ("double", "float", "half_float", "scaled_float"):
+            vals = [int(v) for v in vals]
+    elif kind == "date_histogram":
+        bucketer = _DateBucketer(p)
+        vals = [bucketer.floor(int(v)) for v in ctx.numbers(doc, field)]
+        if p.get("format"):
+            vals = [format_date(v, p["format"]) for v in vals]
+    elif kind == "histogram":
+        interval = float(p["interval"])
+        vals = [math.floor(v / interval) * interval for v in ctx.numbers(doc, field)]
+    else:
+        raise _bad_request(f"sumber composite [{kind}] tidak didukung stand-in")
+    if not vals:
+        return [None] if p.get("missing_bucket") else []
+    return sorted(set(vals), key=lambda x: (str(type(x)), x))
+
+
+def _composite(p: Dict[str, Any], docs: List[Doc], sub: Dict[str, Any], ctx: _Ctx) -> Dict[str, Any]:
+    sources = [(name, *next(iter(spec.items()))) for src in p["sources"] for name, spec in src.items()]
+    size = int(p.get("size", 10))
+    groups: Dict[Tuple[Any, ...], List[Doc]] = {}
+    for d in docs:
+        per_source = [_composite_source_keys(d, name, kind, sp, ctx) for name, kind, sp in sources]
+        for combo in itertools.product(*per_source):
+            groups.setdefault(combo, []).append(d)
+    spec = [(name, sp.get("order", "asc") == "desc", "_first") for name, _, sp in sources]
+    keys = sorted(groups, key=functools.cmp_to_key(lambda a, b: _cmp_values(list(a), list(b), spec)))
+    after = p.get("after")
+    if after:
+        after_t = [after.get(name) for name, _, _ in sources]
+        keys = [k for k in keys if _cmp_values(list(k), after_t, spec) > 0]
+    page = keys[:size]
+    buckets = [_bucket({"key": dict(zip([s[0] for s in sources], k))}, groups[k], sub, ctx) for k in page]
+    out: Dict[str, Any] = {"buckets": buckets}
+    if page:
+        out["after_key"] = dict(zip([s[0] for s in sources], page[-1]))
+    return out
+
+
+def _matrix_stats(fields: List[str], docs: List[Doc], ctx: _Ctx) -> Dict[str, Any]:
+    rows = []
+    for d in docs:
+        row = []
+        for f in fields:
+            vs = ctx.numbers(d, f)
+            if not vs:
+                break
+            row.append(vs[0])
+        else:
+            rows.append(row)
+    n = len(rows)
+    if n == 0:
+        return {"doc_count": 0, "fields": []}
+    cols = list(zip(*rows))
+    means = [sum(c) / n for c in cols]
+    cov = [[sum((a - means[i]) * (b - means[j]) for a, b in zip(cols[i], cols[j])) / (n - 1) if n > 1 else 0.0
+            for j in range(len(fields))] for i in range(len(fields))]
+    out_fields = []
+    for i, f in enumerate(fields):
+        var = cov[i][i]
+        sd = math.sqrt(var) if var > 0 else 0.0
+        m3 = sum((x - means[i]) ** 3 for x in cols[i]) / n
+        m4 = sum((x - means[i]) ** 4 for x in cols[i]) / n
+        pop_var = var * (n - 1) / n if n > 1 else 0.0
+        out_fields.append({
+            "name": f,
+            "count": n,
+            "mean": means[i],
+            "variance": var,
+            "skewness": m3 / pop_var ** 1.5 if pop_var > 0 else None,
+            "kurtosis": m4 / pop_var ** 2 if pop_var > 0 else None,
+            "covariance": {g: cov[i][j] for j, g in enumerate(fields)},
+            "correlation": {g: (cov[i][j] / (sd * math.sqrt(cov[j][j])) if sd > 0 and cov[j][j] > 0 else None)
+                            for j, g in enumerate(fields)},
+        })
+    return {"doc_count": n, "fields": out_fields}
+
+
+def _run_agg(spec: Dict[str, Any], docs: List[Doc], ctx: _Ctx) -> Dict[str, Any]:
+    kind, p, sub = _agg_kind(spec)
+
+    if kind == "filter":
+        pred = compile_query(p, ctx)
+        return _bucket({}, [d for d in docs if pred(d)], sub, ctx)
+
+    if kind == "filters":
+        fs = p.get("filters", {})
+        if isinstance(fs, list):
+            return {"buckets": [_bucket({}, [d for d in docs if compile_query(q, ctx)(d)], sub, ctx) for q in fs]}
+        return {"buckets": {k: _bucket({}, [d for d in docs if compile_query(q, ctx)(d)], sub, ctx) for k, q in fs.items()}}
+
+    if kind == "missing":
+        f = ctx.src_field(p["field"])
+        return _bucket({}, [d for d in docs if not _raw_values(d[1], f)], sub, ctx)
+
+    if kind == "terms":
+        field, t = ctx.doc_values(p["field"]), ctx.ftype(p["field"])
+        groups: Dict[Any, List[Doc]] = {}
+        for d in docs:
+            vals = set(ctx.values(d, field))
+            if not vals and p.get("missing") is not None:
+                vals = {_coerce(p["missing"], t)}
+            for v in vals:
+                groups.setdefault(v, []).append(d)
+        buckets = [_bucket(_bucket_key(k, t), g, sub, ctx) for k, g in groups.items()
+                   if len(g) >= int(p.get("min_doc_count", 1))]
+        buckets.sort(key=lambda b: str(b["key"]))
+        buckets = _order_buckets(buckets, p.get("order", [{"_count": "desc"}, {"_key": "asc"}]))
+        size = int(p.get("size", 10))
+        shown = buckets[:size]
+        return {"doc_count_error_upper_bound": 0,
+                "sum_other_doc_count": sum(b["doc_count"] for b in buckets[size:]),
+                "buckets": shown}
+
+    if kind in ("date_histogram", "histogram"):
+        field = p["field"]
+        if kind == "date_histogram":
+            bucketer = _DateBucketer(p)
+            floor, step = bucketer.floor, bucketer.next
+        else:
+            interval, offset = float(p["interval"]), float(p.get("offset", 0))
+            floor = lambda v: math.floor((v - offset) / interval) * interval + offset
+            step = lambda v: v + interval
+        groups = {}
+        for d in docs:
+            for k in {floor(v) for v in ctx.numbers(d, field)}:
+                groups.setdefault(k, []).append(d)
+        min_count = int(p.get("min_doc_count", 0))
+        keys = sorted(groups)
+        if min_count == 0 and keys:
+            filled, k = [], keys[0]
+            while k <= keys[-1]:
+                filled.append(k)
+                k = step(k)
+            keys = filled
+        buckets = []
+        for k in keys:
+            g = groups.get(k, [])
+            if len(g) < min_count:
+                continue
+            key = {"key": int(k), "key_as_string": format_date(int(k), p.get("format"))} if kind == "date_histogram" else {"key": k}
+            buckets.append(_bucket(key, g, sub, ctx))
+        if isinstance(p.get("order"), dict) and p["order"].get("_key") == "desc":
+            buckets.reverse()
+        return {"buckets": buckets}
+
+    if kind == "composite":
+        return _composite(p, docs, sub, ctx)
+
+    if kind == "top_hits":
+        spec_sort = _sort_spec(p.get("sort"))
+        hits = list(docs)
+        if spec_sort:
+            keyed = [(_sort_values(d, spec_sort, ctx), d) for d in hits]
+            keyed.sort(key=functools.cmp_to_key(lambda a, b: _cmp_values(a[0], b[0], spec_sort)))
+            hits = [d for _, d in keyed]
+        size = int(p.get("size", 3))
+        body = {"_source": p.get("_source"), "docvalue_fields": p.get("docvalue_fields")}
+        return {"hits": {"total": {"value": len(docs), "relation": "eq"}, "max_score": None if spec_sort else 1.0,
+                         "hits": [_hit(d, ctx.indices[0].name if ctx.indices else "", body, ctx,
+                                       _sort_values(d, spec_sort, ctx) if spec_sort else None) for d in hits[:size]]}}
+
+    if kind == "matrix_stats":
+        return _matrix_stats(p["fields"], docs, ctx)
+
+    if kind == "value_count":
+        f = ctx.src_field(p["field"])
+        return {"value": sum(len(_raw_values(d[1], f)) for d in docs)}
+
+    if kind == "cardinality":
+        return {"value": len({v for d in docs for v in ctx.values(d, ctx.doc_values(p["field"]))})}
+
+    values = _metric_values(docs, p, ctx)
+    if kind == "avg":
+        return _with_date_string({"value": sum(values) / len(values) if values else None}, p["field"], ctx)
+    if kind == "sum":
+        return {"value": float(sum(values))}
+    if kind == "min":
+        return _with_date_string({"value": min(values) if values else None}, p["field"], ctx)
+    if kind == "max":
+        return _with_date_string({"value": max(values) if values else None}, p["field"], ctx)
+    if kind in ("stats", "extended_stats"):
+        n = len(values)
+        res: Dict[str, Any] = {"count": n, "min": min(values) if n else None, "max": max(values) if n else None,
+                               "avg": sum(values) / n if n else None, "sum": float(sum(values))}
+        if kind == "extended_stats":
+            mean = res["avg"] or 0.0
+            var = sum((v - mean) ** 2 for v in values) / n if n else None
+            res.update({"sum_of_squares": sum(v * v for v in values), "variance": var,
+                        "std_deviation": math.sqrt(var) if var is not None else None})
+        return res
+    if kind == "percentiles":
+        values.sort()
+        percents = p.get("percents", [1, 5, 25, 50, 75, 95, 99])
+        vals = {str(float(q)): _percentile(values, float(q)) for q in percents}
+        if p.get("keyed", True):
+            return {"values": vals}
+        return {"values": [{"key": float(k), "value": v} for k, v in vals.items()]}
+
+    raise _bad_request(f"agregasi [{kind}] tidak didukung stand-in")
+
+
+# ------------------- filter_path -------------------
+
+def filter_path(obj: Any, paths: List[List[str]]) -> Any:
+    if not paths:
+        return obj
+    if any(not p for p in paths):
+        return obj
+    if isinstance(obj, list):
+        return [x for x in (filter_path(item, paths) for item in obj) if x not in (None, {}, [])]
+    if not isinstance(obj, dict):
+        return obj
+    out: Dict[str, Any] = {}
+    for k, v in obj.items():
+        nxt = [p[1:] for p in paths if p[0] == "*" or fnmatch.fnmatchcase(k, p[0])]
+        nxt += [p for p in paths if p[0] == "**"] + [p[1:] for p in paths if p[0] == "**" and len(p) > 1
+                                                        and fnmatch.fnmatchcase(k, p[1])]
+        if not nxt:
+            continue
+        fv = filter_path(v, nxt)
+        if fv not in (None, {}, []) or any(not p for p in nxt):
+            out[k] = fv
+    return out
+
+
+# ------------------- cluster -------------------
+
+class Cluster:
+    """Kumpulan index + alias + PIT; semua operasi thread-safe lewat satu RLock."""
+
+    def __init__(self, dynamic_text: bool = False) -> None:
+        self.indices: Dict[str, Index] = {}
+        self.aliases: Dict[str, set] = {}
+        self.pits: Dict[str, Tuple[List[str], Dict[str, List[Doc]], float]] = {}
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.RLock()
+        self.dynamic_text = dynamic_text
+
+    # --- resolusi nama ---
+    def resolve(self, expr: str, must_exist: bool = True) -> List[Index]:
+        names: List[str] = []
+        for part in expr.split(","):
+            part = part.strip()
+            if not part or part == "_all" or part == "*":
+                names.extend(self.indices)
+            elif any(c in part for c in "*?"):
+                names.extend(n for n in self.indices if fnmatch.fnmatchcase(n, part))
+            elif part in self.aliases:
+                names.extend(sorted(self.aliases[part]))
+            elif part in self.indices:
+                names.append(part)
+            elif must_exist:
+                raise ESError(404, "index_not_found_exception", f"no such index [{part}]")
+        seen, out = set(), []
+        for n in names:
+            if n not in seen and n in self.indices:
+                seen.add(n)
+                out.append(self.indices[n])
+        return out
+
+    def get_or_create(self, name: str) -> Index:
+        if name in self.aliases:
+            targets = sorted(self.aliases[name])
+            if len(targets) != 1:
+                raise ESError(400, "illegal_argument_exception", f"alias [{name}] menunjuk >1 index")
+            name = targets[0]
+        idx = self.indices.get(name)
+        if idx is None:
+            idx = self.indices[name] = Index(name)
+        return idx
+
+    # --- dokumen ---
+    def load(self, index: str, docs: Iterable[Dict[str, Any]], id_field: Optional[str] = "_id") -> int:
+        n = 0
+        with self.lock:
+            idx = self.get_or_create(index)
+            for doc in docs:
+                doc = dict(doc)
+                doc_id = doc.pop(id_field, None) if id_field else None
+                idx.put(str(doc_id) if doc_id is not None else None, doc)
+                n += 1
+        return n
+
+    # --- search ---
+    def search(self, index_expr: Optional[str], body: Dict[str, Any], params: Dict[str, str]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        body = body or {}
+        pit = body.get("pit")
+        with self.lock:
+            if pit:
+                entry = self.pits.get(pit["id"])
+                if entry is None:
+                    raise ESError(404, "search_context_missing_exception", "No search context found for id")
+                names, snap, _ = entry
+                indices = [self.indices[n] for n in names if n in self.indices]
+                per_index = [(n, snap[n]) for n in names]
+            else:
+                indices = self.resolve(index_expr or "_all")
+                per_index = [(i.name, i.snapshot()) for i in indices]
+        ctx = _Ctx(indices, self.dynamic_text)
+        pred = compile_query(body.get("query"), ctx)
+        matched: List[Tuple[str, Doc]] = [(name, d) for name, docs in per_index for d in docs if pred(d)]
+
+        sl = body.get("slice")
+        if sl and int(sl.get("max", 1)) > 1:
+            m, sid = int(sl["max"]), int(sl["id"])
+            matched = [(n, d) for n, d in matched if zlib.crc32(d[0].encode()) % m == sid]
+
+        size = int(params.get("size", body.get("size", 10)))
+        start = int(params.get("from", body.get("from", 0)))
+        spec = _sort_spec(body.get("sort"))
+        # PIT: ES menambah tiebreaker implisit _shard_doc (asc) di akhir sort dan mengembalikannya
+        # di hits[].sort, sehingga search_after tidak melompati dokumen bernilai sort sama
+        if pit and spec and spec[-1][0] not in ("_doc", "_shard_doc"):
+            spec = spec + [("_shard_doc", False, "_last")]
+        hits: List[Dict[str, Any]] = []
+        if size > 0:
+            if spec:
+                keyed = [(_sort_values(d, spec, ctx), n, d) for n, d in matched]
+                if pit:
+                    # _shard_doc unik lintas index PIT: posisi index di bit atas, urutan dokumen di bawah
+                    pos = {name: i for i, (name, _) in enumerate(per_index)}
+                    for sv, n, d in keyed:
+                        if spec[-1][0] in ("_doc", "_shard_doc"):
+                            sv[-1] = (pos[n] << 32) | d[2]
+                if body.get("search_after") is not None:
+                    after = list(body["search_after"])
+                    keyed = [k for k in keyed if _cmp_values(k[0], after, spec) > 0]
+                keyed.sort(key=functools.cmp_to_key(lambda a, b: _cmp_values(a[0], b[0], spec)))
+                hits = [_hit(d, n, body, ctx, sv) for sv, n, d in keyed[start:start + size]]
+            else:
+                hits = [_hit(d, n, body, ctx, None) for n, d in matched[start:start + size]]
+
+        res: Dict[str, Any] = {"took": 0, "timed_out": False,
+                               "_shards": {"total": max(1, len(indices)), "successful": max(1, len(indices)),
+                                           "skipped": 0, "failed": 0},
+                               "hits": {"max_score": None, "hits": hits}}
+        tth = body.get("track_total_hits", 10_000)
+        if tth is not False:
+            total = len(matched)
+            cap = None if tth is True else int(tth)
+            res["hits"]["total"] = ({"value": cap, "relation": "gte"} if cap is not None and total > cap
+                                    else {"value": total, "relation": "eq"})
+        aggs = body.get("aggs") or body.get("aggregations")
+        if aggs:
+            res["aggregations"] = run_aggs(aggs, [d for _, d in matched], ctx)
+        if pit:
+            res["pit_id"] = pit["id"]
+        res["took"] = int((time.perf_counter() - t0) * 1000)
+        return res
+
+    def count(self, index_expr: Optional[str], body: Dict[str, Any]) -> Dict[str, Any]:
+        res = self.search(index_expr, {"query": (body or {}).get("query"), "size": 0, "track_total_hits": True}, {})
+        return {"count": res["hits"]["total"]["value"], "_shards": res["_shards"]}
+
+    def open_pit(self, index_expr: str) -> Dict[str, Any]:
+        with self.lock:
+            indices = self.resolve(index_expr)
+            pit_id = uuid.uuid4().hex
+            self.pits[pit_id] = ([i.name for i in indices], {i.name: i.snapshot() for i in indices}, time.time())
+        return {"id": pit_id}
+
+    def close_pit(self, pit_id: Optional[str]) -> Dict[str, Any]:
+        with self.lock:
+            found = self.pits.pop(pit_id or "", None) is not None
+        return {"succeeded": True, "num_freed": int(found)}
+
+    # --- bulk ---
+    def bulk(self, default_index: Optional[str], lines: List[Dict[str, Any]], reject_rate: float = 0.0,
+             rng: Optional[random.Random] = None) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        rng = rng or random
+        items, errors, i = [], False, 0
+        with self.lock:
+            while i < len(lines):
+                action = lines[i]
+                (op, meta), = action.items()
+                index = meta.get("_index") or default_index
+                if not index:
+                    raise _bad_request("_bulk butuh _index")
+                doc_id = meta.get("_id")
+                item: Dict[str, Any] = {"_index": index, "_id": doc_id}
+                if op == "delete":
+                    i += 1
+                    idx = self.get_or_create(index)
+                    found = idx.delete(str(doc_id))
+                    item.update({"status": 200 if found else 404, "result": "deleted" if found else "not_found"})
+                    items.append({op: item})
+                    continue
+                source = lines[i + 1] if i + 1 < len(lines) else {}
+                i += 2
+                if reject_rate and rng.random() < reject_rate:
+                    errors = True
+                    item.update({"status": 429, "error": {"type": "es_rejected_execution_exception",
+                                                           "reason": "rejected execution (stand-in)"}})
+                    items.append({op: item})
+                    continue
+                idx = self.get_or_create(index)
+                if op == "create" and doc_id is not None and str(doc_id) in idx.docs:
+                    errors = True
+                    item.update({"status": 409, "error": {"type": "version_conflict_engine_exception",
+                                                           "reason": "document already exists"}})
+                elif op == "update":
+                    current = idx.docs.get(str(doc_id))
+                    if current is None and not source.get("doc_as_upsert"):
+                        errors = True
+                        item.update({"status": 404, "error": {"type": "document_missing_exception",
+                                                               "reason": "document missing"}})
+                    else:
+                        merged = {**(current or {}), **source.get("doc", {})}
+                        new_id, result = idx.put(str(doc_id), merged)
+                        item.update({"_id": new_id, "status": 200, "result": result})
+                else:
+                    new_id, result = idx.put(str(doc_id) if doc_id is not None else None, source)
+                    item.update({"_id": new_id, "status": 201 if result == "created" else 200, "result": result})
+                items.append({op: item})
+        return {"took": int((time.perf_counter() - t0) * 1000), "errors": errors, "items": items}
+
+    # --- admin ---
+    def create_index(self, name: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            if name in self.indices or name in self.aliases:
+                raise ESError(400, "resource_already_exists_exception", f"index [{name}] already exists")
+            self.indices[name] = Index(name, (body or {}).get("mappings"), (body or {}).get("settings"))
+            for alias in (body or {}).get("aliases", {}):
+                self.aliases.setdefault(alias, set()).add(name)
+        return {"acknowledged": True, "shards_acknowledged": True, "index": name}
+
+    def delete_index(self, expr: str) -> Dict[str, Any]:
+        with self.lock:
+            for idx in self.resolve(expr):
+                del self.indices[idx.name]
+                for targets in self.aliases.values():
+                    targets.discard(idx.name)
+            self.aliases = {a: t for a, t in self.aliases.items() if t}
+        return {"acknowledged": True}
+
+    def update_aliases(self, actions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self.lock:
+            for action in actions:
+                (op, spec), = action.items()
+                names = spec.get("indices") or [spec.get("index")]
+                aliases = spec.get("aliases") or [spec.get("alias")]
+                for name in names:
+                    for alias in aliases:
+                        if op == "add":
+                            if name not in self.indices:
+                                raise ESError(404, "index_not_found_exception", f"no such index [{name}]")
+                            self.aliases.setdefault(alias, set()).add(name)
+                        elif op == "remove":
+                            self.aliases.get(alias, set()).discard(name)
+                        elif op == "remove_index":
+                            self.delete_index(name)
+            self.aliases = {a: t for a, t in self.aliases.items() if t}
+        return {"acknowledged": True}
+
+    def get_alias(self, name: str) -> Dict[str, Any]:
+        with self.lock:
+            targets = sorted(self.aliases.get(name, ()))
+        if not targets:
+            raise ESError(404, "aliases_not_found_exception", f"alias [{name}] missing")
+        return {t: {"aliases": {name: {}}} for t in targets}
+
+    def reindex(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        src, dest = body.get("source", {}), body.get("dest", {})
+        res = self.search(src.get("index"), {"query": src.get("query"), "size": 10 ** 9,
+                                             "_source": src.get("_source", True), "track_total_hits": True}, {})
+        lines: List[Dict[str, Any]] = []
+        for h in res["hits"]["hits"]:
+            lines.append({"index": {"_index": dest["index"], "_id": h["_id"]}})
+            lines.append(h.get("_source", {}))
+        out = self.bulk(None, lines)
+        created = sum(1 for it in out["items"] if it["index"].get("result") == "created")
+        updated = sum(1 for it in out["items"] if it["index"].get("result") == "updated")
+        failures = [it["index"] for it in out["items"] if it["index"].get("error")]
+        return {"took": int((time.perf_counter() - t0) * 1000), "timed_out": False, "total": len(res["hits"]["hits"]),
+                "created": created, "updated": updated, "deleted": 0, "batches": 1, "failures": failures}
+
+    def submit_task(self, fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        task_id = f"standin:{len(self.tasks) + 1}"
+        self.tasks[task_id] = {"completed": False}
+
+        def run() -> None:
+            try:
+                self.tasks[task_id] = {"completed": True, "response": fn()}
+            except ESError as e:
+                self.tasks[task_id] = {"completed": True, "error": e.body()["error"]}
+        threading.Thread(target=run, daemon=True).start()
+        return {"task": task_id}
+
+
+# ------------------- rekam & putar ulang -------------------
+
+def request_key(method: str, path: str, query: str, body: Any) -> str:
+    params = "&".join(sorted(query.split("&"))) if query else ""
+    raw = json.dumps([method, path, params, body], sort_keys=True, separators=(",", ":"), default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class Recorder:
+    """Respons per kunci request: dibaca dari file replay, ditulis (append NDJSON) saat merekam."""
+
+    def __init__(self, replay: Optional[str] = None, record: Optional[str] = None) -> None:
+        self.responses: Dict[str, Tuple[int, Any]] = {}
+        self.record_path = record
+        self.lock = threading.Lock()
+        if replay:
+            with open(replay, encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        e = json.loads(line)
+                        self.responses[e["key"]] = (e.get("status", 200), e["response"])
+
+    def get(self, key: str) -> Optional[Tuple[int, Any]]:
+        return self.responses.get(key)
+
+    def put(self, key: str, method: str, path: str, body: Any, status: int, response: Any) -> None:
+        if not self.record_path:
+            return
+        line = json.dumps({"key": key, "method": method, "path": path, "body": body,
+                           "status": status, "response": response}, ensure_ascii=False, default=str)
+        with self.lock:
+            self.responses[key] = (status, response)
+            with open(self.record_path, "a", encoding="utf-8") as fh:
+                fh.write(line + "\n")
+
+
+# ------------------- HTTP -------------------
+
+_READ_ROUTES = ("_search", "_msearch", "_count")
+
+
+class StandIn:
+    """Konfigurasi server: cluster, latensi, injeksi error, rekam/putar ulang, statistik."""
+
+    def __init__(
+        self,
+        cluster: Optional[Cluster] = None,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        reject_rate: float = 0.0,
+        error_rate: float = 0.0,
+        recorder: Optional[Recorder] = None,
+        proxy: Optional[str] = None,
+        replay_strict: bool = False,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.cluster = cluster or Cluster()
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.reject_rate, self.error_rate = reject_rate, error_rate
+        self.recorder = recorder
+        self.proxy = proxy.rstrip("/") if proxy else None
+        self.replay_strict = replay_strict
+        self.rng = random.Random(seed)
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.stats_lock = threading.Lock()
+
+    def delay(self) -> float:
+        ms = self.latency_ms
+        if self.jitter_ms:
+            ms += self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, ms) / 1000.0
+
+    def record_stat(self, route: str, seconds: float) -> None:
+        with self.stats_lock:
+            s = self.stats.setdefault(route, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            s["count"] += 1
+            s["total_ms"] += seconds * 1000
+            s["max_ms"] = max(s["max_ms"], seconds * 1000)
+
+    # --- dispatch ---
+    def handle(self, method: str, path: str, params: Dict[str, str], raw: bytes) -> Tuple[int, Any]:
+        parts = [urllib.parse.unquote(p) for p in path.strip("/").split("/") if p]
+        c = self.cluster
+
+        def json_body() -> Dict[str, Any]:
+            return json.loads(raw) if raw.strip() else {}
+
+        def ndjson() -> List[Dict[str, Any]]:
+            return [json.loads(line) for line in raw.decode("utf-8").splitlines() if line.strip()]
+
+        if not parts:
+            return 200, {"name": "stuntlytics-standin", "cluster_name": "standin", "tagline": "You Know, for Search",
+                         "version": {"number": "8.13.0", "distribution": "standin"}}
+        head, last = parts[0], parts[-1]
+
+        if head == "_standin" and last == "stats":
+            with self.stats_lock:
+                return 200, {k: {**v, "avg_ms": v["total_ms"] / v["count"]} for k, v in self.stats.items()}
+        if head == "_cluster" and last == "health":
+            return 200, {"cluster_name": "standin", "status": "green", "number_of_nodes": 1}
+        if head == "_msearch" or (len(parts) == 2 and last == "_msearch"):
+            return 200, self._msearch(parts[0] if len(parts) == 2 else None, ndjson())
+        if head == "_bulk" or (len(parts) == 2 and last == "_bulk"):
+            return 200, c.bulk(parts[0] if len(parts) == 2 else None, ndjson(), self.reject_rate, self.rng)
+        if head in ("_search", "_count"):
+            body = json_body()
+            return 200, (c.search(None, body, params) if head == "_search" else c.count(None, body))
+        if head == "_pit" and method == "DELETE":
+            return 200, c.close_pit(json_body().get("id"))
+        if head == "_aliases":
+            return 200, c.update_aliases(json_body().get("actions", []))
+        if head == "_alias" and len(parts) == 2:
+            return 200, c.get_alias(parts[1])
+        if head == "_reindex":
+            if params.get("wait_for_completion", "true") == "false":
+                body = json_body()
+                return 200, c.submit_task(lambda: c.reindex(body))
+            return 200, c.reindex(json_body())
+        if head == "_tasks" and len(parts) == 2:
+            task = c.tasks.get(parts[1])
+            if task is None:
+                raise ESError(404, "resource_not_found_exception", f"task [{parts[1]}] tidak ada")
+            return 200, task
+        if head == "_refresh":
+            return 200, {"_shards": {"total": 1, "successful": 1, "failed": 0}}
+        if head.startswith("_"):
+            raise ESError(400, "illegal_argument_exception", f"endpoint {method} {path} tidak didukung stand-in")
+
+        index = head
+        if len(parts) == 1:
+            if method == "PUT":
+                return 200, c.create_index(index, json_body())
+            if method == "DELETE":
+                return 200, c.delete_index(index)
+            with c.lock:
+                found = c.resolve(index)
+            return 200, {i.name: {"mappings": i.mapping(c.dynamic_text), "settings": {"index": i.settings}} for i in found}
+
+        op = parts[1]
+        if op == "_search":
+            return 200, c.search(index, json_body(), params)
+        if op == "_count":
+            return 200, c.count(index, json_body())
+        if op == "_pit":
+            return 200, c.open_pit(index)
+        if op == "_mapping":
+            with c.lock:
+                if method == "PUT":
+                    for i in c.resolve(index):
+                        i.properties.update(json_body().get("properties", {}))
+                    return 200, {"acknowledged": True}
+                found = c.resolve(index)
+                if len(parts) >= 4 and parts[2] == "field":
+                    out: Dict[str, Any] = {}
+                    for i in found:
+                        fields = {}
+                        for f in parts[3].split(","):
+                            props = i.mapping(c.dynamic_text)["properties"]
+                            if f in props:
+                                fields[f] = {"full_name": f, "mapping": {f.split(".")[-1]: props[f]}}
+                        out[i.name] = {"mappings": fields}
+                    return 200, out
+                return 200, {i.name: {"mappings": i.mapping(c.dynamic_text)} for i in found}
+        if op == "_settings":
+            with c.lock:
+                found = c.resolve(index)
+                if method == "PUT":
+                    for i in found:
+                        for k, v in _flat_settings(json_body()).items():
+                            if v is None:
+                                i.settings.pop(k, None)
+                            else:
+                                i.settings[k] = v
+                    return 200, {"acknowledged": True}
+                return 200, {i.name: {"settings": {"index": dict(i.settings)}} for i in found}
+        if op in ("_refresh", "_forcemerge", "_flush"):
+            with c.lock:
+                n = len(c.resolve(index))
+            return 200, {"_shards": {"total": n, "successful": n, "failed": 0}}
+        if op == "_cache":
+            return 200, {"_shards": {"total": 1, "successful": 1, "failed": 0}}
+        if op in ("_doc", "_create"):
+            with c.lock:
+                if method in ("PUT", "POST") and (len(parts) == 3 or method == "POST"):
+                    idx = c.get_or_create(index)
+                    doc_id, result = idx.put(parts[2] if len(parts) == 3 else None, json_body())
+                    return (201 if result == "created" else 200), {"_index": idx.name, "_id": doc_id, "result": result,
+                                                                  "_seq_no": idx.seq[doc_id], "_primary_term": 1}
+                if len(parts) != 3:
+                    raise _bad_request("butuh /<index>/_doc/<id>")
+                for i in c.resolve(index):
+                    if method == "DELETE" and i.delete(parts[2]):
+                        return 200, {"_index": i.name, "_id": parts[2], "result": "deleted"}
+                    if method != "DELETE" and parts[2] in i.docs:
+                        return 200, {"_index": i.name, "_id": parts[2], "found": True, "_seq_no": i.seq[parts[2]],
+                                     "_primary_term": 1, "_source": i.docs[parts[2]]}
+                return 404, {"_index": index, "_id": parts[2], "found": False}
+        raise ESError(400, "illegal_argument_exception", f"endpoint {method} {path} tidak didukung stand-in")
+
+    def _msearch(self, default_index: Optional[str], lines: List[Dict[str, Any]]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        responses = []
+        for header, body in zip(lines[0::2], lines[1::2]):
+            index = header.get("index") or default_index
+            if isinstance(index, list):
+                index = ",".join(index)
+            try:
+                res = self.cluster.search(index, body, {})
+                res["status"] = 200
+            except ESError as e:
+                res = e.body()
+            responses.append(res)
+        return {"took": int((time.perf_counter() - t0) * 1000), "responses": responses}
+
+    # --- proxy ke cluster asli (mode rekam) ---
+    def forward(self, method: str, path_qs: str, raw: bytes, headers: Dict[str, str]) -> Tuple[int, bytes, str]:
+        req = urllib.request.Request(f"{self.proxy}{path_qs}", data=raw if raw else None, method=method)
+        for h in ("Content-Type", "Authorization"):
+            if headers.get(h):
+                req.add_header(h, headers[h])
+        try:
+            with urllib.request.urlopen(req, timeout=120) as r:
+                return r.status, r.read(), r.headers.get("Content-Type", "application/json")
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), e.headers.get("Content-Type", "application/json")
+
+
+def _route_name(method: str, path: str) -> str:
+    parts = [p for p in path.strip("/").split("/") if p]
+    ops = [p for p in parts if p.startswith("_")]
+    return f"{method} {ops[0] if ops else ('/' if not parts else '<index>')}"
+
+
+def make_handler(app: StandIn):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        server_version = "StuntLyticsESStandIn/1.0"
+
+        def log_message(self, fmt: str, *args: Any) -> None:  # noqa: D401 - senyap; statistik di /_standin/stats
+            pass
+
+        def _read_body(self) -> bytes:
+            n = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(n) if n else b""
+            if self.headers.get("Content-Encoding", "").lower() == "gzip" and raw:
+                raw = gzip.decompress(raw)
+            return raw
+
+        def _send(self, status: int, payload: Any, content_type: str = "application/json") -> None:
+            data = payload if isinstance(payload, bytes) else json.dumps(payload, default=str, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type if isinstance(payload, bytes) else "application/json; charset=UTF-8")
+            self.send_header("X-elastic-product", "Elasticsearch")
+            if self.command == "HEAD":
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _dispatch(self) -> None:
+            started = time.perf_counter()
+            url = urllib.parse.urlsplit(self.path)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            raw = self._read_body()
+            route = _route_name(self.command, url.path)
+            wait = app.delay()
+            if wait:
+                time.sleep(wait)
+            try:
+                if app.error_rate and not url.path.startswith("/_standin") and app.rng.random() < app.error_rate:
+                    raise ESError(503, "unavailable_shards_exception", "injected failure (stand-in)")
+                is_read = any(r in url.path for r in _READ_ROUTES)
+                key = None
+                if app.recorder is not None and is_read:
+                    body_key: Any = raw.decode("utf-8")
+                    try:
+                        body_key = (json.loads(raw) if raw.strip() else None) if "_msearch" not in url.path else \
+                            [json.loads(l) for l in raw.decode("utf-8").splitlines() if l.strip()]
+                    except ValueError:
+                        pass
+                    key = request_key(self.command, url.path, url.query, body_key)
+                    hit = app.recorder.get(key)
+                    if hit is not None:
+                        self._send(*hit)
+                        return
+                    if app.replay_strict and app.proxy is None:
+                        raise ESError(404, "standin_replay_miss", f"tidak ada rekaman untuk {self.command} {url.path}")
+                if app.proxy is not None:
+                    status, data, ctype = app.forward(self.command, self.path, raw, dict(self.headers))
+                    if key is not None and status < 500:
+                        try:
+                            app.recorder.put(key, self.command, url.path, raw.decode("utf-8"), status, json.loads(data))
+                        except ValueError:
+                            pass
+                    self._send(status, data, ctype)
+                    return
+                status, payload = app.handle(self.command, url.path, params, raw)
+                if "filter_path" in params and isinstance(payload, dict):
+                    payload = filter_path(payload, [p.split(".") for p in params["filter_path"].split(",") if p])
+                if key is not None and status < 500:
+                    app.recorder.put(key, self.command, url.path, raw.decode("utf-8"), status, payload)
+                self._send(status, payload)
+            except ESError as e:
+                self._send(e.status, e.body())
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, _bad_request(f"{type(e).__name__}: {e}").body())
+            finally:
+                app.record_stat(route, time.perf_counter() - started)
+
+        do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _dispatch
+
+    return Handler
+
+
+def serve(app: StandIn, host: str = "127.0.0.1", port: int = 9201) -> ThreadingHTTPServer:
+    """Buat server (belum berjalan); panggil `.serve_forever()` atau jalankan di thread."""
+    server = ThreadingHTTPServer((host, port), make_handler(app))
+    server.daemon_threads = True
+    return server
+
+
+def start_background(app: StandIn, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Jalankan server di thread daemon; return (server, url). port=0 -> port bebas."""
+    server = serve(app, host, port)
+    threading.Thread(target=server.serve_forever, name="es-standin", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# ------------------- dataset sintetis -------------------
+
+_KABUPATEN = [
+    "KABUPATEN BOGOR", "KABUPATEN SUKABUMI", "KABUPATEN CIANJUR", "KABUPATEN BANDUNG", "KABUPATEN GARUT",
+    "KABUPATEN TASIKMALAYA", "KABUPATEN CIAMIS", "KABUPATEN KUNINGAN", "KABUPATEN CIREBON", "KABUPATEN MAJALENGKA",
+    "KABUPATEN SUMEDANG", "KABUPATEN INDRAMAYU", "KABUPATEN SUBANG", "KABUPATEN PURWAKARTA", "KABUPATEN KARAWANG",
+    "KABUPATEN BEKASI", "KABUPATEN BANDUNG BARAT", "KABUPATEN PANGANDARAN", "KOTA BOGOR", "KOTA SUKABUMI",
+    "KOTA BANDUNG", "KOTA CIREBON", "KOTA BEKASI", "KOTA DEPOK", "KOTA CIMAHI", "KOTA TASIKMALAYA", "KOTA BANJAR",
+]
+
+
+def synthetic_docs(n: int, seed: int = 42, months: int = 24, end: str = "2025-08-01") -> Dict[str, List[Dict[str, Any]]]:
+    """Dataset sintetis bernama field sama dengan index asli: stunting, tenaga gizi, balita."""
+    rng = random.Random(seed)
+    end_ms = to_millis(end) or 0
+    start_ms = _calendar_floor(end_ms - months * 30 * 86_400_000, "month")
+    kecamatan = {k: [f"KEC {k.split(' ', 1)[1]} {i:02d}" for i in range(1, rng.randint(6, 14))] for k in _KABUPATEN}
+    weights = [rng.uniform(0.5, 3.0) for _ in _KABUPATEN]
+    zona_base = {k: rng.uniform(-0.6, 0.6) for k in _KABUPATEN}
+    pendidikan = ["SD", "SMP", "SMA", "D3", "S1"]
+
+    stunting: List[Dict[str, Any]] = []
+    for i in range(n):
+        kab = rng.choices(_KABUPATEN, weights)[0]
+        kec = rng.choice(kecamatan[kab])
+        ts = rng.randint(start_ms, end_ms)
+        bmi = round(rng.gauss(22.5, 3.5), 1)
+        lila = round(rng.gauss(25.0, 2.8), 1)
+        hb = round(rng.gauss(11.6, 1.3), 1)
+        berat = int(rng.gauss(3050, 450))
+        anc = max(0, int(rng.gauss(4.5, 1.8)))
+        upah = int(max(800_000, rng.gauss(3_100_000, 1_100_000)))
+        risk = (0.9 * (berat < 2500) + 0.5 * (hb < 11) + 0.4 * (lila < 23.5) + 0.3 * (anc <= 2)
+                + zona_base[kab] + rng.gauss(0, 0.5))
+        prob = round(1 / (1 + math.exp(-(risk - 1.2) * 1.8)), 3)
+        z = round(rng.gauss(-0.9 - 1.4 * prob, 0.9), 2)
+        status = "Stunting" if z <= -2 else "Berisiko" if z <= -1 else "Normal"
+        doc = {
+            "_id": f"s{i:07d}",
+            "Tanggal": format_date(ts, "yyyy-MM-dd"),
+            "nama_kabupaten_kota": kab,
+            "Kecamatan": kec,
+            "Z-Score TB/U": z,
+            "Status Stunting (Biner)": "Ya" if z <= -2 else "Tidak",
+            "Status Stunting (Stunting / Berisiko / Normal)": status,
+            "Probabilitas Stunting (simulasi)": prob,
+            "Usia Anak (bulan)": rng.randint(0, 59),
+            "Berat Lahir (gram)": berat,
+            "Upah Keluarga (Rp/bulan)": upah,
+            "Rata-rata UMP Wilayah (Rp/bulan)": 2_057_495 + (_KABUPATEN.index(kab) * 97_000) % 2_800_000,
+            "Jumlah Anak": rng.randint(1, 5),
+            "Tinggi Badan Ibu (cm)": round(rng.gauss(153, 5.5), 1),
+            "BMI Pra-Hamil": bmi,
+            "Hb (g/dL)": hb,
+            "LiLA saat Hamil (cm)": lila,
+            "Kunjungan ANC (x)": anc,
+            "Usia Ibu saat Hamil (tahun)": rng.randint(17, 42),
+            "Jarak Kehamilan Sebelumnya (bulan)": rng.randint(0, 60),
+            "Pendidikan Ibu": rng.choices(pendidikan, [25, 30, 30, 8, 7])[0],
+            "ASI Eksklusif": "Ya" if rng.random() < 0.62 else "Tidak",
+            "Status Imunisasi Anak": "Lengkap" if rng.random() < 0.72 else "Tidak Lengkap",
+            "Akses Air Bersih": "Layak" if rng.random() < 0.8 else "Tidak Layak",
+        }
+        if rng.random() < 0.03:  # sebagian data tidak lengkap seperti data lapangan
+            del doc[rng.choice(["Hb (g/dL)", "LiLA saat Hamil (cm)", "Status Imunisasi Anak", "Akses Air Bersih"])]
+        stunting.append(doc)
+
+    years = sorted({_dt(start_ms).year, _dt(end_ms).year})
+    nakes = [{"nama_kabupaten_kota": k, "tahun": y, "jumlah_nakes_gizi": rng.randint(40, 420)}
+             for k in _KABUPATEN for y in years]
+    balita = [{"bps_nama_kabupaten_kota": k, "bps_nama_kecamatan": kec, "tahun": y, "jumlah_balita": rng.randint(800, 9000)}
+              for k in _KABUPATEN for kec in kecamatan[k] for y in years]
+    return {"stunting": stunting, "nutrition": nakes, "balita": balita}
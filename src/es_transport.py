@@ -0,0 +1,192 @@
+# StuntLytics/src/es_transport.py
+# Transport HTTP bersama untuk src/elastic_client.py dan utils/es.py.
+# - Satu requests.Session per proses dengan connection pool (keep-alive) yang
+#   ukurannya disesuaikan dengan jumlah thread worker Streamlit.
+# - Body request besar dikompres gzip; respons gzip didekompres otomatis oleh requests.
+# - Retry/backoff bisa diatur lewat environment variable.
+
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from pathlib import Path
+    from dotenv import load_dotenv
+
+    ROOT = Path(__file__).resolve().parents[1]
+    load_dotenv(ROOT / ".env")
+except Exception:
+    pass
+
+ES_URL = os.getenv("ES_URL", "http://localhost:9200").rstrip("/")
+
+# Ukuran pool ~ jumlah thread script Streamlit yang bisa query bersamaan.
+POOL_SIZE = int(os.getenv("ES_POOL_SIZE", "32"))
+# Jumlah retry default & basis backoff eksponensial (detik).
+RETRIES = int(os.getenv("ES_RETRIES", "1"))
+BACKOFF = float(os.getenv("ES_BACKOFF", "0.5"))
+BACKOFF_MAX = float(os.getenv("ES_BACKOFF_MAX", "8"))
+RETRY_STATUSES = (429, 502, 503, 504)
+# Kompres body request >= GZIP_MIN_BYTES (0 = nonaktif).
+GZIP_MIN_BYTES = int(os.getenv("ES_GZIP_MIN_BYTES", "2048"))
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+class ESHTTPError(requests.exceptions.HTTPError):
+    """HTTPError dari ES dengan status code yang mudah dibaca pemanggil."""
+
+    def __init__(self, status_code: int, message: str, response: Optional[requests.Response] = None):
+        super().__init__(message, response=response)
+        self.status_code = status_code
+
+
+def get_session() -> requests.Session:
+    """Session ber-pool yang dipakai bersama oleh semua modul (thread-safe, lazy)."""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, pool_block=False)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                s.headers.update({"Accept-Encoding": "gzip", "Connection": "keep-alive"})
+                _SESSION = s
+    return _SESSION
+
+
+def _encode(body: Any, ndjson: bool = False) -> Tuple[bytes, Dict[str, str]]:
+    if isinstance(body, (bytes, bytearray)):
+        data = bytes(body)
+    elif isinstance(body, str):
+        data = body.encode("utf-8")
+    else:
+        data = json.dumps(body, default=str, ensure_ascii=False).encode("utf-8")
+    headers = {"Content-Type": "application/x-ndjson" if ndjson else "application/json"}
+    if GZIP_MIN_BYTES and len(data) >= GZIP_MIN_BYTES:
+        data = gzip.compress(data, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return data, headers
+
+
+def _sleep_backoff(attempt: int) -> None:
+    time.sleep(min(BACKOFF_MAX, BACKOFF * (2 ** attempt)))
+
+
+def request(
+    method: str,
+    path: str,
+    body: Any = None,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    ndjson: bool = False,
+    timeout: float = 60,
+    retries: Optional[int] = None,
+) -> requests.Response:
+    """Kirim request ke `ES_URL + path` dengan retry untuk error koneksi & status 429/5xx."""
+    url = f"{ES_URL}{path}"
+    retries = RETRIES if retries is None else retries
+    data, headers = (None, {}) if body is None else _encode(body, ndjson=ndjson)
+    last: Optional[Exception] = None
+    for attempt in range(retries + 1):
+        try:
+            r = get_session().request(method, url, data=data, headers=headers, params=params, timeout=timeout)
+            if r.status_code in RETRY_STATUSES and attempt < retries:
+                last = ESHTTPError(r.status_code, f"{r.status_code} dari {url}", response=r)
+                _sleep_backoff(attempt)
+                continue
+            if r.status_code >= 400:
+                raise ESHTTPError(r.status_code, f"{r.status_code} dari {url}: {r.text[:300]}", response=r)
+            return r
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            last = e
+            if attempt < retries:
+                _sleep_backoff(attempt)
+    assert last is not None
+    raise last
+
+
+def post(index: str, path: str, body: Dict[str, Any], timeout: float = 60, retries: Optional[int] = None) -> Dict[str, Any]:
+    return request("POST", f"/{index}{path}", body, timeout=timeout, retries=retries).json()
+
+
+def post_raw(index: str, path: str, body: Dict[str, Any], timeout: float = 60, retries: Optional[int] = None) -> bytes:
+    """Seperti `post` tetapi mengembalikan body respons mentah (untuk parser JSON cepat)."""
+    return request("POST", f"/{index}{path}", body, timeout=timeout, retries=retries).content
+
+
+def get(index: str, path: str, timeout: float = 30, retries: Optional[int] = None) -> Dict[str, Any]:
+    return request("GET", f"/{index}{path}", timeout=timeout, retries=retries).json()
+
+
+def msearch(searches: Iterable[Tuple[str, Dict[str, Any]]], timeout: float = 60) -> List[Dict[str, Any]]:
+    """Kirim banyak (index, body) dalam satu request `_msearch` (NDJSON)."""
+    lines: List[str] = []
+    for index, body in searches:
+        lines.append(json.dumps({"index": index}))
+        lines.append(json.dumps(body, default=str, ensure_ascii=False))
+    if not lines:
+        return []
+    payload = "\n".join(lines) + "\n"
+    return request("POST", "/_msearch", payload, ndjson=True, timeout=timeout).json().get("responses", [])
+
+
+def bulk(
+    index: str,
+    docs: Iterable[Dict[str, Any]],
+    *,
+    id_field: Optional[str] = None,
+    timeout: float = 120,
+    retries: int = 5,
+) -> Dict[str, int]:
+    """
+    Tulis dokumen lewat `_bulk` (NDJSON). Item yang ditolak 429 (antrian write penuh) dikirim
+    ulang dengan backoff; error lain dihitung sebagai gagal. `id_field` diambil (lalu dibuang)
+    dari dokumen sebagai `_id`. Return {"indexed": n, "failed": n, "retried": n}.
+    """
+    pending = [dict(d) for d in docs]
+    stats = {"indexed": 0, "failed": 0, "retried": 0}
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        lines: List[str] = []
+        for doc in pending:
+            meta: Dict[str, Any] = {"_index": index}
+            if id_field and doc.get(id_field) is not None:
+                meta["_id"] = doc[id_field]
+            lines.append(json.dumps({"index": meta}))
+            lines.append(json.dumps({k: v for k, v in doc.items() if k != id_field}, default=str, ensure_ascii=False))
+        res = request("POST", "/_bulk", "\n".join(lines) + "\n", ndjson=True, timeout=timeout).json()
+        if not res.get("errors"):
+            stats["indexed"] += len(pending)
+            return stats
+        rejected = []
+        for doc, item in zip(pending, res.get("items", [])):
+            status = item.get("index", {}).get("status", 500)
+            if status < 300:
+                stats["indexed"] += 1
+            elif status == 429 and attempt < retries:
+                rejected.append(doc)
+            else:
+                stats["failed"] += 1
+        stats["retried"] += len(rejected)
+        pending = rejected
+        if pending:
+            _sleep_backoff(attempt)
+    return stats
+
+
+def ping() -> Tuple[bool, str]:
+    try:
+        r = get_session().get(ES_URL, timeout=5)
+        return r.status_code == 200, f"ES {ES_URL} status {r.status_code}"
+    except Exception as e:
+        return False, f"Gagal hubungi ES: {e}"
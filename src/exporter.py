@@ -0,0 +1,215 @@
+# StuntLytics/src/exporter.py
+# Penulis file ekspor bertahap: halaman DataFrame dari ES ditulis satu per satu ke file
+# sementara di disk, sehingga memori tetap datar berapa pun jumlah barisnya.
+# - Teks: CSV / JSON Lines (opsional gzip).
+# - Kolumnar: Parquet (satu row group per halaman) dan Arrow IPC/Feather, dengan tipe
+#   kolom eksplisit (tanggal, float, kategori untuk kabupaten/kecamatan). Butuh pyarrow.
+
+import gzip
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "stuntlytics-exports")
+
+FORMATS = {
+    "CSV": {"ext": ".csv", "mime": "text/csv", "columnar": False},
+    "JSON Lines": {"ext": ".jsonl", "mime": "application/x-ndjson", "columnar": False},
+    "Parquet": {"ext": ".parquet", "mime": "application/vnd.apache.parquet", "columnar": True},
+    "Arrow IPC (Feather)": {"ext": ".feather", "mime": "application/vnd.apache.arrow.file", "columnar": True},
+}
+
+# Tipe kolom ekspor; kolom yang tidak terdaftar ditulis sebagai string.
+COLUMN_TYPES: Dict[str, str] = {
+    "Tanggal": "datetime",
+    "nama_kabupaten_kota": "category",
+    "Kecamatan": "category",
+    "Status Stunting (Biner)": "category",
+    "Z-Score TB/U": "float",
+    "Probabilitas Stunting (simulasi)": "float",
+    "Usia Anak (bulan)": "float",
+    "Berat Lahir (gram)": "float",
+    "ASI Eksklusif": "category",
+    "Status Imunisasi Anak": "category",
+    "Pendidikan Ibu": "category",
+    "Akses Air Bersih": "category",
+    "Kepesertaan Program Bantuan": "category",
+    "Upah Keluarga (Rp/bulan)": "float",
+    "Jumlah Anak": "float",
+    "Tinggi Badan Ibu (cm)": "float",
+    "BMI Pra-Hamil": "float",
+    "Hb (g/dL)": "float",
+    "LiLA saat Hamil (cm)": "float",
+    "Kunjungan ANC (x)": "float",
+    "Paparan Asap Rokok": "category",
+    "Jenis Pekerjaan Orang Tua": "category",
+}
+
+
+@dataclass
+class ExportResult:
+    path: str
+    rows: int
+    size_bytes: int
+    file_name: str
+    mime: str
+
+
+def available_formats() -> List[str]:
+    """Format yang bisa dipakai di lingkungan ini (kolumnar hanya jika pyarrow terpasang)."""
+    return [k for k, v in FORMATS.items() if not v["columnar"] or pa is not None]
+
+
+def _new_path(ext: str, prefix: str = "stuntlytics_export_") -> str:
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=ext, dir=EXPORT_DIR)
+    os.close(fd)
+    return path
+
+
+def _open_text(path: str, compress: bool):
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=5)
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+# ------------------- tipe kolom Arrow -------------------
+
+def arrow_schema(columns: List[str], dictionary: bool = True):
+    """Schema Arrow sesuai COLUMN_TYPES. IPC file tidak mendukung kamus berbeda per batch,
+    jadi untuk Feather kolom kategori ditulis sebagai string biasa (`dictionary=False`)."""
+    fields = []
+    for col in columns:
+        kind = COLUMN_TYPES.get(col, "string")
+        if kind == "datetime":
+            typ = pa.timestamp("ms")
+        elif kind == "float":
+            typ = pa.float64()
+        elif kind == "category" and dictionary:
+            typ = pa.dictionary(pa.int32(), pa.string())
+        else:
+            typ = pa.string()
+        fields.append(pa.field(col, typ))
+    return pa.schema(fields)
+
+
+def _as_str(series: pd.Series) -> List[Optional[str]]:
+    return [None if v is None or (isinstance(v, float) and v != v) else str(v) for v in series]
+
+
+def _arrow_column(series: pd.Series, typ) -> Any:
+    if pa.types.is_timestamp(typ):
+        s = pd.to_datetime(series, errors="coerce", utc=True).dt.tz_localize(None)
+        return pa.array(s, from_pandas=True).cast(typ, safe=False)
+    if pa.types.is_floating(typ):
+        return pa.array(pd.to_numeric(series, errors="coerce"), type=typ, from_pandas=True)
+    arr = pa.array(_as_str(series), type=pa.string())
+    return arr.dictionary_encode() if pa.types.is_dictionary(typ) else arr
+
+
+def to_arrow_table(df: pd.DataFrame, schema) -> Any:
+    arrays = []
+    for field in schema:
+        col = df[field.name] if field.name in df.columns else pd.Series([None] * len(df), dtype=object)
+        arrays.append(_arrow_column(col, field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class _ColumnarWriter:
+    def __init__(self, fmt: str, path: str, columns: List[str]) -> None:
+        self.parquet = fmt == "Parquet"
+        self.schema = arrow_schema(columns, dictionary=self.parquet)
+        if self.parquet:
+            self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(
+                self._sink, self.schema, options=pa.ipc.IpcWriteOptions(compression="zstd")
+            )
+
+    def write(self, df: pd.DataFrame) -> None:
+        self._writer.write_table(to_arrow_table(df, self.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+        if not self.parquet:
+            self._sink.close()
+
+
+# ------------------- penulisan halaman -------------------
+
+def write_pages(
+    pages: Iterable[pd.DataFrame],
+    fmt: str = "CSV",
+    compress: bool = False,
+    file_name: str = "stuntlytics_export",
+    on_progress: Optional[Callable[[int], None]] = None,
+    columns: Optional[List[str]] = None,
+) -> ExportResult:
+    """Tulis setiap halaman ke file sementara; `on_progress(rows_sejauh_ini)` dipanggil per halaman.
+
+    `compress` (gzip) hanya berlaku untuk format teks; Parquet/Feather sudah terkompres zstd.
+    `columns` menentukan urutan & schema kolom (wajib agar file kolumnar kosong tetap valid).
+    """
+    if fmt not in available_formats():
+        raise ValueError(f"Format ekspor tidak tersedia: {fmt}")
+    columnar = FORMATS[fmt]["columnar"]
+    compress = compress and not columnar
+    ext = FORMATS[fmt]["ext"] + (".gz" if compress else "")
+    mime = "application/gzip" if compress else FORMATS[fmt]["mime"]
+    path = _new_path(ext)
+    rows = 0
+    try:
+        if columnar:
+            writer: Optional[_ColumnarWriter] = _ColumnarWriter(fmt, path, columns) if columns else None
+            try:
+                for df in pages:
+                    if df.empty:
+                        continue
+                    if writer is None:
+                        writer = _ColumnarWriter(fmt, path, list(df.columns))
+                    writer.write(df)
+                    rows += len(df)
+                    if on_progress:
+                        on_progress(rows)
+            finally:
+                if writer is not None:
+                    writer.close()
+        else:
+            with _open_text(path, compress) as fh:
+                for df in pages:
+                    if df.empty:
+                        continue
+                    if columns:
+                        df = df.reindex(columns=columns)
+                    if fmt == "CSV":
+                        df.to_csv(fh, index=False, header=(rows == 0))
+                    else:
+                        out = df.to_json(orient="records", lines=True, force_ascii=False, date_format="iso")
+                        fh.write(out if out.endswith("\n") else out + "\n")
+                    rows += len(df)
+                    if on_progress:
+                        on_progress(rows)
+    except BaseException:
+        remove(path)
+        raise
+    return ExportResult(path, rows, os.path.getsize(path), file_name + ext, mime)
+
+
+def remove(path: Optional[str]) -> None:
+    """Hapus file ekspor lama (abaikan jika sudah tidak ada)."""
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,480 @@
+# StuntLytics/src/local_mirror.py
+# Mirror kolumnar lokal dari index stunting, balita & nakes untuk dashboard yang banyak dibaca.
+# - Dibangun dari ES (scan PIT, lihat elastic_client.get_all_data) ke file Arrow IPC tanpa
+#   kompresi di MIRROR_DIR, satu file per index + manifest berisi versi data sumber.
+# - Saat dipakai, file di-memory-map (zero-copy) dan agregasi dijalankan in-process dengan
+#   pyarrow.compute: klik filter tidak perlu round trip ke ES.
+# - Fungsi publik punya signature sama dengan src/elastic_client.py; fungsi yang belum ada
+#   versi lokalnya (explorer, ekspor, dsb.) diteruskan ke elastic_client lewat __getattr__.
+#   Halaman memilih backend lewat src/data_backend.py (DATA_BACKEND=local).
+# - Trend, peta risiko, KPI & top-N dijawab dulu dari kubus OLAP (src/olap_cube.py) bila
+#   filternya bisa; kalau tidak, dihitung langsung dari kolom mirror.
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
+from src import config, elastic_client, query_cache, schema_registry
+
+ROOT = Path(__file__).resolve().parents[1]
+MIRROR_DIR = Path(os.getenv("LOCAL_MIRROR_DIR", str(ROOT / "data" / "mirror")))
+MANIFEST = "manifest.json"
+INDICES = [config.STUNTING_INDEX, config.BALITA_INDEX, config.NUTRITION_INDEX]
+
+STUNTING_INDEX = elastic_client.STUNTING_INDEX
+NUTRITION_INDEX = elastic_client.NUTRITION_INDEX
+CANDIDATES_WILAYAH = elastic_client.CANDIDATES_WILAYAH
+CANDIDATES_KECAMATAN = elastic_client.CANDIDATES_KECAMATAN
+
+_STUNTING_STATUS = "Status Stunting (Stunting / Berisiko / Normal)"
+
+
+def __getattr__(name: str) -> Any:
+    # fungsi/konstanta yang belum punya versi lokal -> pakai ES
+    return getattr(elastic_client, name)
+
+
+# ------------------- build & manifest -------------------
+
+def _path(index: str) -> Path:
+    return MIRROR_DIR / f"{index}.arrow"
+
+
+def read_manifest() -> Dict[str, Any]:
+    try:
+        with open(MIRROR_DIR / MANIFEST, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest: Dict[str, Any]) -> None:
+    tmp = MIRROR_DIR / (MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp, MIRROR_DIR / MANIFEST)
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Tipe kolom stabil untuk Arrow: Tanggal -> timestamp, kolom campur/objek -> string."""
+    out = df.copy()
+    for col in out.columns:
+        s = out[col]
+        if col == "Tanggal":
+            out[col] = pd.to_datetime(s, errors="coerce", utc=True).dt.tz_localize(None)
+        elif s.dtype == object:
+            out[col] = [None if v is None or (isinstance(v, float) and v != v) else str(v) for v in s]
+    return out
+
+
+def write_table(index: str, table: Any, source_version: Optional[str]) -> Dict[str, Any]:
+    """Tulis satu index ke file IPC (atomik) dan catat di manifest."""
+    MIRROR_DIR.mkdir(parents=True, exist_ok=True)
+    target = _path(index)
+    tmp = target.with_suffix(".arrow.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        # tanpa kompresi agar bisa di-memory-map zero-copy
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, target)
+    entry = {
+        "rows": table.num_rows,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "source_version": source_version,
+    }
+    manifest = read_manifest()
+    manifest[index] = entry
+    _write_manifest(manifest)
+    return entry
+
+
+def build(indices: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Ambil seluruh dokumen tiap index dari ES lalu tulis mirror-nya."""
+    if pa is None:
+        raise RuntimeError("Mirror lokal membutuhkan pyarrow")
+    out = {}
+    for index in indices or INDICES:
+        query_cache.VERSIONS.invalidate(index)
+        version = query_cache.data_version(index)
+        df = normalize_frame(elastic_client.get_all_data(index))
+        out[index] = write_table(index, pa.Table.from_pandas(df, preserve_index=False), version)
+    return out
+
+
+def build_from_snapshot(indices: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Bangun mirror dari snapshot Parquet (src/snapshot_sync.py, jalankan `sync` dulu), tanpa scan penuh ES."""
+    from src import snapshot_sync
+
+    out = {}
+    for index in indices or INDICES:
+        version = snapshot_sync.read_state(index).get("source_version")
+        df = normalize_frame(snapshot_sync.load(index))
+        out[index] = write_table(index, pa.Table.from_pandas(df, preserve_index=False), version)
+    return out
+
+
+# ------------------- tabel ter-memory-map -------------------
+
+class _Tables:
+    """Cache tabel per index; dimuat ulang otomatis jika file mirror diganti."""
+
+    def __init__(self) -> None:
+        self._tables: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, index: str) -> Any:
+        path = _path(index)
+        mtime = path.stat().st_mtime
+        with self._lock:
+            item = self._tables.get(index)
+            if item and item[0] == mtime:
+                return item[1]
+            table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+            self._tables[index] = (mtime, table)
+            return table
+
+
+TABLES = _Tables()
+
+
+def source_table(index: str, fields: List[str]) -> Tuple[Any, Any]:
+    """(key versi, loader tabel Arrow) untuk struktur turunan (kubus, sketch).
+    - DATA_BACKEND=local & mirror ada: ("mirror", built_at), dibaca dari mirror.
+    - Backend ES: key = versi data ES saat ini; dibaca dari mirror hanya jika mirror dibangun dari
+      versi itu ("mirror", versi), selain itu scan ES untuk `fields` saja ("es", versi).
+    Key None = ES tak terjangkau."""
+    from src import data_backend  # impor lambat: data_backend mengimpor modul ini
+
+    if data_backend.BACKEND == "local" and available([index]):
+        entry = read_manifest().get(index, {})
+        return ("mirror", entry.get("built_at")), lambda: TABLES.get(index)
+    version = query_cache.data_version(index)
+    if version is None:
+        return None, None
+    if available([index]) and read_manifest().get(index, {}).get("source_version") == version:
+        return ("mirror", version), lambda: TABLES.get(index)
+
+    def load() -> Any:
+        df = elastic_client.get_all_data(index, fields=fields)
+        return pa.Table.from_pandas(normalize_frame(df), preserve_index=False)
+
+    return ("es", version), load
+
+
+def available(indices: Optional[List[str]] = None) -> bool:
+    return pa is not None and all(_path(i).exists() for i in indices or [STUNTING_INDEX])
+
+
+def ping() -> Tuple[bool, str]:
+    if available():
+        rows = read_manifest().get(STUNTING_INDEX, {}).get("rows")
+        return True, f"Mirror lokal {MIRROR_DIR} ({rows} baris stunting)"
+    return False, f"Mirror lokal belum dibangun di {MIRROR_DIR}"
+
+
+# ------------------- filter (setara build_query) -------------------
+
+def _false(t: Any) -> Any:
+    return pa.array(np.zeros(t.num_rows, dtype=bool))
+
+
+def _isin(t: Any, field: str, values: List[Any]) -> Any:
+    if field not in t.column_names:
+        return _false(t)
+    col = t.column(field)
+    if not pa.types.is_string(col.type):
+        col = pc.cast(col, pa.string())
+    return pc.fill_null(pc.is_in(col, value_set=pa.array([str(v) for v in values])), False)
+
+
+def _range(t: Any, field: str, rng: Dict[str, Any]) -> Any:
+    if field not in t.column_names:
+        return _false(t)
+    col = t.column(field)
+    ops = {"gte": pc.greater_equal, "gt": pc.greater, "lte": pc.less_equal, "lt": pc.less}
+    mask = None
+    for op, val in rng.items():
+        if pa.types.is_timestamp(col.type):
+            val = pa.scalar(pd.Timestamp(val).to_pydatetime(), type=col.type)
+        m = ops[op](col, val)
+        mask = m if mask is None else pc.and_(mask, m)
+    return pc.fill_null(mask, False)
+
+
+def _any(masks: List[Any]) -> Any:
+    out = masks[0]
+    for m in masks[1:]:
+        out = pc.or_(out, m)
+    return out
+
+
+def _mask(t: Any, filters: Dict[str, Any]) -> Optional[Any]:
+    masks = []
+    if filters.get("date_from") or filters.get("date_to"):
+        rng = {}
+        if filters.get("date_from"):
+            rng["gte"] = filters["date_from"]
+        if filters.get("date_to"):
+            rng["lte"] = filters["date_to"]
+        masks.append(_range(t, "Tanggal", rng))
+    if filters.get("wilayah"):
+        masks.append(_isin(t, region_field(t.column_names, "wilayah", filters), filters["wilayah"]))
+    if filters.get("kecamatan"):
+        masks.append(_isin(t, region_field(t.column_names, "kecamatan", filters), filters["kecamatan"]))
+    zones = [elastic_client.RISK_ZONES[rl] for rl in filters.get("risk_level") or [] if rl in elastic_client.RISK_ZONES]
+    if zones:
+        masks.append(_any([_range(t, elastic_client.RISK_FIELD, z) for z in zones]))
+    if not masks:
+        return None
+    out = masks[0]
+    for m in masks[1:]:
+        out = pc.and_(out, m)
+    return out
+
+
+def region_field(columns: List[str], dimension: str, filters: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Kolom wilayah/kecamatan tabel mirror: pilihan sidebar, atau kandidat schema_registry pertama
+    yang ada di `columns` (tanpa _mapping ES)."""
+    chosen = (filters or {}).get(f"{dimension}_field")
+    if chosen:
+        return chosen
+    return next((f for f in schema_registry.DIMENSIONS[dimension] if f in columns), None)
+
+
+def _filtered(filters: Dict[str, Any], index: str = STUNTING_INDEX) -> Any:
+    t = TABLES.get(index)
+    mask = _mask(t, filters)
+    return t if mask is None else t.filter(mask)
+
+
+def _stunting_any(t: Any) -> Any:
+    return _any([
+        _isin(t, "Status Stunting (Biner)", elastic_client._STUNTING_BINER),
+        _isin(t, _STUNTING_STATUS, ["Stunting", "stunting"]),
+        _range(t, "Z-Score TB/U", {"lte": -2.0}),
+    ])
+
+
+def _count(mask: Any) -> int:
+    return int(pc.sum(pc.cast(mask, pa.int64())).as_py() or 0)
+
+
+def _month(t: Any) -> Any:
+    return pc.strftime(t.column("Tanggal"), format="%Y-%m")
+
+
+def _cube(filters: Dict[str, Any], advanced: Optional[Dict[str, Any]] = None) -> Any:
+    """Kubus OLAP (src/olap_cube.py) jika filter bisa dijawabnya, selain itu None."""
+    from src import olap_cube
+
+    return olap_cube.for_filters(filters, advanced)
+
+
+# ------------------- fungsi setara elastic_client -------------------
+
+def get_filter_options(base_filters: Dict[str, Any], field_candidates: List[str], size: int = 500) -> Tuple[Optional[str], List[str]]:
+    t = _filtered(base_filters)
+    for field in field_candidates:
+        if field not in t.column_names:
+            continue
+        counts = pc.value_counts(pc.drop_null(t.column(field)))
+        if len(counts):
+            vals = counts.field("values").to_pylist()
+            freq = counts.field("counts").to_pylist()
+            top = [v for v, _ in sorted(zip(vals, freq), key=lambda x: -x[1])[:size]]
+            return field, sorted(top)
+    return None, []
+
+
+def get_region_hierarchy(base_filters: Dict[str, Any]) -> Dict[str, Any]:
+    t = _filtered({"date_from": base_filters.get("date_from"), "date_to": base_filters.get("date_to")})
+    for wf in CANDIDATES_WILAYAH:
+        if wf not in t.column_names or t.column(wf).null_count == t.num_rows:
+            continue
+        kf = next((f for f in CANDIDATES_KECAMATAN
+                   if f in t.column_names and t.column(f).null_count < t.num_rows), None)
+        cols = [wf] + ([kf] if kf else [])
+        pairs = t.select(cols).group_by(cols).aggregate([]).to_pydict()
+        tree: Dict[str, List[str]] = {}
+        for i, kab in enumerate(pairs[wf]):
+            if kab is None:
+                continue
+            kecs = tree.setdefault(kab, [])
+            if kf and pairs[kf][i] is not None:
+                kecs.append(pairs[kf][i])
+        return {"wilayah_field": wf, "kecamatan_field": kf,
+                "tree": {k: sorted(v) for k, v in sorted(tree.items())}}
+    return {"wilayah_field": None, "kecamatan_field": None, "tree": {}}
+
+
+def get_monthly_trend(filters: Dict[str, Any]) -> pd.DataFrame:
+    from src.olap_cube import _fill_months
+
+    cube = _cube(filters)
+    if cube is not None:
+        return cube.monthly_trend(filters)
+    t = _filtered(filters)
+    if "Tanggal" not in t.column_names:
+        return pd.DataFrame(columns=["Stunting %"], index=pd.Index([], name="Bulan"))
+    df = pd.DataFrame({"Bulan": _month(t).to_numpy(zero_copy_only=False),
+                       "stunting": _stunting_any(t).to_numpy(zero_copy_only=False)}).dropna(subset=["Bulan"])
+    g = _fill_months(df.groupby("Bulan")["stunting"].agg(["sum", "count"]).sort_index())
+    out = (g["sum"] / g["count"].where(g["count"] > 0) * 100).fillna(0).round(2).rename("Stunting %")
+    return out.to_frame()
+
+
+def get_risk_map_data(filters: dict) -> pd.DataFrame:
+    cols = ["kabupaten", "kecamatan", "total_anak", "jumlah_stunting"]
+    cube = _cube(filters)
+    if cube is not None:
+        return cube.risk_map(filters)
+    t = _filtered(filters)
+    wf = region_field(t.column_names, "wilayah", filters)
+    kf = region_field(t.column_names, "kecamatan", filters)
+    if wf not in t.column_names or kf not in t.column_names:
+        return pd.DataFrame(columns=cols)
+    df = pd.DataFrame({
+        "kabupaten": t.column(wf).to_numpy(zero_copy_only=False),
+        "kecamatan": t.column(kf).to_numpy(zero_copy_only=False),
+        "stunting": _stunting_any(t).to_numpy(zero_copy_only=False),
+    }).dropna(subset=["kabupaten", "kecamatan"])
+    g = df.groupby(["kabupaten", "kecamatan"], sort=True)["stunting"].agg(["count", "sum"]).reset_index()
+    g.columns = cols
+    return g
+
+
+def _main_stunting_stats(filters: Dict[str, Any]) -> Dict[str, Any]:
+    cube = _cube(filters)
+    if cube is not None:
+        return cube.main_stats(filters)
+    t = _filtered(filters)
+    lengkap = _any([_isin(t, f, elastic_client._IMUN_LENGKAP) for f in elastic_client._IMUNISASI_FIELDS])
+    imun_total = sum(
+        t.num_rows - t.column(f).null_count for f in elastic_client._IMUNISASI_FIELDS if f in t.column_names
+    )
+    air_total = t.num_rows - t.column("Akses Air Bersih").null_count if "Akses Air Bersih" in t.column_names else 0
+    trend: List[Tuple[str, int, int]] = []
+    if "Tanggal" in t.column_names:
+        df = pd.DataFrame({"bulan": _month(t).to_numpy(zero_copy_only=False),
+                           "lengkap": lengkap.to_numpy(zero_copy_only=False)}).dropna(subset=["bulan"])
+        g = df.groupby("bulan")["lengkap"].agg(["count", "sum"]).sort_index()
+        trend = [(b, int(r["count"]), int(r["sum"])) for b, r in g.iterrows()]
+    return {
+        "total": t.num_rows,
+        "stunting": _count(_stunting_any(t)),
+        "imun_lengkap": _count(lengkap),
+        "imun_total": imun_total,
+        "air_layak": _count(_isin(t, "Akses Air Bersih", elastic_client._AIR_LAYAK)),
+        "air_total": air_total,
+        "trend": trend,
+    }
+
+
+def _nakes(filters: Dict[str, Any]) -> Tuple[float, pd.Series]:
+    empty = pd.Series([], dtype="float64", name="jumlah_nakes")
+    if not available([NUTRITION_INDEX]):
+        return 0.0, empty
+    t = TABLES.get(NUTRITION_INDEX)
+    masks = []
+    if filters.get("wilayah"):
+        masks.append(_isin(t, "nama_kabupaten_kota", filters["wilayah"]))
+    yr = {}
+    if filters.get("date_from"):
+        yr["gte"] = int(str(filters["date_from"])[:4])
+    if filters.get("date_to"):
+        yr["lte"] = int(str(filters["date_to"])[:4])
+    if yr and "tahun" in t.column_names:
+        col = pc.cast(t.column("tahun"), pa.int64(), safe=False)
+        t = t.set_column(t.column_names.index("tahun"), "tahun", col)
+        masks.append(_range(t, "tahun", yr))
+    for m in masks:
+        t = t.filter(m)
+    if "jumlah_nakes_gizi" not in t.column_names or t.num_rows == 0:
+        return 0.0, empty
+    df = pd.DataFrame({
+        "region": t.column("nama_kabupaten_kota").to_numpy(zero_copy_only=False) if "nama_kabupaten_kota" in t.column_names else None,
+        "jumlah_nakes": pd.to_numeric(t.column("jumlah_nakes_gizi").to_numpy(zero_copy_only=False), errors="coerce"),
+    })
+    by_region = df.dropna(subset=["region"]).groupby("region")["jumlah_nakes"].sum().sort_values(ascending=False)
+    return float(df["jumlah_nakes"].sum()), by_region.head(100).rename("jumlah_nakes")
+
+
+def get_main_page_summary(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Sama dengan elastic_client.get_main_page_summary, dihitung dari mirror lokal."""
+    st_stats = _main_stunting_stats(filters)
+    total_nakes, nakes_grouped = _nakes(filters)
+
+    imun_total = st_stats["imun_total"]
+    air_total = st_stats["air_total"]
+    imun_trend_rows = [
+        {"tanggal": pd.to_datetime(bulan), "imunisasi_lengkap": (lengkap / total) if total > 0 else 0}
+        for bulan, total, lengkap in st_stats["trend"]
+    ]
+    return {
+        "kpi": {
+            "total_bayi_lahir": st_stats["total"],
+            "total_bayi_stunting": st_stats["stunting"],
+            "jumlah_nakes": total_nakes,
+            "cakupan_imunisasi_pct": (st_stats["imun_lengkap"] / imun_total * 100.0) if imun_total else 0.0,
+            "akses_air_layak_pct": (st_stats["air_layak"] / air_total * 100.0) if air_total else 0.0,
+        },
+        "charts": {
+            "nakes_by_region": nakes_grouped,
+            "imunisasi_trend": pd.DataFrame(imun_trend_rows),
+            "air_distribusi": pd.Series({
+                "Layak": st_stats["air_layak"],
+                "Tidak Layak": max(0, air_total - st_stats["air_layak"]),
+            }),
+        },
+    }
+
+
+def _numeric_frame(t: Any, fields: List[str]) -> pd.DataFrame:
+    cols = {}
+    for f in fields:
+        if f in t.column_names:
+            cols[f] = pd.to_numeric(t.column(f).to_numpy(zero_copy_only=False), errors="coerce")
+    df = pd.DataFrame(cols)
+    return df.dropna(axis=1, how="all")
+
+
+def get_numeric_sample_for_corr(filters: Dict[str, Any], size: int = 5000, fields: Optional[List[str]] = None) -> pd.DataFrame:
+    t = _filtered(filters).slice(0, size)
+    if not fields:  # semua kolom numerik, sama dengan versi ES
+        fields = [f.name for f in t.schema if pa.types.is_integer(f.type) or pa.types.is_floating(f.type)]
+    return _numeric_frame(t, fields)
+
+
+def get_correlation_with_target(
+    filters: Dict[str, Any],
+    target: str = elastic_client.CORR_TARGET,
+    fields: Optional[List[str]] = None,
+    sample_size: int = 5000,
+) -> pd.Series:
+    """Korelasi Pearson pairwise atas seluruh baris terfilter (tanpa sampling)."""
+    fields = [f for f in (fields or elastic_client.CORR_FIELDS) if f != target]
+    df = _numeric_frame(_filtered(filters), [target] + fields)
+    if target not in df.columns:
+        return pd.Series(dtype=float)
+    return df.drop(columns=[target]).corrwith(df[target]).dropna()
+
+
+def get_top_counts_for_explorer_chart(filters: dict, advanced_filters: dict) -> pd.DataFrame:
+    """Top 5 kabupaten (atau kecamatan jika ada filter wilayah) dari kubus; selain itu ke ES."""
+    cube = _cube(filters, advanced_filters)
+    if cube is None:
+        return elastic_client.get_top_counts_for_explorer_chart(filters, advanced_filters)
+    return cube.top_counts(filters, advanced_filters)
@@ -0,0 +1,373 @@
+# StuntLytics/src/olap_cube.py
+# Kubus OLAP in-memory untuk cross-filtering instan.
+# - Dimensi = filter yang tersedia di UI: bulan, kabupaten, kecamatan, zona risiko,
+#   pendidikan ibu, ASI eksklusif, akses air. Ukuran = count & sum (n, stunting_any,
+#   imunisasi, air, probabilitas).
+# - Disimpan sparse (COO): satu baris per kombinasi dimensi yang punya data, berisi kode
+#   int32 per dimensi + array ukuran float64. Dibangun sekali per versi data.
+# - Query = mask boolean atas sel + np.bincount per dimensi group-by; tidak ada round trip ES.
+#   Filter yang tidak bisa dijawab kubus (tanggal tidak sebulan penuh, field wilayah lain)
+#   ditolak `answerable`, pemanggil kembali ke jalur biasa. Field wilayah/kecamatan kubus =
+#   hasil resolve saat build (schema_registry, atau kolom mirror) dan ikut menjadi key kubus.
+# - Dipakai kedua backend: local_mirror (dibangun dari file mirror, menunggu build) dan
+#   elastic_client (dibangun dari scan ES di thread latar per versi data; selama kubus versi
+#   terbaru belum siap, fungsi ES tetap query ke cluster). Jalur ES opt-in (OLAP_CUBE_ES=1):
+#   build = scan PIT seluruh index stunting ke memori proses, jadi dibatasi OLAP_CUBE_ES_MAX_DOCS
+#   dokumen; build yang gagal dicatat ke log & dicoba lagi dengan backoff per versi data.
+# - Pada index ternormalisasi (elastic_client.normalized) ukuran & dimensi ASI/air memakai
+#   field boolean yang sama dengan query ES.
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
+from src import elastic_client, local_mirror, schema_registry
+
+ENABLED = os.getenv("OLAP_CUBE", "1").lower() not in ("0", "false", "no")
+ES_ENABLED = ENABLED and os.getenv("OLAP_CUBE_ES", "0").lower() in ("1", "true", "yes")
+ES_MAX_DOCS = int(os.getenv("OLAP_CUBE_ES_MAX_DOCS", "2000000"))
+RETRY_BASE_S = float(os.getenv("OLAP_CUBE_RETRY_S", "60"))
+RETRY_MAX_S = 3600.0
+
+LOG = logging.getLogger(__name__)
+
+DIMS = ["bulan", "kabupaten", "kecamatan", "zona", "pendidikan", "asi", "air"]
+MEASURES = ["n", "stunting", "imun_lengkap", "imun_total", "air_layak", "air_total", "prob_sum", "prob_count"]
+
+WILAYAH_FIELD = "nama_kabupaten_kota"
+KECAMATAN_FIELD = "Kecamatan"
+# semua kandidat wilayah/kecamatan ikut di-scan; yang dipakai ditentukan _region_fields
+CUBE_FIELDS = [
+    "Tanggal", *schema_registry.DIMENSIONS["wilayah"], *schema_registry.DIMENSIONS["kecamatan"],
+    elastic_client.RISK_FIELD, "Pendidikan Ibu",
+    "Status Stunting (Biner)", local_mirror._STUNTING_STATUS, "Z-Score TB/U",
+    *elastic_client._IMUNISASI_FIELDS, *elastic_client.ASI_FIELDS, *elastic_client.AIR_FIELDS,
+    *elastic_client.NORMALIZED_FIELDS,
+]
+
+
+def _np(arr: Any) -> np.ndarray:
+    return arr.to_numpy(zero_copy_only=False) if hasattr(arr, "to_numpy") else np.asarray(arr)
+
+
+def _strings(t: Any, field: str) -> np.ndarray:
+    if field not in t.column_names:
+        return np.full(t.num_rows, None, dtype=object)
+    col = t.column(field)
+    if not pa.types.is_string(col.type):
+        col = pc.cast(col, pa.string())
+    return _np(col).astype(object)
+
+
+def _labelled(t: Any, masks: List[Tuple[str, Any]]) -> np.ndarray:
+    """Label pertama yang mask-nya True untuk tiap baris (None jika tidak ada)."""
+    out = np.full(t.num_rows, None, dtype=object)
+    for label, mask in reversed(masks):
+        out[_np(mask).astype(bool)] = label
+    return out
+
+
+def _not_null(t: Any, field: str) -> np.ndarray:
+    if field not in t.column_names:
+        return np.zeros(t.num_rows)
+    return _np(pc.is_valid(t.column(field))).astype(np.float64)
+
+
+def _flag(t: Any, field: str, value: bool) -> np.ndarray:
+    """Mask baris dengan field boolean (index ternormalisasi) bernilai `value`."""
+    if field not in t.column_names:
+        return np.zeros(t.num_rows, dtype=bool)
+    col = t.column(field)
+    if not pa.types.is_boolean(col.type):
+        col = pc.equal(pc.cast(col, pa.string()), "true")
+    return _np(pc.fill_null(pc.equal(col, value), False)).astype(bool)
+
+
+def _month_key(value: Any) -> str:
+    return pd.Timestamp(value).strftime("%Y-%m")
+
+
+def _fill_months(g: pd.DataFrame) -> pd.DataFrame:
+    """Isi bulan kosong di antara bulan pertama & terakhir dengan 0 (seperti date_histogram ES)."""
+    if g.empty:
+        return g
+    months = pd.period_range(g.index.min(), g.index.max(), freq="M").strftime("%Y-%m")
+    return g.reindex(pd.Index(months, name=g.index.name), fill_value=0)
+
+
+class Cube:
+    def __init__(self, version: Any, labels: Dict[str, np.ndarray], codes: Dict[str, np.ndarray],
+                 measures: Dict[str, np.ndarray], normalized: bool = False,
+                 regions: Tuple[str, str] = (WILAYAH_FIELD, KECAMATAN_FIELD)) -> None:
+        self.version = version
+        self.normalized = normalized
+        self.wilayah_field, self.kecamatan_field = regions
+        self.labels = labels        # dim -> array label (object), index = kode
+        self.codes = codes          # dim -> kode int32 per sel (-1 = kosong)
+        self.measures = measures    # ukuran -> float64 per sel
+        self._index = {d: {v: i for i, v in enumerate(labels[d])} for d in DIMS}
+
+    @property
+    def cells(self) -> int:
+        return len(self.measures["n"])
+
+    # ---------- build ----------
+
+    @classmethod
+    def from_table(cls, t: Any, version: Any = None, normalized: bool = False,
+                   regions: Tuple[str, str] = (WILAYAH_FIELD, KECAMATAN_FIELD)) -> "Cube":
+        ec, lm = elastic_client, local_mirror
+        normalized = normalized and all(f in t.column_names for f in ec.NORMALIZED_FIELDS)
+        dims = {
+            "bulan": _np(lm._month(t)).astype(object) if "Tanggal" in t.column_names else _strings(t, "Tanggal"),
+            "kabupaten": _strings(t, regions[0]),
+            "kecamatan": _strings(t, regions[1]),
+            "zona": _labelled(t, [(z, lm._range(t, ec.RISK_FIELD, r)) for z, r in ec.RISK_ZONES.items()]),
+            "pendidikan": _strings(t, "Pendidikan Ibu"),
+            "asi": _labelled(t, [(k, lm._any([lm._isin(t, f, v) for f in ec.ASI_FIELDS])) for k, v in ec.ASI_VALUES.items()]),
+            "air": _labelled(t, [(k, lm._any([lm._isin(t, f, v) for f in ec.AIR_FIELDS])) for k, v in ec.AIR_VALUES.items()]),
+        }
+        prob = _np(pc.cast(t.column(ec.RISK_FIELD), pa.float64())) if ec.RISK_FIELD in t.column_names else np.full(t.num_rows, np.nan)
+        if normalized:
+            dims["asi"] = _labelled(t, [("Ya", _flag(t, "asi_eksklusif", True)), ("Tidak", _flag(t, "asi_eksklusif", False))])
+            dims["air"] = _labelled(t, [("Ada", _flag(t, "akses_air_layak", True)), ("Tidak", _flag(t, "akses_air_layak", False))])
+        row_measures = {
+            "n": np.ones(t.num_rows),
+            "stunting": _np(lm._stunting_any(t)).astype(np.float64),
+            "imun_lengkap": _np(lm._any([lm._isin(t, f, ec._IMUN_LENGKAP) for f in ec._IMUNISASI_FIELDS])).astype(np.float64),
+            "imun_total": sum(_not_null(t, f) for f in ec._IMUNISASI_FIELDS),
+            "air_layak": _np(lm._isin(t, "Akses Air Bersih", ec._AIR_LAYAK)).astype(np.float64),
+            "air_total": _not_null(t, "Akses Air Bersih"),
+            "prob_sum": np.nan_to_num(prob.astype(np.float64)),
+            "prob_count": (~np.isnan(prob.astype(np.float64))).astype(np.float64),
+        }
+        if normalized:
+            row_measures.update({
+                "stunting": _flag(t, "is_stunting", True).astype(np.float64),
+                "imun_lengkap": _flag(t, "imunisasi_lengkap", True).astype(np.float64),
+                "imun_total": _not_null(t, "imunisasi_lengkap"),
+                "air_layak": _flag(t, "akses_air_layak", True).astype(np.float64),
+                "air_total": _not_null(t, "akses_air_layak"),
+            })
+
+        labels, row_codes = {}, []
+        for d in DIMS:
+            codes, uniques = pd.factorize(pd.Series(dims[d], dtype=object), sort=True)
+            labels[d] = np.asarray(uniques, dtype=object)
+            row_codes.append(codes.astype(np.int64) + 1)  # 0 = kosong
+        shape = tuple(len(labels[d]) + 1 for d in DIMS)
+        keys = np.ravel_multi_index(row_codes, shape) if t.num_rows else np.zeros(0, dtype=np.int64)
+        cell_keys, inverse = np.unique(keys, return_inverse=True)
+        measures = {m: np.bincount(inverse, weights=v, minlength=len(cell_keys)) for m, v in row_measures.items()}
+        cell_codes = np.unravel_index(cell_keys, shape)
+        codes = {d: (c - 1).astype(np.int32) for d, c in zip(DIMS, cell_codes)}
+        return cls(version, labels, codes, measures, normalized, regions)
+
+    # ---------- query ----------
+
+    def answerable(self, filters: Dict[str, Any], advanced: Optional[Dict[str, Any]] = None) -> bool:
+        # field pilihan sidebar harus sama dengan field kubus, juga tanpa nilai filter (group-by peta/top-N)
+        if filters.get("wilayah_field", self.wilayah_field) != self.wilayah_field:
+            return False
+        if filters.get("kecamatan_field", self.kecamatan_field) != self.kecamatan_field:
+            return False
+        return elastic_client._whole_months(filters.get("date_from"), filters.get("date_to"))
+
+    def _isin(self, dim: str, values: List[Any]) -> np.ndarray:
+        wanted = [self._index[dim][v] for v in values if v in self._index[dim]]
+        return np.isin(self.codes[dim], np.asarray(wanted, dtype=np.int32))
+
+    def mask(self, filters: Dict[str, Any], advanced: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        m = np.ones(self.cells, dtype=bool)
+        if filters.get("date_from") or filters.get("date_to"):
+            lo = _month_key(filters["date_from"]) if filters.get("date_from") else ""
+            hi = _month_key(filters["date_to"]) if filters.get("date_to") else "9999-99"
+            m &= self._isin("bulan", [b for b in self.labels["bulan"] if lo <= b <= hi])
+        if filters.get("wilayah"):
+            m &= self._isin("kabupaten", filters["wilayah"])
+        if filters.get("kecamatan"):
+            m &= self._isin("kecamatan", filters["kecamatan"])
+        zones = [z for z in filters.get("risk_level") or [] if z in elastic_client.RISK_ZONES]
+        if zones:
+            m &= self._isin("zona", zones)
+        advanced = advanced or {}
+        if advanced.get("pendidikan_ibu"):
+            m &= self._isin("pendidikan", advanced["pendidikan_ibu"])
+        if advanced.get("asi_eksklusif") not in (None, "Semua"):
+            m &= self._isin("asi", [advanced["asi_eksklusif"]])
+        if advanced.get("akses_air") not in (None, "Semua"):
+            m &= self._isin("air", [advanced["akses_air"]])
+        return m
+
+    def totals(self, filters: Dict[str, Any], advanced: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+        m = self.mask(filters, advanced)
+        return {k: float(v[m].sum()) for k, v in self.measures.items()}
+
+    def group(self, filters: Dict[str, Any], dims: List[str], advanced: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """Jumlah ukuran per kombinasi `dims` (sel dengan dimensi kosong dibuang)."""
+        m = self.mask(filters, advanced)
+        for d in dims:
+            m &= self.codes[d] >= 0
+        shape = tuple(len(self.labels[d]) for d in dims)
+        keys = np.ravel_multi_index([self.codes[d][m] for d in dims], shape)
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        out = {d: self.labels[d][c] for d, c in zip(dims, np.unravel_index(uniq, shape))}
+        for k, v in self.measures.items():
+            out[k] = np.bincount(inverse, weights=v[m], minlength=len(uniq))
+        return pd.DataFrame(out)
+
+    def top_n(self, filters: Dict[str, Any], dim: str, n: int = 5, measure: str = "n",
+              advanced: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """`n` label teratas; seri diurutkan label naik seperti agregasi terms ES."""
+        g = self.group(filters, [dim], advanced).sort_values([measure, dim], ascending=[False, True], kind="stable")
+        return g.head(n).reset_index(drop=True)
+
+    # ---------- jawaban dengan bentuk sama seperti elastic_client ----------
+
+    def monthly_trend(self, filters: Dict[str, Any]) -> pd.DataFrame:
+        g = _fill_months(self.group(filters, ["bulan"]).set_index("bulan").sort_index())
+        pct = [round(s / n * 100, 2) if n > 0 else 0 for s, n in zip(g["stunting"], g["n"])]
+        out = pd.DataFrame({"Stunting %": pct}, index=g.index)
+        out.index.name = "Bulan"
+        return out
+
+    def risk_map(self, filters: Dict[str, Any]) -> pd.DataFrame:
+        cols = ["kabupaten", "kecamatan", "total_anak", "jumlah_stunting"]
+        g = self.group(filters, ["kabupaten", "kecamatan"]).sort_values(["kabupaten", "kecamatan"])
+        g = g.rename(columns={"n": "total_anak", "stunting": "jumlah_stunting"})[cols]
+        return g.astype({"total_anak": int, "jumlah_stunting": int}).reset_index(drop=True)
+
+    def main_stats(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        """Angka dasar KPI (bentuk sama dengan elastic_client._main_stunting_stats)."""
+        tot = self.totals(filters)
+        trend = _fill_months(self.group(filters, ["bulan"]).set_index("bulan").sort_index())
+        out: Dict[str, Any] = {k: int(tot[k]) for k in ["stunting", "imun_lengkap", "imun_total", "air_layak", "air_total"]}
+        out["total"] = int(tot["n"])
+        out["trend"] = [(b, int(r.n), int(r.imun_lengkap)) for b, r in trend.iterrows()]
+        return out
+
+    def top_counts(self, filters: Dict[str, Any], advanced: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """Top 5 kabupaten (atau kecamatan jika ada filter wilayah), kolom [label, "Jumlah Data"]."""
+        dim, label = ("kecamatan", "Kecamatan") if filters.get("wilayah") else ("kabupaten", "Kabupaten/Kota")
+        top = self.top_n(filters, dim, 5, advanced=advanced)
+        if top.empty:
+            return pd.DataFrame(columns=[label, "Jumlah Data"])
+        return pd.DataFrame({label: top[dim], "Jumlah Data": top["n"].astype(int)})
+
+
+# ------------------- kubus per versi data -------------------
+
+_LOCK = threading.Condition()
+_CURRENT: Dict[str, Any] = {"key": None, "cube": None, "building": None}
+_FAILURES: Dict[Any, Tuple[int, float]] = {}  # key -> (jumlah gagal, boleh dicoba lagi setelah)
+_SKIPPED: set = set()  # key sumber ES yang melebihi ES_MAX_DOCS (sudah dicatat ke log)
+
+
+def _build(key: Any, load: Any) -> Optional[Cube]:
+    """Bangun kubus untuk `key` di luar _LOCK. Hasil dipasang hanya jika `key` masih yang sedang
+    dibangun (versi lebih baru / reset() membatalkannya); gagal -> log + backoff eksponensial per key."""
+    _, normalized, regions = key
+    try:
+        cube = Cube.from_table(load(), version=key, normalized=normalized, regions=regions)
+    except Exception as e:
+        with _LOCK:
+            attempts = _FAILURES.get(key, (0, 0.0))[0] + 1
+            delay = min(RETRY_BASE_S * 2 ** (attempts - 1), RETRY_MAX_S)
+            _FAILURES[key] = (attempts, time.monotonic() + delay)
+            if _CURRENT["building"] == key:
+                _CURRENT["building"] = None
+            _LOCK.notify_all()
+        LOG.warning("Build kubus OLAP %s gagal (percobaan %d), dicoba lagi dalam %.0f detik: %s",
+                    key, attempts, delay, e, exc_info=True)
+        return None
+    with _LOCK:
+        if _CURRENT["building"] == key:
+            _CURRENT.update(cube=cube, key=key, building=None)
+        _FAILURES.pop(key, None)
+        _LOCK.notify_all()
+    return cube
+
+
+def _backing_off(key: Any) -> bool:
+    failed = _FAILURES.get(key)
+    return failed is not None and time.monotonic() < failed[1]
+
+
+def _too_big(source: Any) -> bool:
+    """Sumber scan ES dengan dokumen > ES_MAX_DOCS (jumlah dari token versi "total:max")."""
+    if source[0] != "es":
+        return False
+    try:
+        total = int(str(source[1]).split(":", 1)[0])
+    except ValueError:
+        return False
+    if total <= ES_MAX_DOCS:
+        return False
+    if source not in _SKIPPED:
+        _SKIPPED.add(source)
+        LOG.warning("Kubus OLAP tidak dibangun: %s berisi %d dokumen (> OLAP_CUBE_ES_MAX_DOCS=%d)",
+                    elastic_client.STUNTING_INDEX, total, ES_MAX_DOCS)
+    return True
+
+
+def _region_fields(source: Any) -> Tuple[str, str]:
+    """Field wilayah/kecamatan kubus: dari kolom file mirror (tanpa ES), atau resolve _mapping."""
+    if source[0] == "mirror":
+        columns = local_mirror.TABLES.get(elastic_client.STUNTING_INDEX).column_names
+        return (local_mirror.region_field(columns, "wilayah") or WILAYAH_FIELD,
+                local_mirror.region_field(columns, "kecamatan") or KECAMATAN_FIELD)
+    return elastic_client.wilayah_field({}), elastic_client.kecamatan_field({})
+
+
+def get_cube(wait: bool = True) -> Optional[Cube]:
+    """Kubus untuk versi data saat ini. wait=False: jangan pernah menunggu build; build dimulai di
+    thread latar dan None dikembalikan sampai kubusnya siap. Build tidak memegang _LOCK, jadi
+    pemanggil wait=False tidak ikut tertahan oleh pemanggil wait=True."""
+    if not ENABLED or pa is None:
+        return None
+    source, load = local_mirror.source_table(elastic_client.STUNTING_INDEX, CUBE_FIELDS)
+    if source is None or _too_big(source):
+        return None
+    key = (source, elastic_client.normalized(), _region_fields(source))
+    with _LOCK:
+        while True:
+            if _CURRENT["key"] == key:
+                return _CURRENT["cube"]
+            if _backing_off(key):
+                return None
+            if _CURRENT["building"] != key:
+                break
+            if not wait:
+                return None
+            _LOCK.wait()
+        _CURRENT["building"] = key
+    if wait:
+        return _build(key, load)
+    threading.Thread(target=_build, args=(key, load), name="olap-cube", daemon=True).start()
+    return None
+
+
+def for_filters(filters: Dict[str, Any], advanced: Optional[Dict[str, Any]] = None, wait: bool = True) -> Optional[Cube]:
+    cube = get_cube(wait)
+    return cube if cube is not None and cube.answerable(filters, advanced) else None
+
+
+def reset() -> None:
+    """Lupakan kubus yang tersimpan (hasil build yang sedang jalan dibuang)."""
+    with _LOCK:
+        _CURRENT["cube"], _CURRENT["key"], _CURRENT["building"] = None, None, None
+        _FAILURES.clear()
+        _SKIPPED.clear()
+        _LOCK.notify_all()
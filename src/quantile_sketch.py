@@ -0,0 +1,299 @@
+# StuntLytics/src/quantile_sketch.py
+# Sketch kuantil (t-digest) per sel kabupaten × kecamatan × bulan × zona risiko.
+# - Dibangun sekali per versi data (mirror lokal atau scan ES) lalu disimpan sebagai satu file
+#   .npz di SKETCH_DIR; proses lain cukup memuat file untuk versi yang sama.
+# - Persentil untuk gabungan wilayah/rentang bulan mana pun = gabung centroid sel terpilih,
+#   urutkan per mean, interpolasi pada rank kumulatif. Tidak ada round trip ES.
+# - Sel dengan <= SKETCH_COMPRESSION nilai unik disimpan persis (nilai + jumlah), sel lebih
+#   besar dipadatkan dengan skala k1 t-digest: k(q) = δ/(2π)·asin(2q-1), satu centroid per
+#   rentang Δk <= 1 (± δ/2 centroid per sel).
+#
+# Batas galat (δ = SKETCH_COMPRESSION, default 100 = default `percentiles` ES yang juga t-digest):
+# - Satu sel: centroid di rank q (rank di dalam selnya) mencakup Δq <= (2π/δ)·√(q(1-q)) dari
+#   data sel itu, sehingga galat rank <= (π/δ)·√(q(1-q)): p50 ≈ 1.6%, p25/p75 ≈ 1.4%,
+#   p5/p95 ≈ 0.7% (δ=100).
+# - Gabungan sel: lebar centroid tetap ditentukan rank-nya di sel asal, dan centroid tengah
+#   sel mana pun bisa jatuh di kuantil gabungan berapa pun. Batasnya turun ke batas terburuk
+#   di dalam sel, maks antar sel ≈ π/(2δ) ≈ 1.6% (δ=100), di kuantil mana saja, termasuk
+#   p5/p95. Sel kecil yang tersimpan persis tidak menambah galat.
+# - Persentil ES sendiri juga aproksimasi t-digest δ=100, jadi selisih keduanya berada dalam
+#   orde yang sama; ukur pada data nyata dengan `python -m scripts.build_sketches --compare`.
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
+from src import elastic_client, local_mirror, olap_cube
+
+ROOT = Path(__file__).resolve().parents[1]
+SKETCH_DIR = Path(os.getenv("SKETCH_DIR", str(ROOT / "data" / "sketches")))
+ENABLED = os.getenv("QUANTILE_SKETCH", "1").lower() not in ("0", "false", "no")
+COMPRESSION = float(os.getenv("SKETCH_COMPRESSION", "100"))
+# Tanpa mirror lokal, membangun sketch = scan ES penuh; default hanya lewat scripts/build_sketches.
+AUTO_BUILD = os.getenv("SKETCH_AUTO_BUILD", "0").lower() in ("1", "true", "yes")
+
+DIMS = ["bulan", "kabupaten", "kecamatan", "zona"]
+# kunci output summary_for_filters -> field ES
+METRICS = {
+    "bmi": "BMI Pra-Hamil",
+    "lila": "LiLA saat Hamil (cm)",
+    "hb": "Hb (g/dL)",
+    "z": "Z-Score TB/U",
+}
+PERCENTS = [5, 25, 50, 75, 95]
+SKETCH_FIELDS = ["Tanggal", olap_cube.WILAYAH_FIELD, olap_cube.KECAMATAN_FIELD, elastic_client.RISK_FIELD,
+                 *METRICS.values()]
+
+
+# ------------------- t-digest (NumPy) -------------------
+
+def _k(q: np.ndarray, delta: float) -> np.ndarray:
+    return delta / (2 * np.pi) * np.arcsin(2 * np.clip(q, 0.0, 1.0) - 1)
+
+
+def compress(values: np.ndarray, weights: np.ndarray, delta: float = COMPRESSION) -> Tuple[np.ndarray, np.ndarray]:
+    """Padatkan titik (terurut per nilai) menjadi centroid (mean, bobot) dengan skala k1."""
+    total = weights.sum()
+    if len(values) <= delta or total <= 0:
+        return values, weights
+    q_left = (np.cumsum(weights) - weights) / total
+    bucket = np.floor(_k(q_left, delta) + delta / 4).astype(np.int64)  # k(0) = -δ/4
+    _, bucket = np.unique(bucket, return_inverse=True)
+    w = np.bincount(bucket, weights=weights)
+    means = np.bincount(bucket, weights=values * weights) / w
+    return means, w
+
+
+def quantiles(means: np.ndarray, weights: np.ndarray, lo: float, hi: float, percents: List[float]) -> List[Optional[float]]:
+    """Kuantil dari gabungan centroid (boleh dari banyak sel, tidak perlu terurut)."""
+    total = weights.sum()
+    if total <= 0:
+        return [None] * len(percents)
+    order = np.argsort(means, kind="stable")
+    means, weights = means[order], weights[order]
+    centers = np.cumsum(weights) - weights / 2
+    xs = np.concatenate([[lo], means, [hi]])
+    ys = np.concatenate([[0.0], centers, [total]])
+    out = np.interp(np.asarray(percents, dtype=np.float64) / 100.0 * total, ys, xs)
+    return [float(v) for v in out]
+
+
+# ------------------- store -------------------
+
+class SketchStore:
+    def __init__(self, version: Any, labels: Dict[str, np.ndarray], codes: Dict[str, np.ndarray],
+                 centroids: Dict[str, Dict[str, np.ndarray]]) -> None:
+        self.version = version
+        self.labels = labels          # dim -> label (str), index = kode
+        self.codes = codes            # dim -> kode int32 per sel (-1 = kosong)
+        self.centroids = centroids    # metrik -> {"cell", "mean", "weight", "min", "max"}
+        self._index = {d: {v: i for i, v in enumerate(labels[d])} for d in DIMS}
+
+    @property
+    def cells(self) -> int:
+        return len(self.codes["bulan"])
+
+    # ---------- build ----------
+
+    @classmethod
+    def from_table(cls, t: Any, version: Any = None, delta: float = COMPRESSION) -> "SketchStore":
+        ec, lm = elastic_client, local_mirror
+        dims = {
+            "bulan": olap_cube._np(lm._month(t)).astype(object) if "Tanggal" in t.column_names else olap_cube._strings(t, "Tanggal"),
+            "kabupaten": olap_cube._strings(t, olap_cube.WILAYAH_FIELD),
+            "kecamatan": olap_cube._strings(t, olap_cube.KECAMATAN_FIELD),
+            "zona": olap_cube._labelled(t, [(z, lm._range(t, ec.RISK_FIELD, r)) for z, r in ec.RISK_ZONES.items()]),
+        }
+        labels, row_codes = {}, []
+        for d in DIMS:
+            codes, uniques = pd.factorize(pd.Series(dims[d], dtype=object), sort=True)
+            labels[d] = np.asarray([str(u) for u in uniques], dtype=str)
+            row_codes.append(codes.astype(np.int64) + 1)  # 0 = kosong
+        shape = tuple(len(labels[d]) + 1 for d in DIMS)
+        keys = np.ravel_multi_index(row_codes, shape) if t.num_rows else np.zeros(0, dtype=np.int64)
+        cell_keys, row_cell = np.unique(keys, return_inverse=True)
+        codes = {d: (c - 1).astype(np.int32) for d, c in zip(DIMS, np.unravel_index(cell_keys, shape))}
+
+        centroids = {}
+        for metric, field in METRICS.items():
+            if field in t.column_names:
+                values = olap_cube._np(pc.cast(t.column(field), pa.float64())).astype(np.float64)
+            else:
+                values = np.full(t.num_rows, np.nan)
+            centroids[metric] = _cell_centroids(row_cell, values, len(cell_keys), delta)
+        return cls(version, labels, codes, centroids)
+
+    # ---------- persist ----------
+
+    def save(self, path: Path) -> None:
+        arrays = {"version": np.asarray(json.dumps(self.version, default=str))}
+        for d in DIMS:
+            arrays[f"label_{d}"] = self.labels[d]
+            arrays[f"code_{d}"] = self.codes[d]
+        for metric, parts in self.centroids.items():
+            for k, v in parts.items():
+                arrays[f"{metric}_{k}"] = v
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SketchStore":
+        with np.load(path, allow_pickle=False) as z:
+            labels = {d: z[f"label_{d}"] for d in DIMS}
+            codes = {d: z[f"code_{d}"] for d in DIMS}
+            centroids = {m: {k: z[f"{m}_{k}"] for k in ("cell", "mean", "weight", "min", "max")} for m in METRICS}
+            version = json.loads(str(z["version"]))
+        return cls(version, labels, codes, centroids)
+
+    # ---------- query ----------
+
+    def answerable(self, filters: Dict[str, Any]) -> bool:
+        if filters.get("wilayah") and elastic_client.wilayah_field(filters) != olap_cube.WILAYAH_FIELD:
+            return False
+        if filters.get("kecamatan") and elastic_client.kecamatan_field(filters) != olap_cube.KECAMATAN_FIELD:
+            return False
+        return elastic_client._whole_months(filters.get("date_from"), filters.get("date_to"))
+
+    def _isin(self, dim: str, values: List[Any]) -> np.ndarray:
+        wanted = [self._index[dim][str(v)] for v in values if str(v) in self._index[dim]]
+        return np.isin(self.codes[dim], np.asarray(wanted, dtype=np.int32))
+
+    def mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        m = np.ones(self.cells, dtype=bool)
+        if filters.get("date_from") or filters.get("date_to"):
+            lo = olap_cube._month_key(filters["date_from"]) if filters.get("date_from") else ""
+            hi = olap_cube._month_key(filters["date_to"]) if filters.get("date_to") else "9999-99"
+            m &= self._isin("bulan", [b for b in self.labels["bulan"] if lo <= b <= hi])
+        if filters.get("wilayah"):
+            m &= self._isin("kabupaten", filters["wilayah"])
+        if filters.get("kecamatan"):
+            m &= self._isin("kecamatan", filters["kecamatan"])
+        zones = [z for z in filters.get("risk_level") or [] if z in elastic_client.RISK_ZONES]
+        if zones:
+            m &= self._isin("zona", zones)
+        return m
+
+    def percentiles(self, filters: Dict[str, Any], percents: List[float] = PERCENTS) -> Dict[str, Dict[str, Optional[float]]]:
+        """{metrik: {"5.0": v, ...}} — kunci sama dengan respons `percentiles` ES."""
+        cells = self.mask(filters)
+        keys = [str(float(p)) for p in percents]
+        out = {}
+        for metric, c in self.centroids.items():
+            sel = cells[c["cell"]]
+            lo, hi = c["min"][cells], c["max"][cells]
+            if not sel.any() or np.isnan(lo).all():
+                out[metric] = {k: None for k in keys}
+                continue
+            vals = quantiles(c["mean"][sel], c["weight"][sel], float(np.nanmin(lo)), float(np.nanmax(hi)), percents)
+            out[metric] = dict(zip(keys, vals))
+        return out
+
+
+def _cell_centroids(row_cell: np.ndarray, values: np.ndarray, n_cells: int, delta: float) -> Dict[str, np.ndarray]:
+    ok = ~np.isnan(values)
+    cell, vals = row_cell[ok], values[ok]
+    order = np.lexsort((vals, cell))
+    cell, vals = cell[order], vals[order]
+    mins = np.full(n_cells, np.nan)
+    maxs = np.full(n_cells, np.nan)
+    out_cell, out_mean, out_weight = [], [], []
+    bounds = np.flatnonzero(np.diff(cell)) + 1
+    for s, e in zip(np.r_[0, bounds], np.r_[bounds, len(cell)]):
+        if s == e:
+            continue
+        c = int(cell[s])
+        mins[c], maxs[c] = vals[s], vals[e - 1]
+        uniq, counts = np.unique(vals[s:e], return_counts=True)
+        means, weights = compress(uniq, counts.astype(np.float64), delta)
+        out_cell.append(np.full(len(means), c, dtype=np.int32))
+        out_mean.append(means)
+        out_weight.append(weights)
+    cat = lambda xs, dt: np.concatenate(xs).astype(dt) if xs else np.zeros(0, dtype=dt)
+    return {
+        "cell": cat(out_cell, np.int32),
+        "mean": cat(out_mean, np.float64),
+        "weight": cat(out_weight, np.float64),
+        "min": mins,
+        "max": maxs,
+    }
+
+
+# ------------------- store per versi data -------------------
+
+_LOCK = threading.Lock()
+_CURRENT: Dict[str, Any] = {"key": None, "store": None}
+
+
+def _path(key: Any) -> Path:
+    digest = hashlib.sha1(json.dumps([key, COMPRESSION], default=str).encode("utf-8")).hexdigest()[:16]
+    return SKETCH_DIR / f"sketch-{digest}.npz"
+
+
+def build(force: bool = False) -> Optional[SketchStore]:
+    """Bangun (atau muat) sketch untuk versi data saat ini dan simpan ke SKETCH_DIR."""
+    if pa is None:
+        raise RuntimeError("Sketch kuantil membutuhkan pyarrow")
+    key, load = local_mirror.source_table(elastic_client.STUNTING_INDEX, SKETCH_FIELDS)
+    if key is None:
+        return None
+    with _LOCK:
+        _CURRENT["store"] = _load_or_build(key, load, build=True, force=force)
+        _CURRENT["key"] = key
+        return _CURRENT["store"]
+
+
+def _load_or_build(key: Any, load: Any, build: bool, force: bool = False) -> Optional[SketchStore]:
+    path = _path(key)
+    if path.exists() and not force:
+        return SketchStore.load(path)
+    if not build:
+        return None
+    store = SketchStore.from_table(load(), version=key)
+    store.save(path)
+    for old in SKETCH_DIR.glob("sketch-*.npz"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return store
+
+
+def get_store() -> Optional[SketchStore]:
+    """Sketch untuk versi data saat ini; None jika belum ada dan tidak boleh dibangun di sini."""
+    if not ENABLED or pa is None:
+        return None
+    key, load = local_mirror.source_table(elastic_client.STUNTING_INDEX, SKETCH_FIELDS)
+    if key is None:
+        return None
+    with _LOCK:
+        if _CURRENT["key"] != key:
+            # mirror lokal murah dibaca; sumber ES hanya dibangun otomatis jika diizinkan
+            store = _load_or_build(key, load, build=key[0] == "mirror" or AUTO_BUILD)
+            if store is None:
+                return None  # belum ada file untuk versi ini -> cek lagi di panggilan berikut
+            _CURRENT.update(key=key, store=store)
+        return _CURRENT["store"]
+
+
+def percentiles(filters: Dict[str, Any], percents: List[float] = PERCENTS) -> Optional[Dict[str, Dict[str, Optional[float]]]]:
+    """Persentil BMI/LiLA/Hb/Z dari sketch, atau None jika harus ke ES."""
+    try:
+        store = get_store()
+    except Exception:
+        return None
+    if store is None or not store.answerable(filters):
+        return None
+    return store.percentiles(filters, percents)
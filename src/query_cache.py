@@ -0,0 +1,298 @@
+# StuntLytics/src/query_cache.py
+# Cache hasil query ES yang dipakai bersama oleh semua sesi Streamlit dalam satu proses.
+# - Key = hash kanonik dari (index, path, body) + versi data index -> filter yang sama = key yang sama.
+# - LRU dengan batas jumlah entri, TTL per fungsi (namespace), counter hit/miss.
+# - Versi data per index (jumlah dokumen + nilai max field tanggal/tahun) dicek berkala;
+#   begitu berubah (ada ingest baru), semua entri index itu dibuang. Karena itu TTL boleh panjang (jam).
+# - Single-flight: request identik yang datang bersamaan (cache miss) menunggu satu
+#   panggilan ES yang sedang berjalan lalu berbagi hasilnya.
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src import es_transport
+
+ENABLED = os.getenv("ES_CACHE", "1").lower() not in ("0", "false", "no")
+MAX_ENTRIES = int(os.getenv("ES_CACHE_MAX_ENTRIES", "512"))
+DEFAULT_TTL = float(os.getenv("ES_CACHE_TTL", "300"))
+# Seberapa sering versi data tiap index diperiksa ulang (detik).
+VERSION_CHECK_INTERVAL = float(os.getenv("ES_VERSION_CHECK_SECONDS", "30"))
+
+# Field yang nilai max-nya ikut menandai versi data (selain jumlah dokumen).
+VERSION_FIELDS: Dict[str, Optional[str]] = {
+    os.getenv("STUNTING_INDEX", "stunting-data"): "Tanggal",
+    os.getenv("BALITA_INDEX", "jabar-balita-desa"): "tahun",
+    os.getenv("NUTRITION_INDEX", "jabar-tenaga-gizi"): "tahun",
+    # hanya dokumen meta rollup yang punya built_at -> berubah setiap rollup dibangun ulang
+    os.getenv("ROLLUP_INDEX", "stunting-rollup"): "built_at",
+}
+
+
+def canonical_key(index: str, path: str, body: Any) -> str:
+    """Hash stabil: urutan key dict tidak berpengaruh, tanggal diserialisasi sebagai string."""
+    raw = json.dumps([index, path, body], sort_keys=True, separators=(",", ":"), default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# ------------------- single-flight -------------------
+
+class _Call:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Gabungkan panggilan identik yang sedang berjalan: satu leader memanggil ES, sisanya menunggu."""
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (hasil, shared). `shared=True` berarti hasil didapat dari panggilan leader lain."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.value), True
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        # leader juga dapat salinan: pengikut mungkin sedang menyalin call.value
+        return copy.deepcopy(call.value), False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+# ------------------- versi data per index -------------------
+
+class DataVersionTracker:
+    """
+    Sinyal murah "apakah data index berubah": total dokumen + max(field versi),
+    diambil dengan satu search `size: 0`. Hasilnya di-cache VERSION_CHECK_INTERVAL detik.
+    """
+
+    def __init__(self, check_interval: float = VERSION_CHECK_INTERVAL) -> None:
+        self.check_interval = check_interval
+        self._versions: Dict[str, Tuple[float, Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._flight = SingleFlight()
+
+    def on_change(self, callback: Callable[[str], None]) -> None:
+        self._listeners.append(callback)
+
+    def _probe(self, index: str) -> Optional[str]:
+        field = VERSION_FIELDS.get(index)
+        body: Dict[str, Any] = {"size": 0, "track_total_hits": True}
+        if field:
+            body["aggs"] = {"v": {"max": {"field": field}}}
+        try:
+            res = es_transport.post(index, "/_search", body, timeout=10, retries=0)
+        except Exception:
+            return None
+        total = res.get("hits", {}).get("total", {})
+        total = total.get("value") if isinstance(total, dict) else total
+        vmax = res.get("aggregations", {}).get("v", {}).get("value")
+        return f"{total}:{vmax}"
+
+    def current(self, index: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._versions.get(index)
+            if item and now - item[0] < self.check_interval:
+                return item[1]
+        version, _ = self._flight.do(index, lambda: self._probe(index))
+        with self._lock:
+            previous = self._versions.get(index)
+            self._versions[index] = (now, version)
+        if previous and previous[1] is not None and version is not None and previous[1] != version:
+            for cb in self._listeners:
+                cb(index)
+        return version
+
+    def invalidate(self, index: Optional[str] = None) -> None:
+        """Paksa cek ulang versi (mis. setelah job ingest selesai)."""
+        with self._lock:
+            if index is None:
+                self._versions.clear()
+            else:
+                self._versions.pop(index, None)
+
+    def snapshot(self) -> Dict[str, Optional[str]]:
+        with self._lock:
+            return {k: v[1] for k, v in self._versions.items()}
+
+
+# ------------------- cache LRU + TTL -------------------
+
+class QueryCache:
+    """LRU + TTL thread-safe. Nilai dikembalikan sebagai salinan agar aman dimodifikasi pemanggil."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+        self.invalidations = 0
+        self.flight = SingleFlight()
+
+    def _ns(self, namespace: str) -> Dict[str, int]:
+        return self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "coalesced": 0})
+
+    def record(self, namespace: str, hit: bool) -> None:
+        with self._lock:
+            self._ns(namespace)["hits" if hit else "misses"] += 1
+
+    def record_coalesced(self, namespace: str) -> None:
+        with self._lock:
+            self._ns(namespace)["coalesced"] += 1
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return False, None
+            expires, _, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+        return True, copy.deepcopy(value)
+
+    def put(self, key: str, value: Any, ttl: float, index: str = "") -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, index, copy.deepcopy(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_fetch(self, namespace: str, key: str, ttl: float, fetch: Callable[[], Any], index: str = "") -> Any:
+        found, value = self.get(key)
+        self.record(namespace, found)
+        if found:
+            return value
+
+        def fetch_and_store() -> Any:
+            fresh = fetch()
+            self.put(key, fresh, ttl, index=index)
+            return fresh
+
+        value, shared = self.flight.do(key, fetch_and_store)
+        if shared:
+            self.record_coalesced(namespace)
+        return value
+
+    def drop_index(self, index: str) -> None:
+        with self._lock:
+            stale = [k for k, item in self._data.items() if item[1] == index]
+            for k in stale:
+                del self._data[k]
+            self.invalidations += len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_ns = {k: dict(v) for k, v in self._stats.items()}
+            hits = sum(v["hits"] for v in per_ns.values())
+            misses = sum(v["misses"] for v in per_ns.values())
+            return {
+                "entries": len(self._data),
+                "in_flight": self.flight.in_flight(),
+                "coalesced": sum(v["coalesced"] for v in per_ns.values()),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": (hits / (hits + misses)) if (hits + misses) else None,
+                "by_function": per_ns,
+            }
+
+
+CACHE = QueryCache()
+VERSIONS = DataVersionTracker()
+VERSIONS.on_change(CACHE.drop_index)
+
+
+def data_version(index: str) -> Optional[str]:
+    """Token versi data index saat ini (None jika ES tidak bisa dihubungi)."""
+    return VERSIONS.current(index)
+
+
+def _versioned(index: str, path: str, body: Any, ttl: float) -> Tuple[str, float]:
+    version = data_version(index)
+    if version is None:
+        # versi tidak diketahui -> jangan simpan lebih lama dari satu interval cek
+        ttl = min(ttl, VERSION_CHECK_INTERVAL)
+    return canonical_key(index, path, [version, body]), ttl
+
+
+def cached(namespace: str, index: str, path: str, body: Any, fetch: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+    """Ambil dari cache proses, atau jalankan `fetch()` lalu simpan selama `ttl` detik / sampai data berubah."""
+    ttl = DEFAULT_TTL if ttl is None else ttl
+    if not ENABLED or ttl <= 0:
+        # tanpa cache pun, request identik yang bersamaan tetap digabung
+        value, shared = CACHE.flight.do(canonical_key(index, path, body), fetch)
+        if shared:
+            CACHE.record_coalesced(namespace)
+        return value
+    key, ttl = _versioned(index, path, body, ttl)
+    return CACHE.get_or_fetch(namespace, key, ttl, fetch, index=index)
+
+
+def lookup(namespace: str, index: str, path: str, body: Any) -> Tuple[bool, Any]:
+    """Cek cache tanpa fetch (untuk pemanggil batch seperti `_msearch`); ikut menghitung hit/miss."""
+    if not ENABLED:
+        return False, None
+    key, _ = _versioned(index, path, body, DEFAULT_TTL)
+    found, value = CACHE.get(key)
+    CACHE.record(namespace, found)
+    return found, value
+
+
+def store(index: str, path: str, body: Any, value: Any, ttl: Optional[float] = None) -> None:
+    if ENABLED:
+        key, ttl = _versioned(index, path, body, DEFAULT_TTL if ttl is None else ttl)
+        CACHE.put(key, value, ttl, index=index)
+
+
+def stats() -> Dict[str, Any]:
+    out = CACHE.stats()
+    out["data_versions"] = VERSIONS.snapshot()
+    return out
+
+
+def clear() -> None:
+    CACHE.clear()
+    VERSIONS.invalidate()
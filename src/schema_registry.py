@@ -0,0 +1,134 @@
+# StuntLytics/src/schema_registry.py
+# Registry skema dari `GET /<index>/_mapping`, dibaca sekali per versi data index.
+# - Menggantikan coba-coba kandidat field (satu agregasi per kandidat sampai ada bucket):
+#   dimensi logis (wilayah, kecamatan) di-resolve ke field pertama yang benar-benar ada di
+#   mapping, plus subfield keyword bila field utamanya bertipe text.
+# - Dipakai build_query (elastic_client & utils/es) dan builder agregasi. Jika mapping tidak
+#   bisa dibaca (ES mati, izin), semua fungsi mengembalikan None / daftar kandidat asli
+#   sehingga pemanggil tetap memakai perilaku lama.
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from src import es_transport, query_cache
+
+# dimensi logis -> kandidat field (urut prioritas, tanpa ".keyword")
+DIMENSIONS: Dict[str, List[str]] = {
+    "wilayah": ["nama_kabupaten_kota", "Wilayah", "bps_nama_kabupaten_kota"],
+    "kecamatan": ["Kecamatan", "bps_nama_kecamatan"],
+}
+
+NUMERIC_TYPES = {"long", "integer", "short", "byte", "double", "float", "half_float", "scaled_float", "unsigned_long"}
+# tipe yang bisa langsung dipakai untuk terms/agg (doc_values)
+_AGGREGATABLE = {"keyword", "constant_keyword", "wildcard", "boolean", "date", "date_nanos", "ip"} | NUMERIC_TYPES
+
+
+class Schema:
+    def __init__(self, index: str, fields: Dict[str, str]) -> None:
+        self.index = index
+        self.fields = fields  # nama field (dotted) -> tipe, termasuk subfield "x.keyword"
+
+    @classmethod
+    def from_mapping(cls, index: str, response: Dict[str, Any]) -> "Schema":
+        fields: Dict[str, str] = {}
+
+        def walk(props: Dict[str, Any], prefix: str) -> None:
+            for name, spec in props.items():
+                path = f"{prefix}{name}"
+                if "type" in spec:
+                    fields.setdefault(path, spec["type"])
+                for sub, sub_spec in spec.get("fields", {}).items():
+                    if "type" in sub_spec:
+                        fields.setdefault(f"{path}.{sub}", sub_spec["type"])
+                if "properties" in spec:
+                    walk(spec["properties"], f"{path}.")
+
+        # alias / pola index bisa mengembalikan banyak index -> gabungkan
+        for mapping in response.values():
+            walk(mapping.get("mappings", {}).get("properties", {}), "")
+        return cls(index, fields)
+
+    def has(self, field: str) -> bool:
+        return field in self.fields
+
+    def agg_field(self, field: str) -> Optional[str]:
+        """Nama field untuk terms/agg: field itu sendiri, subfield keyword-nya, atau None."""
+        if self.fields.get(field) in _AGGREGATABLE:
+            return field
+        for sub in (f"{field}.keyword", f"{field}.raw"):
+            if self.fields.get(sub) in _AGGREGATABLE:
+                return sub
+        return None
+
+    def existing(self, candidates: List[str]) -> List[str]:
+        """Kandidat yang ada di mapping dan bisa diagregasi (urutan dipertahankan)."""
+        return [f for f in candidates if self.agg_field(f) is not None]
+
+    def numeric(self) -> List[str]:
+        """Field bertipe numerik (urut mapping), termasuk subfield numerik."""
+        return [f for f, t in self.fields.items() if t in NUMERIC_TYPES]
+
+    def resolve(self, dimension: str) -> Optional[str]:
+        found = self.existing(DIMENSIONS.get(dimension, []))
+        return found[0] if found else None
+
+
+# ------------------- registry per versi data -------------------
+
+_LOCK = threading.Lock()
+_SCHEMAS: Dict[str, Tuple[Optional[str], Schema]] = {}
+
+
+def get(index: str) -> Optional[Schema]:
+    """Schema index untuk versi data saat ini (mapping dibaca ulang hanya saat versi berubah)."""
+    version = query_cache.data_version(index)
+    with _LOCK:
+        hit = _SCHEMAS.get(index)
+    if hit is not None and (version is None or hit[0] == version):
+        return hit[1]
+    if version is None:
+        return None  # ES tak terjangkau -> jangan menunggu timeout _mapping di setiap query
+    try:
+        response = es_transport.get(index, "/_mapping", timeout=10)
+    except Exception:
+        return hit[1] if hit is not None else None
+    schema = Schema.from_mapping(index, response)
+    with _LOCK:
+        _SCHEMAS[index] = (version, schema)
+    return schema
+
+
+def invalidate(index: Optional[str] = None) -> None:
+    with _LOCK:
+        if index is None:
+            _SCHEMAS.clear()
+        else:
+            _SCHEMAS.pop(index, None)
+
+
+def candidates(index: str, fields: List[str]) -> List[str]:
+    """Kandidat yang perlu dicoba: yang ada di mapping, atau semua jika mapping tak terbaca."""
+    schema = get(index)
+    return fields if schema is None else schema.existing(fields)
+
+
+def resolve(index: str, dimension: str, default: Optional[str] = None) -> Optional[str]:
+    """Field nyata untuk dimensi logis (tanpa ".keyword"), atau `default`."""
+    schema = get(index)
+    found = schema.resolve(dimension) if schema is not None else None
+    return found or default
+
+
+def numeric_fields(index: str, default: List[str]) -> List[str]:
+    """Semua field numerik index, atau `default` jika mapping tak terbaca."""
+    schema = get(index)
+    found = schema.numeric() if schema is not None else []
+    return found or default
+
+
+def term_field(index: str, field: str) -> str:
+    """Nama field untuk filter `terms`/agg: subfield keyword jika field utama bertipe text."""
+    schema = get(index)
+    if schema is None:
+        return field
+    return schema.agg_field(field) or field
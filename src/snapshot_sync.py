@@ -0,0 +1,263 @@
+# StuntLytics/src/snapshot_sync.py
+# Salinan offline index ES sebagai dataset Parquet yang diperbarui secara inkremental.
+# - Per index: direktori SNAPSHOT_DIR/<index>/ berisi part-NNNNN.parquet + state.json.
+# - High-water mark = nilai sort terakhir field versi (Tanggal / tahun, lihat
+#   query_cache.VERSION_FIELDS). Sync berikutnya menarik dokumen dengan field >= HWM - jendela
+#   lookback (PIT + search_after), ditulis sebagai part baru (satu row group per halaman).
+#   Jendela ini menangkap dokumen susulan bertanggal mundur dan update dokumen yang masih baru.
+# - Dokumen yang ditarik ulang / di-update dideduplikasi per _id memakai (_primary_term, _seq_no)
+#   terbesar, baik saat dibaca maupun saat kompaksi.
+# - `verify` membandingkan jumlah dokumen dengan ES dan melaporkan selisihnya. Update/hapus/
+#   susulan di luar jendela lookback tidak terlihat oleh sync inkremental -> jalankan `full=True`.
+
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from src import elastic_client, es_transport, query_cache
+from src.local_mirror import normalize_frame
+
+ROOT = Path(__file__).resolve().parents[1]
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", str(ROOT / "data" / "snapshot")))
+# Kompaksi otomatis jika jumlah part melebihi batas ini.
+COMPACT_PARTS = int(os.getenv("SNAPSHOT_COMPACT_PARTS", "16"))
+ROW_GROUP_SIZE = int(os.getenv("SNAPSHOT_ROW_GROUP_SIZE", "100000"))
+# Jendela tarik-ulang di bawah HWM: hari untuk field tanggal, satuan field untuk field numerik (tahun).
+LOOKBACK_DAYS = float(os.getenv("SNAPSHOT_LOOKBACK_DAYS", "31"))
+LOOKBACK_NUMERIC = float(os.getenv("SNAPSHOT_LOOKBACK_NUMERIC", "1"))
+
+_META_COLS = ["_id", "_seq_no", "_primary_term"]
+_FILTER_PATH = "pit_id,hits.hits._id,hits.hits._source,hits.hits.sort,hits.hits._seq_no,hits.hits._primary_term"
+
+
+def _dir(index: str) -> Path:
+    return SNAPSHOT_DIR / index
+
+
+def read_state(index: str) -> Dict[str, Any]:
+    try:
+        with open(_dir(index) / "state.json", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_state(index: str, state: Dict[str, Any]) -> None:
+    path = _dir(index) / "state.json"
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(state, fh, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def _parts(index: str) -> List[Path]:
+    return sorted(_dir(index).glob("part-*.parquet"))
+
+
+def _field_type(index: str, field: str) -> Optional[str]:
+    try:
+        res = es_transport.request("GET", f"/{index}/_mapping/field/{field}").json()
+    except Exception:
+        return None
+    for mapping in res.values():
+        spec = mapping.get("mappings", {}).get(field, {}).get("mapping", {})
+        for v in spec.values():
+            return v.get("type")
+    return None
+
+
+def _hits_frame(hits: List[Dict[str, Any]]) -> pd.DataFrame:
+    cols = elastic_client._hits_to_columns(hits, None, include_id=True)
+    cols["_seq_no"] = [h.get("_seq_no", -1) for h in hits]
+    cols["_primary_term"] = [h.get("_primary_term", -1) for h in hits]
+    return normalize_frame(pd.DataFrame(cols))
+
+
+def _dedupe(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty or "_id" not in df.columns:
+        return df
+    df = df.sort_values(["_primary_term", "_seq_no"], kind="stable")
+    return df.drop_duplicates("_id", keep="last").reset_index(drop=True)
+
+
+def _read_parts(paths: List[Path], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    tables = []
+    for p in paths:
+        t = pq.read_table(p)
+        if columns is not None:
+            t = t.select([c for c in _META_COLS + columns if c in t.column_names])
+        tables.append(t)
+    if not tables:
+        return pd.DataFrame()
+    try:
+        table = pa.concat_tables(tables, promote_options="permissive")
+    except TypeError:  # pyarrow < 14
+        table = pa.concat_tables(tables, promote=True)
+    return table.to_pandas()
+
+
+def _conform(table: Any, schema: Any) -> Optional[Any]:
+    """Samakan schema halaman dengan part yang sedang ditulis (mis. kolom serba-null), atau None."""
+    if set(table.column_names) != set(schema.names):
+        return None
+    try:
+        return table.select(schema.names).cast(schema, safe=False)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        return None
+
+
+# ------------------- sync -------------------
+
+def _pull_from(hwm: Any, field_type: Optional[str], lookback: Optional[float]) -> Any:
+    """Batas bawah tarik inkremental: HWM dikurangi jendela lookback."""
+    is_date = field_type in ("date", "date_nanos")
+    if lookback is None:
+        lookback = LOOKBACK_DAYS if is_date else LOOKBACK_NUMERIC
+    if not lookback or not isinstance(hwm, (int, float)):
+        return hwm
+    return hwm - lookback * 86_400_000 if is_date else hwm - lookback
+
+
+def sync(
+    index: str,
+    full: bool = False,
+    page_size: int = elastic_client.SCAN_PAGE_SIZE,
+    lookback: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Tarik dokumen baru/berubah sejak HWM - `lookback` dan tulis sebagai part Parquet baru.
+    `lookback` None = LOOKBACK_DAYS (field tanggal) / LOOKBACK_NUMERIC (field numerik)."""
+    if pa is None:
+        raise RuntimeError("Snapshot Parquet membutuhkan pyarrow")
+    field = query_cache.VERSION_FIELDS.get(index)
+    if not field:
+        raise ValueError(f"Tidak ada field high-water mark untuk index {index}")
+
+    if full and _dir(index).exists():
+        shutil.rmtree(_dir(index))
+    _dir(index).mkdir(parents=True, exist_ok=True)
+    state = read_state(index)
+    query_cache.VERSIONS.invalidate(index)
+    source_version = query_cache.data_version(index)
+    state.setdefault("field", field)
+    if "field_type" not in state:
+        state["field_type"] = _field_type(index, field)
+
+    query: Dict[str, Any] = {"match_all": {}}
+    pull_from = None
+    if state.get("hwm") is not None:
+        pull_from = _pull_from(state["hwm"], state["field_type"], lookback)
+        rng: Dict[str, Any] = {"gte": pull_from}
+        if state["field_type"] in ("date", "date_nanos"):
+            rng["format"] = "epoch_millis"
+        # gte (bukan gt) + lookback: dokumen susulan & update dalam jendela ikut ditarik,
+        # duplikat dibuang per _id
+        query = {"range": {field: rng}}
+    body = {"query": query, "_source": True, "seq_no_primary_term": True}
+    sort = [{field: {"order": "asc", "missing": "_last"}}, {"_shard_doc": "asc"}]
+
+    part_no = int(state.get("next_part", 0))
+    path = _dir(index) / f"part-{part_no:05d}.parquet"
+    tmp = path.with_suffix(".parquet.tmp")
+    writer = None
+    rows = 0
+    hwm = state.get("hwm")
+    pit_id = elastic_client._open_pit(index)
+    try:
+        for hits in elastic_client._iter_pit_pages(pit_id, body, sort=sort, page_size=page_size, filter_path=_FILTER_PATH):
+            table = pa.Table.from_pandas(_hits_frame(hits), preserve_index=False)
+            if writer is not None and table.schema != writer.schema:
+                conformed = _conform(table, writer.schema)
+                if conformed is None:
+                    # schema bergeser (field baru / tipe berubah) -> tutup part ini, lanjut di part baru
+                    writer.close()
+                    os.replace(tmp, path)
+                    part_no += 1
+                    path = _dir(index) / f"part-{part_no:05d}.parquet"
+                    tmp = path.with_suffix(".parquet.tmp")
+                    writer = None
+                else:
+                    table = conformed
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema, compression="zstd")
+            writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+            rows += len(hits)
+            # dokumen tanpa field HWM diurutkan paling akhir dengan nilai sort sentinel -> lewati
+            with_field = [h for h in hits if h.get("_source", {}).get(field) is not None]
+            if with_field:
+                hwm = max(hwm, with_field[-1]["sort"][0]) if hwm is not None else with_field[-1]["sort"][0]
+    finally:
+        elastic_client._close_pit(pit_id)
+        if writer is not None:
+            writer.close()
+
+    if writer is not None:
+        os.replace(tmp, path)
+        part_no += 1
+    state.update({
+        "hwm": hwm,
+        "source_version": source_version,
+        "next_part": part_no,
+        "synced_at": datetime.now(timezone.utc).isoformat(),
+        "last_pulled": rows,
+        "pulled_from": pull_from,
+    })
+    _write_state(index, state)
+    if len(_parts(index)) > COMPACT_PARTS:
+        compact(index)
+    return {"index": index, "pulled": rows, "pulled_from": pull_from, "hwm": hwm, "parts": len(_parts(index))}
+
+
+def compact(index: str) -> Dict[str, Any]:
+    """Gabungkan semua part menjadi satu part terdeduplikasi (row group ROW_GROUP_SIZE)."""
+    parts = _parts(index)
+    if len(parts) <= 1:
+        return {"index": index, "parts": len(parts)}
+    df = _dedupe(_read_parts(parts))
+    state = read_state(index)
+    part_no = int(state.get("next_part", len(parts)))
+    path = _dir(index) / f"part-{part_no:05d}.parquet"
+    tmp = path.with_suffix(".parquet.tmp")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp,
+                   compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, path)
+    for p in parts:
+        p.unlink()
+    state["next_part"] = part_no + 1
+    state["compacted_at"] = datetime.now(timezone.utc).isoformat()
+    _write_state(index, state)
+    return {"index": index, "parts": 1, "rows": len(df)}
+
+
+def load(index: str, fields: Optional[List[str]] = None) -> pd.DataFrame:
+    """Isi snapshot (terdeduplikasi) sebagai DataFrame, tanpa kolom meta."""
+    df = _dedupe(_read_parts(_parts(index), fields))
+    return df.drop(columns=[c for c in _META_COLS if c in df.columns])
+
+
+def verify(index: str) -> Dict[str, Any]:
+    """Bandingkan jumlah dokumen unik di snapshot dengan `_count` ES; `diff` > 0 berarti
+    snapshot tertinggal (susulan di luar lookback), < 0 berarti ada dokumen yang dihapus di ES."""
+    parts = _parts(index)
+    local = int(_read_parts(parts, [])["_id"].nunique()) if parts else 0
+    try:
+        remote = int(es_transport.request("GET", f"/{index}/_count").json().get("count", 0))
+    except Exception as e:
+        raise ConnectionError(f"Gagal menghitung dokumen {index} di Elasticsearch: {e}")
+    out = {"index": index, "snapshot": local, "es": remote, "diff": remote - local,
+           "ok": local == remote, "parts": len(parts)}
+    if not out["ok"]:
+        out["message"] = (f"Snapshot {index} berbeda {remote - local:+d} dokumen dari ES; "
+                          "jalankan sync dengan full=True (--full) atau perbesar lookback")
+    return out
@@ -0,0 +1,56 @@
+# StuntLytics/tests/conftest.py
+# Test berjalan terhadap pengganti Elasticsearch lokal (src/es_standin.py) di thread background.
+# ES_URL diarahkan ke server itu SEBELUM modul lain di src/ di-import, karena
+# src/es_transport.py membaca ES_URL saat import.
+
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src import es_standin  # noqa: E402  (stdlib saja, tidak membaca ES_URL)
+
+APP = es_standin.StandIn()
+SERVER, URL = es_standin.start_background(APP)
+os.environ["ES_URL"] = URL
+
+STUNTING_INDEX = os.getenv("STUNTING_INDEX", "stunting-data")
+NUTRITION_INDEX = os.getenv("NUTRITION_INDEX", "jabar-tenaga-gizi")
+BALITA_INDEX = os.getenv("BALITA_INDEX", "jabar-balita-desa")
+
+
+def _reset_caches() -> None:
+    from src import olap_cube, query_cache, schema_registry
+
+    query_cache.clear()
+    schema_registry.invalidate()
+    olap_cube.reset()
+
+
+@pytest.fixture
+def standin() -> es_standin.StandIn:
+    """Cluster kosong per test (injeksi latensi/error dimatikan) dan cache proses dibersihkan.
+    Kubus OLAP jalur ES dimatikan agar fungsi elastic_client selalu query ke cluster."""
+    from src import olap_cube
+
+    APP.cluster = es_standin.Cluster()
+    APP.latency_ms = APP.jitter_ms = APP.reject_rate = APP.error_rate = 0.0
+    saved, olap_cube.ES_ENABLED = olap_cube.ES_ENABLED, False
+    _reset_caches()
+    yield APP
+    olap_cube.ES_ENABLED = saved
+    _reset_caches()
+
+
+def load_synthetic(app: es_standin.StandIn, n: int, seed: int = 7) -> Dict[str, List[Dict[str, Any]]]:
+    """Isi index stunting, tenaga gizi & balita dengan dataset sintetis; return dataset-nya."""
+    ds = es_standin.synthetic_docs(n, seed=seed)
+    app.cluster.load(STUNTING_INDEX, ds["stunting"])
+    app.cluster.load(NUTRITION_INDEX, ds["nutrition"])
+    app.cluster.load(BALITA_INDEX, ds["balita"])
+    return ds
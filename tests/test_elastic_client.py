@@ -0,0 +1,34 @@
+# StuntLytics/tests/test_elastic_client.py
+# Field wilayah/kecamatan di-resolve dari _mapping: index dengan string bertipe text (dynamic
+# mapping ES) harus memberi jawaban sama dengan index keyword.
+
+from conftest import STUNTING_INDEX
+from src import elastic_client as es
+from src import es_standin, query_cache, schema_registry
+from utils import es as ues
+
+NO_ADVANCED = {"pendidikan_ibu": [], "asi_eksklusif": "Semua", "akses_air": "Semua"}
+
+
+def _answers():
+    query_cache.clear()
+    schema_registry.invalidate()
+    return {
+        "risk_map": es.get_risk_map_data({}).to_dict("records"),
+        "top_kab": es.get_top_counts_for_explorer_chart({}, NO_ADVANCED).to_dict("records"),
+        "top_kec": es.get_top_counts_for_explorer_chart({"wilayah": ["KOTA BANDUNG"]}, NO_ADVANCED).to_dict("records"),
+        "kecamatan_table": ues.kecamatan_table({}, min_n=1).to_dict("records"),
+    }
+
+
+def test_region_fields_resolve_keyword_subfield(standin):
+    docs = es_standin.synthetic_docs(800, seed=11)["stunting"]
+    standin.cluster.load(STUNTING_INDEX, docs)
+    keyword = _answers()
+    assert all(keyword.values())
+
+    standin.cluster = es_standin.Cluster(dynamic_text=True)
+    standin.cluster.load(STUNTING_INDEX, docs)
+    text = _answers()
+    assert schema_registry.term_field(STUNTING_INDEX, "Kecamatan") == "Kecamatan.keyword"
+    assert text == keyword
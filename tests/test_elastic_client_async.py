@@ -0,0 +1,26 @@
+# StuntLytics/tests/test_elastic_client_async.py
+# Job batch async: hasil sama dengan versi sinkron & semaphore per loop tidak menumpuk.
+
+import asyncio
+import gc
+
+from conftest import load_synthetic
+from src import elastic_client as es
+from src import elastic_client_async as aes
+
+
+def test_amap_matches_sync_and_releases_loops(standin):
+    load_synthetic(standin, 400)
+    kabs = es.get_filter_options({}, es.CANDIDATES_WILAYAH)[1][:6]
+
+    async def job():
+        return {kab: res async for kab, res in aes.amap(lambda k: aes.get_risk_map_data({"wilayah": [k]}), kabs, limit=3)}
+
+    for _ in range(3):  # satu event loop baru per asyncio.run
+        out = asyncio.run(job())
+    assert set(out) == set(kabs)
+    for kab, df in out.items():
+        assert df.equals(es.get_risk_map_data({"wilayah": [kab]}))
+
+    gc.collect()
+    assert len(aes._SEMAPHORES) == 0
@@ -0,0 +1,51 @@
+# StuntLytics/tests/test_ingest_csv.py
+# Ingest CSV lewat _bulk paralel ke stand-in yang menolak sebagian item (429): semua baris
+# harus masuk lewat retry, dengan header & angka format Indonesia terpetakan benar.
+
+import csv
+
+from conftest import STUNTING_INDEX
+from scripts import ingest_csv
+from src import es_transport
+
+HEADER = ["Tgl", "Kabupaten", "Kec", "Z-Score TB/U", "Berat Lahir", "Upah Keluarga (Rp/bulan)",
+          "Hb", "Status Stunting", "ASI", "Kolom Lain"]
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh, delimiter=";")
+        w.writerow(HEADER)
+        for i in range(rows):
+            w.writerow([f"{1 + i % 28:02d}/09/2025", "KABUPATEN GARUT", f"KEC GARUT {i % 5:02d}",
+                        f"-{i % 3},{i % 10}", "3.200", "2.500.000", "11,5",
+                        "Ya" if i % 4 == 0 else "Tidak", "ya", f"x{i}"])
+
+
+def test_ingest_retries_rejected_items_and_maps_fields(standin, tmp_path):
+    path = tmp_path / "garut_2025_09.csv"
+    _write_csv(path, 60)
+    standin.reject_rate = 0.3
+
+    res = ingest_csv.ingest([str(path)], STUNTING_INDEX, workers=2, batch=8, normalized=False, progress_every=0)
+
+    assert res["indexed"] == 60 and res["failed"] == 0
+    assert res["retried"] > 0
+    standin.reject_rate = 0.0
+    assert es_transport.get(STUNTING_INDEX, "/_count")["count"] == 60
+
+    props = next(iter(es_transport.get(STUNTING_INDEX, "/_mapping").values()))["mappings"]["properties"]
+    for field in ["Tanggal", "nama_kabupaten_kota", "Kecamatan", "Z-Score TB/U", "Berat Lahir (gram)",
+                  "Upah Keluarga (Rp/bulan)", "Hb (g/dL)", "Status Stunting (Biner)", "ASI Eksklusif", "Kolom Lain"]:
+        assert field in props, field
+    assert props["Tanggal"]["type"] == "date"
+    assert props["Berat Lahir (gram)"]["type"] == "long"
+
+    hit = es_transport.request("POST", f"/{STUNTING_INDEX}/_search", {
+        "size": 1, "query": {"term": {"Kolom Lain": "x7"}},
+    }).json()["hits"]["hits"][0]["_source"]
+    assert hit["Tanggal"] == "2025-09-08"
+    assert hit["Berat Lahir (gram)"] == 3200
+    assert hit["Upah Keluarga (Rp/bulan)"] == 2500000
+    assert hit["Z-Score TB/U"] == -1.7
+    assert hit["Hb (g/dL)"] == 11.5
@@ -0,0 +1,58 @@
+# StuntLytics/tests/test_local_mirror.py
+# Di backend ES, struktur turunan (kubus, sketch) hanya boleh membaca mirror yang dibangun dari
+# versi data ES yang sedang live.
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from conftest import STUNTING_INDEX, load_synthetic  # noqa: E402
+from src import data_backend, local_mirror, query_cache  # noqa: E402
+
+
+def test_source_table_follows_live_version(standin, tmp_path, monkeypatch):
+    monkeypatch.setattr(local_mirror, "MIRROR_DIR", tmp_path)
+    monkeypatch.setattr(data_backend, "BACKEND", "es")
+    ds = load_synthetic(standin, 300)
+    local_mirror.build([STUNTING_INDEX])
+    version = query_cache.data_version(STUNTING_INDEX)
+
+    key, load = local_mirror.source_table(STUNTING_INDEX, ["Tanggal"])
+    assert key == ("mirror", version) and load().num_rows == 300
+
+    # data ES berubah -> mirror basi tidak dipakai, key ikut versi ES baru
+    standin.cluster.load(STUNTING_INDEX, [{**ds["stunting"][0], "_id": "baru-1"}])
+    query_cache.clear()
+    key, load = local_mirror.source_table(STUNTING_INDEX, ["Tanggal"])
+    assert key == ("es", query_cache.data_version(STUNTING_INDEX)) and key[1] != version
+    assert load().num_rows == 301
+
+    # backend lokal: mirror selalu jadi sumber
+    monkeypatch.setattr(data_backend, "BACKEND", "local")
+    key, _ = local_mirror.source_table(STUNTING_INDEX, ["Tanggal"])
+    assert key == ("mirror", local_mirror.read_manifest()[STUNTING_INDEX]["built_at"])
+
+
+def test_fallback_fills_months_and_reads_regions_from_mirror(standin, tmp_path, monkeypatch):
+    import pandas as pd
+
+    from src import elastic_client, olap_cube, schema_registry
+
+    monkeypatch.setattr(local_mirror, "MIRROR_DIR", tmp_path)
+    ds = load_synthetic(standin, 400)
+    docs = [{("Wilayah" if k == "nama_kabupaten_kota" else k): v for k, v in d.items()}
+            for d in ds["stunting"] if not str(d.get("Tanggal")).startswith("2024-05")]
+    standin.cluster = type(standin.cluster)()
+    standin.cluster.load(STUNTING_INDEX, docs)
+    local_mirror.build([STUNTING_INDEX])
+    kab = next(d["Wilayah"] for d in docs if d.get("Wilayah"))
+    es_trend = elastic_client.get_monthly_trend({})
+    assert es_trend.loc["2024-05", "Stunting %"] == 0
+
+    # backend lokal tanpa kubus: jawaban dari kolom mirror, tanpa _mapping ES
+    monkeypatch.setattr(data_backend, "BACKEND", "local")
+    monkeypatch.setattr(olap_cube, "ENABLED", False)
+    monkeypatch.setattr(schema_registry, "get", lambda index: pytest.fail("schema_registry memanggil ES"))
+    pd.testing.assert_frame_equal(local_mirror.get_monthly_trend({}), es_trend, check_dtype=False)
+    risk = local_mirror.get_risk_map_data({"wilayah": [kab]})
+    assert not risk.empty and set(risk["kabupaten"]) == {kab}
@@ -0,0 +1,61 @@
+# StuntLytics/tests/test_normalized.py
+# Index ternormalisasi (scripts/normalize_index.py) harus memberi angka yang sama dengan index
+# raw: KPI, filter lanjutan explorer, ringkasan risiko, dan rollup yang dibangun darinya.
+# Field sumber yang digantikan field boolean dibuang, jadi jalur yang masih membaca nilai raw
+# dalam mode ternormalisasi langsung terlihat.
+
+import pytest
+
+from conftest import NUTRITION_INDEX, STUNTING_INDEX
+from scripts import build_rollup, normalize_index
+from src import elastic_client as es
+from src import es_standin, query_cache, schema_registry
+from utils import es as ues
+
+REPLACED = ["Status Stunting (Biner)", "Status Stunting (Stunting / Berisiko / Normal)",
+            "Status Imunisasi Anak", "ASI Eksklusif", "Akses Air Bersih"]
+ADVANCED = [
+    {"pendidikan_ibu": [], "asi_eksklusif": "Ya", "akses_air": "Semua"},
+    {"pendidikan_ibu": [], "asi_eksklusif": "Tidak", "akses_air": "Ada"},
+    {"pendidikan_ibu": ["SMA"], "asi_eksklusif": "Semua", "akses_air": "Tidak"},
+]
+
+
+def _answers():
+    query_cache.clear()
+    schema_registry.invalidate()
+    return {
+        "stats": es._main_stunting_stats({}),
+        "top": [es.get_top_counts_for_explorer_chart({}, adv).to_dict("records") for adv in ADVANCED],
+        "risk_asi_tidak": ues.summary_for_filters({})["risiko_count"]["asi_eks_tidak"],
+    }
+
+
+@pytest.fixture
+def auto_mode(monkeypatch):
+    monkeypatch.setattr(es, "NORMALIZED_MODE", "auto")
+
+
+def test_normalized_index_matches_raw(standin, auto_mode):
+    ds = es_standin.synthetic_docs(1500, seed=5)
+    docs = ds["stunting"]
+    standin.cluster.load(STUNTING_INDEX, docs)
+    standin.cluster.load(NUTRITION_INDEX, ds["nutrition"])
+    assert not es.normalized()
+    raw = _answers()
+
+    standin.cluster = es_standin.Cluster()
+    normalized_docs = []
+    for d in docs:
+        out = {k: v for k, v in d.items() if k not in REPLACED}
+        out.update(normalize_index.normalize(d))
+        normalized_docs.append(out)
+    standin.cluster.load(STUNTING_INDEX, normalized_docs)
+    standin.cluster.load(NUTRITION_INDEX, ds["nutrition"])
+    query_cache.clear()
+    schema_registry.invalidate()
+    assert es.normalized()
+    assert _answers() == raw
+
+    build_rollup.build()
+    assert build_rollup.verify([{}, {"wilayah": ["KOTA BANDUNG"]}]) == []
@@ -0,0 +1,122 @@
+# StuntLytics/tests/test_olap_cube.py
+# Jawaban kubus OLAP (src/olap_cube.py) di backend ES harus sama dengan query ke data raw.
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from conftest import load_synthetic
+from src import elastic_client as es
+
+olap_cube = pytest.importorskip("src.olap_cube")
+pytest.importorskip("pyarrow")
+
+FILTERS = [
+    {},
+    {"wilayah": ["KOTA BANDUNG", "KABUPATEN GARUT"]},
+    {"date_from": "2024-03-01", "date_to": "2024-08-31"},
+    {"risk_level": ["Zona 3 (>=0.70)", "Zona 0 (<0.10)"]},
+]
+ADVANCED = [
+    {"pendidikan_ibu": [], "asi_eksklusif": "Semua", "akses_air": "Semua"},
+    {"pendidikan_ibu": ["SMA"], "asi_eksklusif": "Ya", "akses_air": "Tidak"},
+]
+
+
+def _raw(fn, *args):
+    saved, olap_cube.ES_ENABLED = olap_cube.ES_ENABLED, False
+    try:
+        return fn(*args)
+    finally:
+        olap_cube.ES_ENABLED = saved
+
+
+def test_cube_matches_raw(standin):
+    load_synthetic(standin, 2000)
+    cube = olap_cube.get_cube()
+    assert cube is not None and cube.version[0][0] == "es"
+
+    for f in FILTERS:
+        pd.testing.assert_frame_equal(cube.monthly_trend(f), _raw(es.get_monthly_trend, f), check_dtype=False)
+        pd.testing.assert_frame_equal(cube.risk_map(f), _raw(es.get_risk_map_data, f), check_dtype=False)
+        assert cube.main_stats(f) == _raw(es._main_stunting_stats, f)
+        for adv in ADVANCED:
+            pd.testing.assert_frame_equal(cube.top_counts(f, adv).reset_index(drop=True),
+                                          _raw(es.get_top_counts_for_explorer_chart, f, adv),
+                                          check_dtype=False)
+
+
+def test_es_functions_use_cube_once_built(standin):
+    load_synthetic(standin, 500)
+    olap_cube.ES_ENABLED = True
+    assert es._cube({}) is None  # belum ada kubus: build dimulai di latar, jawaban dari ES
+    deadline = time.monotonic() + 30
+    while es._cube({}) is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    cube = es._cube({})
+    assert cube is not None
+    assert es._cube({"date_from": "2024-03-05"}) is None  # bukan bulan penuh -> tetap ke ES
+    pd.testing.assert_frame_equal(es.get_monthly_trend({}), _raw(es.get_monthly_trend, {}), check_dtype=False)
+
+
+def test_failed_build_backs_off(standin, monkeypatch):
+    load_synthetic(standin, 200)
+    calls = []
+
+    def broken(t, **kwargs):
+        calls.append(kwargs["version"])
+        raise MemoryError("kubus terlalu besar")
+
+    monkeypatch.setattr(olap_cube.Cube, "from_table", broken)
+    assert olap_cube.get_cube() is None
+    assert olap_cube.get_cube() is None  # masih dalam jendela backoff: tidak scan ulang
+    assert len(calls) == 1
+    key = calls[0]
+    attempts, retry_at = olap_cube._FAILURES[key]
+    assert attempts == 1 and retry_at > time.monotonic()
+
+
+def test_es_cube_capped_by_doc_count(standin, monkeypatch):
+    load_synthetic(standin, 200)
+    monkeypatch.setattr(olap_cube, "ES_MAX_DOCS", 100)
+    assert olap_cube.get_cube() is None
+    monkeypatch.setattr(olap_cube, "ES_MAX_DOCS", 1000)
+    assert olap_cube.get_cube() is not None
+
+
+def test_cube_follows_resolved_region_field(standin):
+    ds = load_synthetic(standin, 500)
+    docs = [{("Wilayah" if k == "nama_kabupaten_kota" else k): v for k, v in d.items()} for d in ds["stunting"]]
+    standin.cluster = type(standin.cluster)()
+    standin.cluster.load(es.STUNTING_INDEX, docs)
+    assert es.wilayah_field({}) == "Wilayah"
+    cube = olap_cube.get_cube()
+    assert cube is not None and cube.wilayah_field == "Wilayah"
+    risk = cube.risk_map({})
+    assert risk["kabupaten"].notna().all()
+    pd.testing.assert_frame_equal(risk, _raw(es.get_risk_map_data, {}), check_dtype=False)
+    assert not cube.answerable({"wilayah_field": "nama_kabupaten_kota"})
+
+
+def test_blocking_build_does_not_hold_lock(standin, monkeypatch):
+    load_synthetic(standin, 200)
+    started, release = threading.Event(), threading.Event()
+    real = olap_cube.Cube.from_table
+
+    def slow(t, **kwargs):
+        started.set()
+        release.wait(10)
+        return real(t, **kwargs)
+
+    monkeypatch.setattr(olap_cube.Cube, "from_table", slow)
+    result = {}
+    builder = threading.Thread(target=lambda: result.update(cube=olap_cube.get_cube(wait=True)))
+    builder.start()
+    assert started.wait(10)
+    assert olap_cube.get_cube(wait=False) is None  # build sedang jalan: tidak menunggu, tidak build kedua
+    assert builder.is_alive() and not release.is_set()
+    release.set()
+    builder.join(10)
+    assert result["cube"] is not None and olap_cube.get_cube(wait=False) is result["cube"]
@@ -0,0 +1,38 @@
+# StuntLytics/tests/test_rollup.py
+# Jawaban router rollup (src/elastic_client.rollup_query) harus sama dengan query ke data raw.
+
+import random
+
+from conftest import STUNTING_INDEX, load_synthetic
+from scripts import build_rollup
+from src import elastic_client as es
+
+FILTERS = [
+    {},
+    {"wilayah": ["KOTA BANDUNG", "KABUPATEN GARUT"]},
+    {"date_from": "2024-03-01", "date_to": "2024-08-31"},
+    {"risk_level": ["Zona 3 (>=0.70)", "Zona 0 (<0.10)"]},
+]
+
+
+def test_rollup_matches_raw(standin):
+    ds = load_synthetic(standin, 2500)
+    # dokumen tanpa kabupaten / kecamatan / tanggal: tetap dihitung di total, tidak jadi baris peta
+    rng = random.Random(3)
+    partial = []
+    for i, doc in enumerate(ds["stunting"][:200]):
+        doc = {**doc, "_id": f"partial{i}"}
+        doc.pop(rng.choice(["nama_kabupaten_kota", "Kecamatan", "Tanggal"]))
+        partial.append(doc)
+    standin.cluster.load(STUNTING_INDEX, partial)
+
+    built = build_rollup.build()
+    assert built["cells"] > 0
+    assert build_rollup.verify(FILTERS) == []
+
+    saved, es.ROLLUP_ENABLED = es.ROLLUP_ENABLED, True
+    try:
+        risk = es.get_risk_map_data({})
+    finally:
+        es.ROLLUP_ENABLED = saved
+    assert not risk.empty and risk[["kabupaten", "kecamatan"]].notna().all().all()
@@ -0,0 +1,34 @@
+# StuntLytics/tests/test_snapshot_sync.py
+# Sync inkremental harus menarik dokumen susulan & update di dalam jendela lookback.
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from conftest import STUNTING_INDEX, load_synthetic  # noqa: E402
+from src import snapshot_sync  # noqa: E402
+
+
+def test_incremental_sync_pulls_late_and_updated_docs(standin, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_sync, "SNAPSHOT_DIR", tmp_path)
+    ds = load_synthetic(standin, 600)
+    first = snapshot_sync.sync(STUNTING_INDEX, page_size=200)
+    assert first["pulled"] == 600
+
+    newest = max(d["Tanggal"] for d in ds["stunting"])
+    late = {**ds["stunting"][0], "_id": "late-1", "Tanggal": newest[:8] + "01"}  # susulan, bertanggal mundur
+    updated = max(ds["stunting"], key=lambda d: d["Tanggal"])
+    standin.cluster.load(STUNTING_INDEX, [late, {**updated, "Kecamatan": "KEC DIPERBARUI"}])
+
+    second = snapshot_sync.sync(STUNTING_INDEX, page_size=200, lookback=40)
+    assert second["pulled"] >= 2
+    check = snapshot_sync.verify(STUNTING_INDEX)
+    assert check["ok"] and check["snapshot"] == 601
+    df = snapshot_sync.load(STUNTING_INDEX, ["Kecamatan"])
+    assert (df["Kecamatan"] == "KEC DIPERBARUI").sum() == 1
+
+    # susulan di luar jendela lookback -> verify melaporkan selisih
+    standin.cluster.load(STUNTING_INDEX, [{**ds["stunting"][1], "_id": "late-2", "Tanggal": "2020-01-01"}])
+    snapshot_sync.sync(STUNTING_INDEX, page_size=200, lookback=40)
+    check = snapshot_sync.verify(STUNTING_INDEX)
+    assert not check["ok"] and check["diff"] == 1 and "full" in check["message"]
@@ -1,8 +1,12 @@
 # utils/es.py
-import os, requests
+import os
 import pandas as pd
 from typing import Dict, Any, List, Optional, Tuple
 
+from src import columnar, es_transport, query_cache, quantile_sketch, schema_registry
+from src.elastic_client import (_stunting_any_filter, composite_body, iter_composite, kecamatan_field, normalized,
+                                rollup_kecamatan_rows, wilayah_field)
+
 # --- (opsional) load .env ---
 try:
     from pathlib import Path
@@ -12,29 +16,31 @@ try:
 except Exception:
     pass
 
-ES_URL = os.getenv("ES_URL", "http://localhost:9200")
+ES_URL = es_transport.ES_URL
 STUNTING_INDEX = os.getenv("STUNTING_INDEX", "stunting-data")
 BALITA_INDEX = os.getenv("BALITA_INDEX", "jabar-balita-desa")
 NUTRITION_INDEX = os.getenv("NUTRITION_INDEX", "jabar-tenaga-gizi")
 
 
-# ------------------- HTTP helpers -------------------
+# TTL cache proses untuk agregasi di modul ini (detik); entri juga dibuang saat
+# versi data index berubah (lihat src/query_cache.py), jadi boleh panjang.
+CACHE_TTL = float(os.getenv("ES_UTILS_CACHE_TTL", str(6 * 3600)))
+
+
+# ------------------- HTTP helpers (pool & retry bersama: src/es_transport.py) -------------------
 def _es_post(index: str, path: str, body: Dict[str, Any], timeout: int = 60) -> Dict[str, Any]:
-    r = requests.post(f"{ES_URL}/{index}{path}", json=body, timeout=timeout)
-    r.raise_for_status()
-    return r.json()
+    return query_cache.cached("utils.es", index, path, body,
+                              lambda: es_transport.post(index, path, body, timeout=timeout), ttl=CACHE_TTL)
+
+def _es_msearch(searches: List[Tuple[str, Dict[str, Any]]], timeout: int = 60) -> List[Dict[str, Any]]:
+    """Kirim banyak (index, body) dalam satu request `_msearch` (NDJSON)."""
+    return es_transport.msearch(searches, timeout=timeout)
 
 def _es_get(index: str, path: str, timeout: int = 30) -> Dict[str, Any]:
-    r = requests.get(f"{ES_URL}/{index}{path}", timeout=timeout)
-    r.raise_for_status()
-    return r.json()
+    return es_transport.get(index, path, timeout=timeout)
 
 def ping() -> Tuple[bool, str]:
-    try:
-        r = requests.get(ES_URL, timeout=5)
-        return r.status_code == 200, f"ES {ES_URL} status {r.status_code}"
-    except Exception as e:
-        return False, f"Gagal hubungi ES: {e}"
+    return es_transport.ping()
 
 # ------------------- filter & query builder -------------------
 RISK_LABELS = {
@@ -52,22 +58,21 @@ def _date_range(field: str, start: Optional[str], end: Optional[str]) -> Dict[st
     if end:   rng["lte"] = end
     return {"range": {field: rng}}
 
-# ==== kandidat field tanpa ".keyword" ====
-CANDIDATES_WILAYAH   = ["nama_kabupaten_kota", "Wilayah", "bps_nama_kabupaten_kota"]
-CANDIDATES_KECAMATAN = ["Kecamatan", "bps_nama_kecamatan"]
+# ==== kandidat field tanpa ".keyword" (di-resolve dari _mapping: src/schema_registry.py) ====
+CANDIDATES_WILAYAH   = schema_registry.DIMENSIONS["wilayah"]
+CANDIDATES_KECAMATAN = schema_registry.DIMENSIONS["kecamatan"]
 
 def build_query(filters: Dict[str, Any]) -> Dict[str, Any]:
     must = []
     if filters.get("date_from") or filters.get("date_to"):
         must.append(_date_range("Tanggal", filters.get("date_from"), filters.get("date_to")))
 
-    # pakai field yang terdeteksi oleh sidebar
-    field_w = filters.get("wilayah_field") or "Wilayah"
-    field_k = filters.get("kecamatan_field") or "Kecamatan"
-
+    # pakai field yang terdeteksi oleh sidebar, kalau kosong hasil resolve _mapping
     if filters.get("wilayah"):
+        field_w = schema_registry.term_field(STUNTING_INDEX, wilayah_field(filters))
         must.append({"terms": {field_w: filters["wilayah"]}})
     if filters.get("kecamatan"):
+        field_k = schema_registry.term_field(STUNTING_INDEX, kecamatan_field(filters))
         must.append({"terms": {field_k: filters["kecamatan"]}})
 
     if filters.get("risk_level"):
@@ -87,99 +92,120 @@ def build_query(filters: Dict[str, Any]) -> Dict[str, Any]:
 
 
 # ------------------- sampler & KPI ringkas -------------------
+# biner OR kategori OR Z<=-2; `term is_stunting` pada index ternormalisasi (lihat elastic_client.normalized)
+_stunting_any = _stunting_any_filter
+
+_IMUNISASI_FIELDS = ["Imunisasi (lengkap/tidak lengkap)", "Status Imunisasi Anak"]
+_AIR_OK = ["Layak","Ya","Bersih","Aman"]
+
+
 def fetch_sample(filters: Dict[str, Any], size: int = 3000, fields: Optional[List[str]] = None) -> pd.DataFrame:
     body = build_query(filters)
     body.update({"_source": fields or True, "size": size, "track_total_hits": True})
     data = _es_post(STUNTING_INDEX, "/_search", body)
     hits = data.get("hits", {}).get("hits", [])
-    return pd.DataFrame([h.get("_source", {}) for h in hits])
+    return pd.DataFrame(columnar.source_columns(hits, fields)) if hits else pd.DataFrame()
 
-def count_stunting_and_total(filters: Dict[str, Any]) -> Dict[str, Any]:
-    """total = semua dokumen sesuai filter; stunting = biner OR kategori OR Z<=-2."""
-    stunting_labels = ["Stunting","Ya","YA","ya","1","true","TRUE","True"]
+def _count_stunting_body(filters: Dict[str, Any]) -> Dict[str, Any]:
     body = build_query(filters)
     body.update({
         "size": 0,
         "track_total_hits": True,
         "aggs": {
             "total": {"filter": {"match_all": {}}},
-            "stunting_any": {
-                "filter": {
-                    "bool": {
-                        "should": [
-                            {"terms": {"Status Stunting (Biner)": stunting_labels}},
-                            {"terms": {"Status Stunting (Stunting / Berisiko / Normal)": ["Stunting","stunting"]}},
-                            {"range": {"Z-Score TB/U": {"lte": -2.0}}}
-                        ],
-                        "minimum_should_match": 1
-                    }
-                }
-            }
+            "stunting_any": {"filter": _stunting_any()},
         }
     })
-    data = _es_post(STUNTING_INDEX, "/_search", body)
+    return body
+
+def _parse_count_stunting(data: Dict[str, Any]) -> Dict[str, Any]:
     tot = int(data["aggregations"]["total"]["doc_count"])
     st  = int(data["aggregations"]["stunting_any"]["doc_count"])
     return {"total": tot, "stunting": st, "ratio": (st / tot) if tot else None}
 
+def count_stunting_and_total(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """total = semua dokumen sesuai filter; stunting = biner OR kategori OR Z<=-2."""
+    return _parse_count_stunting(_es_post(STUNTING_INDEX, "/_search", _count_stunting_body(filters)))
+
+def _imunisasi_fields() -> List[str]:
+    return ["imunisasi_lengkap"] if normalized() else _IMUNISASI_FIELDS
+
+def _coverage_immunization_body(filters: Dict[str, Any], fld: str) -> Dict[str, Any]:
+    body = build_query(filters)
+    complete = {"term": {fld: True}} if fld == "imunisasi_lengkap" else {"terms": {fld: ["lengkap","Lengkap","complete","Complete"]}}
+    body.update({
+        "size": 0,
+        "aggs": {
+            "complete": {"filter": complete},
+            "total": {"value_count": {"field": fld}}
+        }
+    })
+    return body
+
+def _parse_coverage_immunization(res: Dict[str, Any]) -> Optional[float]:
+    tot = res["aggregations"]["total"]["value"]
+    comp = res["aggregations"]["complete"]["doc_count"]
+    return comp / tot if tot else None
+
 def coverage_immunization(filters: Dict[str, Any]) -> Optional[float]:
     """Cakupan 'lengkap' di salah satu dari 2 kolom (fallback)."""
-    for fld in ["Imunisasi (lengkap/tidak lengkap)", "Status Imunisasi Anak"]:
-        body = build_query(filters)
-        body.update({
-            "size": 0,
-            "aggs": {
-                "complete": {"filter": {"terms": {fld: ["lengkap","Lengkap","complete","Complete"]}}},
-                "total": {"value_count": {"field": fld}}
-            }
-        })
+    for fld in _imunisasi_fields():
         try:
-            res = _es_post(STUNTING_INDEX, "/_search", body)
-            tot = res["aggregations"]["total"]["value"]
-            comp = res["aggregations"]["complete"]["doc_count"]
-            if tot: return comp / tot
+            res = _es_post(STUNTING_INDEX, "/_search", _coverage_immunization_body(filters, fld))
+            cov = _parse_coverage_immunization(res)
+            if cov is not None: return cov
         except Exception:
             continue
     return None
 
-def coverage_safe_water(filters: Dict[str, Any]) -> Optional[float]:
+def _coverage_safe_water_body(filters: Dict[str, Any]) -> Dict[str, Any]:
     body = build_query(filters)
-    body.update({
-        "size": 0,
-        "aggs": {
-            "ok1": {"filter": {"terms": {"Akses Air": ["Layak","Ya","Bersih","Aman"]}}},
-            "ok2": {"filter": {"terms": {"Akses Air Bersih": ["Layak","Ya","Bersih","Aman"]}}},
+    if normalized():
+        aggs = {
+            "ok1": {"filter": {"term": {"akses_air_layak": True}}},
+            "total1": {"value_count": {"field": "akses_air_layak"}},
+        }
+    else:
+        aggs = {
+            "ok1": {"filter": {"terms": {"Akses Air": _AIR_OK}}},
+            "ok2": {"filter": {"terms": {"Akses Air Bersih": _AIR_OK}}},
             "total1": {"value_count": {"field": "Akses Air"}},
             "total2": {"value_count": {"field": "Akses Air Bersih"}},
         }
-    })
-    res = _es_post(STUNTING_INDEX, "/_search", body)
-    t1, t2 = res["aggregations"]["total1"]["value"], res["aggregations"]["total2"]["value"]
-    n1, n2 = res["aggregations"]["ok1"]["doc_count"], res["aggregations"]["ok2"]["doc_count"]
+    body.update({"size": 0, "aggs": aggs})
+    return body
+
+def _parse_coverage_safe_water(res: Dict[str, Any]) -> Optional[float]:
+    agg = res["aggregations"]
+    t1, t2 = agg["total1"]["value"], agg.get("total2", {}).get("value")
+    n1, n2 = agg["ok1"]["doc_count"], agg.get("ok2", {}).get("doc_count")
     denom = (t1 or 0) + (t2 or 0)
     return ((n1 or 0) + (n2 or 0)) / denom if denom else None
 
+def coverage_safe_water(filters: Dict[str, Any]) -> Optional[float]:
+    return _parse_coverage_safe_water(_es_post(STUNTING_INDEX, "/_search", _coverage_safe_water_body(filters)))
+
 # ------------------- Nakes (index jabar-tenaga-gizi) -------------------
-def jumlah_nakes(filters: Dict[str, Any]) -> int:
+def _jumlah_nakes_body(filters: Dict[str, Any]) -> Dict[str, Any]:
     must: List[Dict[str, Any]] = []
     if filters.get("wilayah"):
         must.append({"terms": {"nama_kabupaten_kota": filters["wilayah"]}})
     # tahun dari rentang tanggal (ambil yyyy)
     yr = {}
-    if filters.get("date_from"): yr["gte"] = filters["date_from"][:4]
-    if filters.get("date_to"):   yr["lte"] = filters["date_to"][:4]
+    if filters.get("date_from"): yr["gte"] = str(filters["date_from"])[:4]
+    if filters.get("date_to"):   yr["lte"] = str(filters["date_to"])[:4]
     if yr: must.append({"range": {"tahun": yr}})
-    body = {"query": {"bool": {"must": must}} if must else {"match_all": {}},
+    return {"query": {"bool": {"must": must}} if must else {"match_all": {}},
             "size": 0, "aggs": {"sum_nakes": {"sum": {"field": "jumlah_nakes_gizi"}}}}
-    data = _es_post(NUTRITION_INDEX, "/_search", body)
+
+def _parse_jumlah_nakes(data: Dict[str, Any]) -> int:
     return int(round(data["aggregations"]["sum_nakes"]["value"] or 0))
 
+def jumlah_nakes(filters: Dict[str, Any]) -> int:
+    return _parse_jumlah_nakes(_es_post(NUTRITION_INDEX, "/_search", _jumlah_nakes_body(filters)))
 
-def trend_monthly(filters: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """
-    Seri waktu bulanan: total dokumen, jumlah stunting, % stunting, avg probabilitas.
-    Menghormati semua filter yang aktif.
-    """
+
+def _trend_monthly_body(filters: Dict[str, Any]) -> Dict[str, Any]:
     body = build_query(filters)
     body.update({
         "size": 0,
@@ -187,18 +213,16 @@ def trend_monthly(filters: Dict[str, Any]) -> List[Dict[str, Any]]:
             "per_month": {
                 "date_histogram": {"field": "Tanggal", "calendar_interval": "month"},
                 "aggs": {
-                    "stunting_any": {"filter": {"bool": {"should": [
-                        {"terms": {"Status Stunting (Biner)": ["Stunting","Ya","YA","ya","1","true","TRUE","True"]}},
-                        {"terms": {"Status Stunting (Stunting / Berisiko / Normal)": ["Stunting","stunting"]}},
-                        {"range": {"Z-Score TB/U": {"lte": -2.0}}}
-                    ], "minimum_should_match": 1}}},
+                    "stunting_any": {"filter": _stunting_any()},
                     "tot": {"filter": {"match_all": {}}},
                     "avg_prob": {"avg": {"field": "Probabilitas Stunting (simulasi)"}}
                 }
             }
         }
     })
-    res = _es_post(STUNTING_INDEX, "/_search", body)
+    return body
+
+def _parse_trend_monthly(res: Dict[str, Any]) -> List[Dict[str, Any]]:
     out = []
     for b in res["aggregations"]["per_month"]["buckets"]:
         tot = b["tot"]["doc_count"]
@@ -213,136 +237,199 @@ def trend_monthly(filters: Dict[str, Any]) -> List[Dict[str, Any]]:
         })
     return out
 
+def trend_monthly(filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Seri waktu bulanan: total dokumen, jumlah stunting, % stunting, avg probabilitas.
+    Menghormati semua filter yang aktif.
+    """
+    return _parse_trend_monthly(_es_post(STUNTING_INDEX, "/_search", _trend_monthly_body(filters)))
+
 # ------------------- agregasi level wilayah/kecamatan -------------------
 def _agg_terms(level_field: str, filters: Dict[str, Any], size: int = 2000) -> pd.DataFrame:
+    body = _terms_body(filters, level_field, size)
+    data = _es_post(STUNTING_INDEX, "/_search", body)
+    buckets = data.get("aggregations", {}).get("by", {}).get("buckets", [])
+    rows = [{"key": b["key"], "jumlah_anak": b["doc_count"], "jumlah_stunting": b["stunting"]["doc_count"]}
+            for b in buckets]
+    # >>> penting: selalu kembalikan schema yang sama meski kosong
+    return pd.DataFrame(rows, columns=["key", "jumlah_anak", "jumlah_stunting"])
+
+def _terms_body(filters: Dict[str, Any], field: str, size: int) -> Dict[str, Any]:
     body = build_query(filters)
     body.update({
         "size": 0,
         "aggs": {
             "by": {
-                "terms": {"field": level_field, "size": size},
-                "aggs": {
-                    "stunting": {"filter": {"bool": {"should": [
-                        {"terms": {"Status Stunting (Biner)": ["Stunting","Ya","YA","ya","1","true","TRUE","True"]}},
-                        {"terms": {"Status Stunting (Stunting / Berisiko / Normal)": ["Stunting","stunting"]}},
-                        {"range": {"Z-Score TB/U": {"lte": -2.0}}}
-                    ], "minimum_should_match": 1}}}
-                }
+                "terms": {"field": schema_registry.term_field(STUNTING_INDEX, field), "size": size},
+                "aggs": {"stunting": {"filter": _stunting_any()}}
             }
         }
     })
-    data = _es_post(STUNTING_INDEX, "/_search", body)
-    buckets = data.get("aggregations", {}).get("by", {}).get("buckets", [])
+    return body
+
+def _parse_terms(data: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """None jika field kandidat tidak menghasilkan bucket (coba kandidat berikutnya)."""
+    buckets = data["aggregations"]["by"]["buckets"]
+    if not buckets:
+        return None
     rows = [{"key": b["key"], "jumlah_anak": b["doc_count"], "jumlah_stunting": b["stunting"]["doc_count"]}
             for b in buckets]
-    # >>> penting: selalu kembalikan schema yang sama meski kosong
-    return pd.DataFrame(rows, columns=["key", "jumlah_anak", "jumlah_stunting"])
+    return pd.DataFrame(rows, columns=["key","jumlah_anak","jumlah_stunting"])
+
 def _terms_df_with_candidates(filters: Dict[str, Any], candidates: List[str], size: int = 1000) -> pd.DataFrame:
-    for field in candidates:
-        body = build_query(filters)
-        body.update({
-            "size": 0,
-            "aggs": {
-                "by": {
-                    "terms": {"field": field, "size": size},
-                    "aggs": {
-                        "stunting": {"filter": {"bool": {"should": [
-                            {"terms": {"Status Stunting (Biner)": ["Stunting","Ya","YA","ya","1","true","TRUE","True"]}},
-                            {"terms": {"Status Stunting (Stunting / Berisiko / Normal)": ["Stunting","stunting"]}},
-                            {"range": {"Z-Score TB/U": {"lte": -2.0}}}
-                        ], "minimum_should_match": 1}}}
-                    }
-                }
-            }
-        })
+    for field in schema_registry.candidates(STUNTING_INDEX, candidates):
         try:
-            data = _es_post(STUNTING_INDEX, "/_search", body)
-            buckets = data["aggregations"]["by"]["buckets"]
-            if buckets:
-                rows = [{"key": b["key"], "jumlah_anak": b["doc_count"], "jumlah_stunting": b["stunting"]["doc_count"]}
-                        for b in buckets]
-                return pd.DataFrame(rows, columns=["key","jumlah_anak","jumlah_stunting"])
+            df = _parse_terms(_es_post(STUNTING_INDEX, "/_search", _terms_body(filters, field, size)))
+            if df is not None:
+                return df
         except Exception:
             continue
     return pd.DataFrame(columns=["key","jumlah_anak","jumlah_stunting"])
 
 
-def top_counts(level: str, filters: Dict[str, Any], size: int = 10) -> pd.DataFrame:
+def _level_spec(level: str) -> Tuple[List[str], int, str]:
     if level.lower().startswith("wil"):
-        df = _terms_df_with_candidates(filters, CANDIDATES_WILAYAH, size=2000).rename(columns={"key":"Wilayah"})
-    else:
-        df = _terms_df_with_candidates(filters, CANDIDATES_KECAMATAN, size=3000).rename(columns={"key":"Kecamatan"})
+        return CANDIDATES_WILAYAH, 2000, "Wilayah"
+    return CANDIDATES_KECAMATAN, 3000, "Kecamatan"
+
+def _top_n(df: pd.DataFrame, size: int) -> pd.DataFrame:
     if df.empty: return df
     return df.sort_values("jumlah_stunting", ascending=False).head(size)
 
+def top_counts(level: str, filters: Dict[str, Any], size: int = 10) -> pd.DataFrame:
+    candidates, agg_size, label = _level_spec(level)
+    df = _terms_df_with_candidates(filters, candidates, size=agg_size).rename(columns={"key": label})
+    return _top_n(df, size)
+
 def counts_by_level(level: str, filters: Dict[str, Any]) -> pd.DataFrame:
-    if level.lower().startswith("wil"):
-        return _terms_df_with_candidates(filters, CANDIDATES_WILAYAH, size=2000).rename(columns={"key":"Wilayah"})
-    else:
-        return _terms_df_with_candidates(filters, CANDIDATES_KECAMATAN, size=3000).rename(columns={"key":"Kecamatan"})
+    candidates, agg_size, label = _level_spec(level)
+    return _terms_df_with_candidates(filters, candidates, size=agg_size).rename(columns={"key": label})
 
 
-def kecamatan_table(filters: Dict[str, Any], min_n: int = 20) -> pd.DataFrame:
-    """Ringkasan per-kecamatan: avg_prob, %stunting, %anemia, %BBLR, %LiLA<23.5, %ANC<=2."""
-    body = build_query(filters)
-    body.update({
-        "size": 0,
-        "aggs": {
-            "kec": {
-                "terms": {"field": "Kecamatan", "size": 5000},  # << tanpa .keyword
-                "aggs": {
-                    "avg_prob": {"avg": {"field": "Probabilitas Stunting (simulasi)"}},
-                    "stunting": {"filter": {"bool": {"should": [
-                        {"terms": {"Status Stunting (Biner)": ["Stunting","Ya","YA","ya","1","true","TRUE","True"]}},
-                        {"terms": {"Status Stunting (Stunting / Berisiko / Normal)": ["Stunting","stunting"]}},
-                        {"range": {"Z-Score TB/U": {"lte": -2.0}}}
-                    ], "minimum_should_match": 1}}},
-                    "anemia":   {"filter": {"range": {"Hb (g/dL)": {"lt": 11.0}}}},
-                    "bblr":     {"filter": {"range": {"Berat Lahir (gram)": {"lt": 2500}}}},
-                    "lila_low": {"filter": {"range": {"LiLA saat Hamil (cm)": {"lt": 23.5}}}},
-                    "anc_low":  {"filter": {"range": {"Kunjungan ANC (x)": {"lte": 2}}}},
-                    "sample_wil": {"top_hits": {"_source": {"includes": ["nama_kabupaten_kota","Wilayah"]}, "size": 1}}
-                }
-            }
-        }
-    })
-    data = _es_post(STUNTING_INDEX, "/_search", body)
+def _kec_aggs(filters: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "avg_prob": {"avg": {"field": "Probabilitas Stunting (simulasi)"}},
+        "stunting": {"filter": _stunting_any()},
+        "anemia":   {"filter": {"range": {"Hb (g/dL)": {"lt": 11.0}}}},
+        "bblr":     {"filter": {"range": {"Berat Lahir (gram)": {"lt": 2500}}}},
+        "lila_low": {"filter": {"range": {"LiLA saat Hamil (cm)": {"lt": 23.5}}}},
+        "anc_low":  {"filter": {"range": {"Kunjungan ANC (x)": {"lte": 2}}}},
+        # kabupaten dominan kecamatan (nama kecamatan bisa sama di beberapa kabupaten); rollup memilih sama
+        "wil": {"terms": {"field": schema_registry.term_field(STUNTING_INDEX, wilayah_field(filters)), "size": 1}},
+    }
+
+def _kec_sources(filters: Dict[str, Any]) -> Dict[str, str]:
+    # field kecamatan hasil resolve _mapping (subfield keyword hanya jika field utama text)
+    return {"kec": schema_registry.term_field(STUNTING_INDEX, kecamatan_field(filters))}
+
+def _kecamatan_table_body(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Halaman pertama composite per kecamatan (sisanya via `iter_composite`)."""
+    return composite_body(build_query(filters), _kec_sources(filters), _kec_aggs(filters))
+
+def _kec_row(b: Dict[str, Any]) -> Dict[str, Any]:
+    wil = b["wil"]["buckets"]
+    row = {"Wilayah": wil[0]["key"] if wil else None, "Kecamatan": b["key"]["kec"], "n": b["doc_count"],
+           "avg_prob": b["avg_prob"]["value"]}
+    row.update({k: b[k]["doc_count"] for k in ("stunting", "anemia", "bblr", "lila_low", "anc_low")})
+    return row
+
+def _kecamatan_rows(filters: Dict[str, Any], first_page: Optional[Dict[str, Any]] = None):
+    """Baris per kecamatan: dari rollup bila filter memungkinkan, selain itu composite di data raw."""
+    rows = rollup_kecamatan_rows(filters)
+    if rows is not None:
+        return rows
+    buckets = iter_composite(STUNTING_INDEX, _kec_sources(filters), build_query(filters), _kec_aggs(filters),
+                             first_page=first_page)
+    return (_kec_row(b) for b in buckets)
+
+def _parse_kecamatan_table(kec_rows, min_n: int) -> pd.DataFrame:
     rows = []
-    for b in data["aggregations"]["kec"]["buckets"]:
-        n = b["doc_count"]
+    for r in kec_rows:
+        n = r["n"]
         if n < min_n:
             continue
-        wil = None
-        try:
-            src = b["sample_wil"]["hits"]["hits"][0]["_source"]
-            wil = src.get("nama_kabupaten_kota") or src.get("Wilayah")
-        except Exception:
-            pass
         rows.append({
-            "Wilayah": wil,
-            "Kecamatan": b["key"],
+            "Wilayah": r["Wilayah"],
+            "Kecamatan": r["Kecamatan"],
             "n": n,
-            "avg_prob": b["avg_prob"]["value"],
-            "stunting_pct": round(100.0 * b["stunting"]["doc_count"] / n, 2),
-            "anemia_pct":   round(100.0 * b["anemia"]["doc_count"]   / n, 2),
-            "bblr_pct":     round(100.0 * b["bblr"]["doc_count"]     / n, 2),
-            "lila_low_pct": round(100.0 * b["lila_low"]["doc_count"] / n, 2),
-            "anc_low_pct":  round(100.0 * b["anc_low"]["doc_count"]  / n, 2),
+            "avg_prob": r["avg_prob"],
+            "stunting_pct": round(100.0 * r["stunting"] / n, 2),
+            "anemia_pct":   round(100.0 * r["anemia"]   / n, 2),
+            "bblr_pct":     round(100.0 * r["bblr"]     / n, 2),
+            "lila_low_pct": round(100.0 * r["lila_low"] / n, 2),
+            "anc_low_pct":  round(100.0 * r["anc_low"]  / n, 2),
         })
     df = pd.DataFrame(rows, columns=["Wilayah","Kecamatan","n","avg_prob","stunting_pct","anemia_pct","bblr_pct","lila_low_pct","anc_low_pct"])
     if not df.empty:
         df = df.sort_values(["stunting_pct","avg_prob"], ascending=[False, False])
     return df
 
+def kecamatan_table(filters: Dict[str, Any], min_n: int = 20) -> pd.DataFrame:
+    """Ringkasan per-kecamatan: avg_prob, %stunting, %anemia, %BBLR, %LiLA<23.5, %ANC<=2."""
+    return _parse_kecamatan_table(_kecamatan_rows(filters), min_n)
 
-def summary_for_filters(filters: Dict[str, Any], min_n_kec: int = 30) -> Dict[str, Any]:
-    """Ringkasan padat untuk InsightNow & panel lain — setara pola di beta.py."""
-    # inti
-    cards = count_stunting_and_total(filters)
-    imun  = coverage_immunization(filters)
-    air   = coverage_safe_water(filters)
 
-    # agregat & distribusi
+# ------------------- batch planner (_msearch) -------------------
+class _QueryPlan:
+    """
+    Kumpulkan body query dari banyak fungsi, kirim sekali lewat `_msearch`,
+    lalu bagikan respons ke masing-masing parser. Body identik hanya dikirim sekali.
+    """
+
+    def __init__(self) -> None:
+        self._slots: Dict[str, int] = {}
+        self._searches: List[Tuple[str, Dict[str, Any]]] = []
+        self._responses: List[Optional[Dict[str, Any]]] = []
+
+    def add(self, index: str, body: Dict[str, Any]) -> int:
+        key = query_cache.canonical_key(index, "/_search", body)  # key yang sama dengan cache proses
+        if key not in self._slots:
+            self._slots[key] = len(self._searches)
+            self._searches.append((index, body))
+        return self._slots[key]
+
+    def execute(self) -> None:
+        # sub-query yang sudah ada di cache proses tidak ikut dikirim
+        self._responses = [None] * len(self._searches)
+        pending: List[int] = []
+        for i, (index, body) in enumerate(self._searches):
+            found, res = query_cache.lookup("utils.es", index, "/_search", body)
+            if found:
+                self._responses[i] = res
+            else:
+                pending.append(i)
+        if not pending:
+            return
+        fresh = _es_msearch([self._searches[i] for i in pending])
+        for i, res in zip(pending, fresh):
+            self._responses[i] = res
+            if "error" not in res:
+                index, body = self._searches[i]
+                query_cache.store(index, "/_search", body, res, ttl=CACHE_TTL)
+
+    def result(self, slot: int) -> Dict[str, Any]:
+        res = self._responses[slot]
+        if "error" in res:
+            raise RuntimeError(f"Sub-query _msearch gagal: {res['error']}")
+        return res
+
+    def first(self, slots: List[int], parse):
+        """Hasil parse pertama yang tidak None (pola fallback kandidat field)."""
+        for slot in slots:
+            try:
+                out = parse(self.result(slot))
+            except Exception:
+                continue
+            if out is not None:
+                return out
+        return None
+
+
+_PCT_AGGS = {f"pct_{m}": {"percentiles": {"field": f, "percents": quantile_sketch.PERCENTS}}
+             for m, f in quantile_sketch.METRICS.items()}
+
+def _summary_body(filters: Dict[str, Any], percentiles: bool = True) -> Dict[str, Any]:
+    """Agregat utama summary; `percentiles=False` jika persentil sudah dijawab sketch lokal."""
     body = build_query(filters)
     body.update({
         "size": 0,
@@ -353,10 +440,6 @@ def summary_for_filters(filters: Dict[str, Any], min_n_kec: int = 30) -> Dict[st
             "avg_hb":   {"avg": {"field": "Hb (g/dL)"}},
             "avg_upah": {"avg": {"field": "Upah Keluarga (Rp/bulan)"}},
             "avg_ump":  {"avg": {"field": "Rata-rata UMP Wilayah (Rp/bulan)"}},
-            "pct_bmi":  {"percentiles": {"field": "BMI Pra-Hamil", "percents": [5,25,50,75,95]}},
-            "pct_lila": {"percentiles": {"field": "LiLA saat Hamil (cm)", "percents": [5,25,50,75,95]}},
-            "pct_hb":   {"percentiles": {"field": "Hb (g/dL)", "percents": [5,25,50,75,95]}},
-            "pct_z":    {"percentiles": {"field": "Z-Score TB/U", "percents": [5,25,50,75,95]}},
             "pendidikan": {"terms": {"field": "Pendidikan Ibu", "size": 10}},
             "air_bersih": {"terms": {"field": "Akses Air Bersih", "size": 10}},
             "imunisasi":  {"terms": {"field": "Status Imunisasi Anak", "size": 10}},
@@ -373,14 +456,49 @@ def summary_for_filters(filters: Dict[str, Any], min_n_kec: int = 30) -> Dict[st
             "risk_bmi_low":   {"filter": {"range": {"BMI Pra-Hamil": {"lt": 18.5}}}},
             "risk_anc_low":   {"filter": {"range": {"Kunjungan ANC (x)": {"lte": 2}}}},
             "risk_z_stunt":   {"filter": {"range": {"Z-Score TB/U": {"lte": -2.0}}}},
-            "risk_asi_tidak": {"filter": {"terms": {"ASI Eksklusif": ["Tidak","tidak","No","no"]}}},
+            "risk_asi_tidak": {"filter": {"term": {"asi_eksklusif": False}} if normalized()
+                               else {"terms": {"ASI Eksklusif": ["Tidak","tidak","No","no"]}}},
             # histogram
             "usia_anak": {"histogram": {"field": "Usia Anak (bulan)", "interval": 6}},
             "usia_ibu":  {"histogram": {"field": "Usia Ibu saat Hamil (tahun)", "interval": 5}},
         }
     })
-    data = _es_post(STUNTING_INDEX, "/_search", body)
-    agg = data["aggregations"]
+    if percentiles:
+        body["aggs"].update(_PCT_AGGS)
+    return body
+
+
+def summary_for_filters(filters: Dict[str, Any], min_n_kec: int = 30) -> Dict[str, Any]:
+    """Ringkasan padat untuk InsightNow & panel lain — setara pola di beta.py.
+
+    Semua sub-query (KPI, cakupan, nakes, kecamatan, tren, top-N) dikemas
+    dalam satu `_msearch` lewat `_QueryPlan`, lalu diurai ke bentuk dict yang sama.
+    """
+    plan = _QueryPlan()
+    s_cards = plan.add(STUNTING_INDEX, _count_stunting_body(filters))
+    s_imun  = [plan.add(STUNTING_INDEX, _coverage_immunization_body(filters, f)) for f in _imunisasi_fields()]
+    s_air   = plan.add(STUNTING_INDEX, _coverage_safe_water_body(filters))
+    s_nakes = plan.add(NUTRITION_INDEX, _jumlah_nakes_body(filters))
+    # persentil dari sketch t-digest lokal bila tersedia (src/quantile_sketch.py)
+    sketch_pct = quantile_sketch.percentiles(filters)
+    s_main  = plan.add(STUNTING_INDEX, _summary_body(filters, percentiles=sketch_pct is None))
+    kec_rollup = rollup_kecamatan_rows(filters)
+    s_kec   = plan.add(STUNTING_INDEX, _kecamatan_table_body(filters)) if kec_rollup is None else None
+    s_trend = plan.add(STUNTING_INDEX, _trend_monthly_body(filters))
+    s_top = {}
+    for level in ("Wilayah", "Kecamatan"):
+        candidates, agg_size, label = _level_spec(level)
+        s_top[label] = [plan.add(STUNTING_INDEX, _terms_body(filters, f, agg_size))
+                        for f in schema_registry.candidates(STUNTING_INDEX, candidates)]
+    plan.execute()
+
+    # inti
+    cards = _parse_count_stunting(plan.result(s_cards))
+    imun  = plan.first(s_imun, _parse_coverage_immunization)
+    air   = _parse_coverage_safe_water(plan.result(s_air))
+
+    # agregat & distribusi
+    agg = plan.result(s_main)["aggregations"]
 
     # helper
     total = max(1, int(cards["total"]))
@@ -393,7 +511,8 @@ def summary_for_filters(filters: Dict[str, Any], min_n_kec: int = 30) -> Dict[st
 
     # rangkum kecamatan (top/bottom) berdasarkan % stunting
     try:
-        df_kec = kecamatan_table(filters, min_n=min_n_kec)
+        kec_rows = kec_rollup if kec_rollup is not None else _kecamatan_rows(filters, plan.result(s_kec))
+        df_kec = _parse_kecamatan_table(kec_rows, min_n_kec)
         top = df_kec.nlargest(5, "stunting_pct")[["Wilayah","Kecamatan","n","stunting_pct","avg_prob"]].to_dict("records")
         bot = df_kec.nsmallest(5, "stunting_pct")[["Wilayah","Kecamatan","n","stunting_pct","avg_prob"]].to_dict("records")
         kec_summary = {"min_n": min_n_kec, "considered": int(df_kec.shape[0]), "top": top, "bottom": bot}
@@ -405,19 +524,26 @@ def summary_for_filters(filters: Dict[str, Any], min_n_kec: int = 30) -> Dict[st
 
     trend = []
     try:
-        trend = trend_monthly(filters)[-24:]  # ambil 24 bulan terakhir
+        trend = _parse_trend_monthly(plan.result(s_trend))[-24:]  # ambil 24 bulan terakhir
     except Exception:
         trend = []
 
+    top10 = {}
+    for label, slots in s_top.items():
+        df = plan.first(slots, _parse_terms)
+        if df is None:
+            df = pd.DataFrame(columns=["key","jumlah_anak","jumlah_stunting"])
+        top10[label] = _top_n(df.rename(columns={"key": label}), 10).to_dict("records")
+
     return {
         "filters": filters,
         "indikator_utama": {
             "total_lahir": cards["total"],
             "total_stunting": cards["stunting"],
             "rasio_stunting": cards["ratio"],    # 0..1
-            "cakupan_imunisasi": coverage_immunization(filters),
-            "akses_air_layak": coverage_safe_water(filters),
-            "jumlah_nakes_gizi": jumlah_nakes(filters),
+            "cakupan_imunisasi": imun,
+            "akses_air_layak": air,
+            "jumlah_nakes_gizi": _parse_jumlah_nakes(plan.result(s_nakes)),
         },
         "stat_rerata": {
             "avg_prob": agg["avg_prob"]["value"],
@@ -428,7 +554,7 @@ def summary_for_filters(filters: Dict[str, Any], min_n_kec: int = 30) -> Dict[st
             "avg_ump":  avg_ump,
             "rasio_upah_ump": rasio_upah_ump,
         },
-        "percentiles": {
+        "percentiles": sketch_pct if sketch_pct is not None else {
             "bmi":  pvals(agg.get("pct_bmi")),
             "lila": pvals(agg.get("pct_lila")),
             "hb":   pvals(agg.get("pct_hb")),
@@ -468,15 +594,23 @@ def summary_for_filters(filters: Dict[str, Any], min_n_kec: int = 30) -> Dict[st
             "usia_ibu_5_tahunan":  [{"bin_start": b["key"], "count": b["doc_count"], "pct": pct(b["doc_count"])} for b in agg["usia_ibu"]["buckets"]],
         },
         "kecamatan_rank": kec_summary,
-        "top10_kabupaten": top_counts("Wilayah", filters, size=10).to_dict("records"),
-        "top10_kecamatan": top_counts("Kecamatan", filters, size=10).to_dict("records"),
+        "top10_kabupaten": top10["Wilayah"],
+        "top10_kecamatan": top10["Kecamatan"],
         "trend_bulanan": trend,  # <<— BARU
 
 
     }
 
 # ------------------- untuk korelasi -------------------
+NUMERIC_FIELDS = [
+    "Z-Score TB/U", "Probabilitas Stunting (simulasi)", "Usia Anak (bulan)", "Berat Lahir (gram)",
+    "Upah Keluarga (Rp/bulan)", "Rata-rata UMP Wilayah (Rp/bulan)", "Jumlah Anak", "Tinggi Badan Ibu (cm)",
+    "BMI Pra-Hamil", "Hb (g/dL)", "LiLA saat Hamil (cm)", "Kunjungan ANC (x)", "Usia Ibu saat Hamil (tahun)",
+]
+
 def numeric_sample_for_corr(filters: Dict[str, Any], size: int = 5000) -> pd.DataFrame:
-    df = fetch_sample(filters, size=size)
-    if df.empty: return df
-    return df.select_dtypes(include=["number"]).copy()
+    """Sampel numerik via docvalue_fields -> array NumPy (lihat src/columnar.py)."""
+    body = columnar.docvalue_body(build_query(filters), NUMERIC_FIELDS, size)
+    raw = query_cache.cached("utils.es", STUNTING_INDEX, "/_search#raw", body,
+                             lambda: es_transport.post_raw(STUNTING_INDEX, "/_search", body), ttl=CACHE_TTL)
+    return columnar.numeric_frame(columnar.decode_numeric_hits(raw, NUMERIC_FIELDS))